@@ -0,0 +1,293 @@
+"""Offline benchmarks for the ingestion and query paths.
+
+Measures PDFProcessor.process_pdf, VectorStoreService.add_documents and
+similarity_search, RAGPipeline._retrieve_documents and the /api/upload and /api/chat
+round trips on data/sample.pdf and synthetically enlarged copies of its chunks. Every
+store lives in a throwaway directory, the LLM is the deterministic fake client, and
+the embedder is the deterministic fake engine unless --embedder real is given.
+--rerank adds the cross-encoder rerank stage to the retrieval and chat scenarios.
+
+Usage (from the backend directory):
+    python benchmark.py --scales 1,10,50 --save-baseline benchmark_baseline.json
+    python benchmark.py --scales 1,10,50 --baseline benchmark_baseline.json
+
+Reports p50/p95/p99 latency (ms) and throughput per scenario, plus the process's
+peak RSS when each scenario finished. ru_maxrss never goes down, so that column is
+cumulative over the run rather than the peak of the scenario itself. With
+--baseline, p50/p95 are compared to the saved run and the exit status is 1 when any
+scenario regressed by more than --max-regression.
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import logging
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PDF = os.path.join(BACKEND_DIR, "..", "data", "sample.pdf")
+
+QUESTIONS = [
+    "What is the total revenue for the year?",
+    "How did operating income change compared to last year?",
+    "What is the net income?",
+    "What are the total assets and total liabilities?",
+    "How much cash and cash equivalents does the company hold?",
+    "What is the debt-to-equity ratio?",
+    "What were the main operating expenses?",
+    "What was the cash flow from operating activities?",
+]
+
+logger = logging.getLogger("benchmark")
+
+
+def configure_environment(workdir: str, embedder: str, rerank: bool = False) -> None:
+    """Point every store at ``workdir`` and pick the stand-ins; must run before config is imported"""
+    os.environ.update({
+        "VECTOR_DB_PATH": os.path.join(workdir, "vector_store_db"),
+        "EMBEDDING_CACHE_ENABLED": "False",
+        "QUERY_EMBEDDING_CACHE_SIZE": "0",
+        "ANSWER_CACHE_ENABLED": "False",
+        "BM25_INDEX_PATH": os.path.join(workdir, "lexical_index", "bm25.sqlite"),
+        "PDF_UPLOAD_PATH": os.path.join(workdir, "uploads"),
+        "CHUNK_STORE_PATH": os.path.join(workdir, "uploads", "chunks.sqlite"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "uploads", "documents.sqlite"),
+        "KEYWORDS_PATH": os.path.join(workdir, "keywords.json"),
+        "LLM_PROVIDER": "fake",
+        "EMBEDDING_ENGINE": "huggingface" if embedder == "real" else "fake",
+        "RERANK_ENABLED": "True" if rerank else "False",
+        # Keep api_chat on the retrieval + LLM path rather than the table-fact shortcut
+        "FACT_ANSWERS_ENABLED": "False",
+    })
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def process_peak_rss_mb() -> float:
+    """Peak RSS of the whole benchmark process so far; ru_maxrss is in kilobytes on Linux"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def summarize(latencies, items: int, wall: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "throughput_per_s": round(items / wall, 2) if wall else 0.0,
+        "process_peak_rss_mb": process_peak_rss_mb(),
+    }
+
+
+def measure(fn, calls, items_per_call: int = 1) -> dict:
+    """Run ``fn(arg)`` for every arg in ``calls`` and summarize the latencies"""
+    latencies = []
+    wall_start = time.perf_counter()
+    for arg in calls:
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, len(latencies) * items_per_call, time.perf_counter() - wall_start)
+
+
+def enlarge(documents, copies: int, start: int = 0):
+    """Synthetic corpus: relabelled copies of the sample chunks, as if from other filings"""
+    from langchain.schema import Document
+
+    return [
+        Document(
+            page_content=f"[Filing {copy}] {doc.page_content}",
+            metadata={**doc.metadata, "filename": f"synthetic_{copy}.pdf"}
+        )
+        for copy in range(start, copies)
+        for doc in documents
+    ]
+
+
+def bench_components(scales, repeats: int, batch_size: int) -> dict:
+    from config import settings
+    from services.pdf_processor import PDFProcessor
+    from services.vector_store import VectorStoreService
+    from services.chunk_store import ChunkStore
+    from services.rag_pipeline import RAGPipeline
+
+    results = {}
+    processor = PDFProcessor()
+    results["process_pdf"] = measure(lambda _: processor.process_pdf(SAMPLE_PDF), range(repeats))
+
+    sample_chunks = processor.process_pdf(SAMPLE_PDF)
+    for chunk in sample_chunks:
+        chunk.metadata["filename"] = "sample.pdf"
+    logger.info(f"📄 sample.pdf: {len(sample_chunks)} chunks")
+
+    vector_store = VectorStoreService()
+    chunk_store = ChunkStore(settings.chunk_store_path)
+    # Built up front like the server does, so its change listeners are part of add_documents
+    pipeline = RAGPipeline(vector_store=vector_store, chunk_store=chunk_store)
+    loaded = 0
+    for scale in scales:
+        corpus = enlarge(sample_chunks, scale, start=loaded)
+        loaded = scale
+        batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+        results[f"add_documents@x{scale}"] = measure(vector_store.add_documents, batches, batch_size)
+        vector_store.flush()
+        for filename, chunks in itertools.groupby(corpus, key=lambda doc: doc.metadata["filename"]):
+            chunk_store.add(filename, list(chunks))
+
+        size = vector_store.get_document_count()
+        logger.info(f"📚 Corpus at x{scale}: {size} chunks")
+        queries = QUESTIONS * repeats
+        results[f"similarity_search@x{scale}"] = measure(lambda q: vector_store.similarity_search(q, k=10), queries)
+        results[f"retrieve_documents@x{scale}"] = measure(pipeline._retrieve_documents, queries)
+        for name in (f"add_documents@x{scale}", f"similarity_search@x{scale}", f"retrieve_documents@x{scale}"):
+            results[name]["corpus_chunks"] = size
+
+    vector_store.close()
+    return results
+
+
+def bench_api(uploads: int, repeats: int, ready_timeout: float) -> dict:
+    from fastapi.testclient import TestClient
+    import main
+
+    with open(SAMPLE_PDF, "rb") as f:
+        sample = f.read()
+
+    results = {}
+    with TestClient(main.app) as client:
+        deadline = time.time() + ready_timeout
+        while client.get("/ready").status_code != 200:
+            if time.time() > deadline:
+                raise RuntimeError("Service did not become ready in time")
+            time.sleep(0.1)
+
+        accept, end_to_end = [], []
+        wall_start = time.perf_counter()
+        for i in range(uploads):
+            # Trailing bytes after %%EOF keep the PDF valid but defeat duplicate detection
+            content = sample + f"\n%benchmark {i}\n".encode()
+            start = time.perf_counter()
+            response = client.post("/api/upload", files={"file": (f"benchmark_{i}.pdf", content, "application/pdf")})
+            response.raise_for_status()
+            accept.append(time.perf_counter() - start)
+
+            job_id = response.json()["job_id"]
+            while True:
+                status = client.get(f"/api/jobs/{job_id}").json()["status"]
+                if status in ("processed", "failed"):
+                    break
+                time.sleep(0.02)
+            if status == "failed":
+                raise RuntimeError(f"Ingestion job {job_id} failed")
+            end_to_end.append(time.perf_counter() - start)
+        wall = time.perf_counter() - wall_start
+        results["api_upload_accept"] = summarize(accept, uploads, wall)
+        results["api_upload_to_processed"] = summarize(end_to_end, uploads, wall)
+
+        def chat(question):
+            client.post("/api/chat", json={"question": question, "chat_history": []}).raise_for_status()
+
+        results["api_chat"] = measure(chat, QUESTIONS * repeats)
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    """Print p50/p95 deltas against the baseline; True when nothing regressed beyond the limit"""
+    ok = True
+    print(f"\n{'scenario':36} {'metric':8} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if change > max_regression:
+                flag, ok = "  REGRESSION", False
+            print(f"{name:36} {metric:8} {before:10.2f} {after:10.2f} {change:+8.1%}{flag}")
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for ingestion and query paths")
+    parser.add_argument("--scales", default="1,10", help="Comma-separated corpus multipliers of sample.pdf")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--uploads", type=int, default=3)
+    parser.add_argument("--embedder", choices=("fake", "real"), default="fake")
+    parser.add_argument("--rerank", action="store_true", help="Enable the cross-encoder rerank stage")
+    parser.add_argument("--skip-api", action="store_true", help="Only benchmark the components")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--save-baseline", help="Write the results JSON as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this saved baseline")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed p50/p95 slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.embedder == "real" and importlib.util.find_spec("sentence_transformers") is None:
+        logger.warning("⚠️ sentence-transformers is not installed; falling back to the fake embedder")
+        args.embedder = "fake"
+    if args.rerank and importlib.util.find_spec("sentence_transformers") is None:
+        logger.warning("⚠️ sentence-transformers is not installed; benchmarking without reranking")
+        args.rerank = False
+
+    workdir = tempfile.mkdtemp(prefix="rag-benchmark-")
+    configure_environment(workdir, args.embedder, args.rerank)
+    sys.path.insert(0, BACKEND_DIR)
+    logging.basicConfig(level=os.getenv("BENCHMARK_LOG_LEVEL", "WARNING"))
+    logger.setLevel(logging.INFO)
+
+    scales = sorted(int(s) for s in args.scales.split(","))
+    try:
+        scenarios = bench_components(scales, args.repeats, args.batch_size)
+        if not args.skip_api:
+            scenarios.update(bench_api(args.uploads, args.repeats, args.ready_timeout))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "embedder": args.embedder,
+        "rerank": args.rerank,
+        "scales": scales,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "scenarios": scenarios,
+    }
+
+    print(f"\n{'scenario':36} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>10} {'proc peak MB':>13}")
+    for name, stats in scenarios.items():
+        print(
+            f"{name:36} {stats['p50_ms']:10.2f} {stats['p95_ms']:10.2f} {stats['p99_ms']:10.2f} "
+            f"{stats['throughput_per_s']:10.2f} {stats['process_peak_rss_mb']:13.1f}"
+        )
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"💾 Wrote results to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("embedder") != args.embedder:
+            logger.warning(f"⚠️ Baseline was recorded with the {baseline.get('embedder')} embedder")
+        if not compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
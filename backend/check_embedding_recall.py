@@ -0,0 +1,127 @@
+"""Check that the quantized ONNX embedding engine keeps retrieval recall close to fp32.
+
+Embeds the stored chunks and a set of questions with both the fp32 HuggingFace model
+and the int8 ONNX engine, then measures how many of the fp32 top-k chunks the int8
+engine also returns (squared L2, as the vector stores rank). Both engines write to the
+same collection, so int8 queries are also ranked against the fp32 corpus vectors, and
+every vector must be unit-norm like the baseline's.
+
+Usage (from the backend directory):
+    python check_embedding_recall.py --k 10 --tolerance 0.95
+
+Exits with status 1 when a mean recall@k falls below the tolerance or a vector is not
+unit-norm.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+from langchain.embeddings import HuggingFaceEmbeddings
+from services.chunk_store import ChunkStore
+from services.embedding_engines import OnnxInt8Embeddings
+from config import settings
+
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "BAAI/bge-base-en-v1.5"
+
+DEFAULT_QUESTIONS = [
+    "What is the total revenue for the year?",
+    "How did operating income change compared to last year?",
+    "What is the net income?",
+    "What are the total assets and total liabilities?",
+    "How much cash and cash equivalents does the company hold?",
+    "What is the debt-to-equity ratio?",
+    "What were the main operating expenses?",
+    "How much was spent on research and development?",
+    "What is the earnings per share?",
+    "What are the main risks mentioned in the report?",
+    "How much dividend was paid to shareholders?",
+    "What was the cash flow from operating activities?",
+]
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+# Largest accepted deviation of a vector's L2 norm from 1
+NORM_TOLERANCE = 1e-3
+
+
+def timed_embed(name: str, embed, texts):
+    start = time.time()
+    vectors = np.asarray(embed(texts), dtype="float32")
+    elapsed = time.time() - start
+    logger.info(f"⏱ {name}: {len(texts)} texts in {round(elapsed, 2)}s ({round(len(texts) / elapsed, 1)}/s)")
+    return vectors
+
+
+def check_recall(questions, k: int, limit: int) -> dict:
+    """Mean recall@k of int8 against fp32, within the int8 space and across the two"""
+    texts = [doc.page_content for _, doc in zip(range(limit), ChunkStore(settings.chunk_store_path).iter_documents())]
+    if len(texts) < k:
+        raise SystemExit(f"Need at least {k} stored chunks, found {len(texts)}; upload a document first")
+
+    baseline = HuggingFaceEmbeddings(model_name=MODEL_NAME, model_kwargs={"device": "cpu"})
+    quantized = OnnxInt8Embeddings(
+        MODEL_NAME,
+        cache_dir=settings.onnx_model_dir,
+        num_threads=settings.onnx_num_threads or None,
+        batch_size=settings.onnx_batch_size,
+    )
+
+    fp32_corpus = timed_embed("fp32 corpus", baseline.embed_documents, texts)
+    fp32_queries = timed_embed("fp32 queries", baseline.embed_documents, questions)
+    int8_corpus = timed_embed("int8 corpus", quantized.embed_documents, texts)
+    int8_queries = timed_embed("int8 queries", quantized.embed_documents, questions)
+
+    norm_error = max(
+        float(np.abs(np.linalg.norm(vectors, axis=1) - 1).max())
+        for vectors in (fp32_corpus, fp32_queries, int8_corpus, int8_queries)
+    )
+    logger.info(f"  max |norm - 1| = {norm_error:.2e}")
+
+    expected = top_k(fp32_corpus, fp32_queries, k)
+    results = {"norm_error": norm_error}
+    for name, actual in (
+        ("int8", top_k(int8_corpus, int8_queries, k)),
+        # Queries embedded by one engine against a collection written by the other
+        ("int8 queries vs fp32 corpus", top_k(fp32_corpus, int8_queries, k)),
+    ):
+        recalls = [len(set(e) & set(a)) / k for e, a in zip(expected, actual)]
+        for question, recall in zip(questions, recalls):
+            logger.info(f"  [{name}] recall@{k}={recall:.2f}  {question}")
+        results[name] = float(np.mean(recalls))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare int8 ONNX retrieval recall against fp32")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.95, help="Minimum mean recall@k")
+    parser.add_argument("--limit", type=int, default=5000, help="Maximum number of stored chunks to use")
+    parser.add_argument("--questions", help="JSON file with a list of questions")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r") as f:
+            questions = json.load(f)
+
+    results = check_recall(questions, args.k, args.limit)
+    passed = results["norm_error"] <= NORM_TOLERANCE
+    if not passed:
+        logger.info(f"❌ Vectors are not unit-norm (max |norm - 1| = {results['norm_error']:.2e})")
+    for name in ("int8", "int8 queries vs fp32 corpus"):
+        ok = results[name] >= args.tolerance
+        passed = passed and ok
+        logger.info(
+            f"{'✅' if ok else '❌'} [{name}] mean recall@{args.k} = {results[name]:.3f} (tolerance {args.tolerance})"
+        )
+    sys.exit(0 if passed else 1)
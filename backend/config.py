@@ -8,27 +8,121 @@ class Settings(BaseSettings):
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     
     # Vector database configuration
-    vector_db_path: str = os.getenv("VECTOR_DB_PATH", "./vector_store")
+    vector_db_path: str = os.getenv("VECTOR_DB_PATH", "./vector_store_db")
     vector_db_type: str = os.getenv("VECTOR_DB_TYPE", "chromadb")
+    # FAISS index type when vector_db_type is "faiss": "flat", "ivf" or "hnsw"
+    faiss_index_type: str = os.getenv("FAISS_INDEX_TYPE", "flat")
+    faiss_ivf_nlist: int = int(os.getenv("FAISS_IVF_NLIST", "256"))
+    faiss_hnsw_m: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    # Filtered FAISS searches over at most this many chunks are scored exactly on just those vectors
+    faiss_exact_filter_max: int = int(os.getenv("FAISS_EXACT_FILTER_MAX", "5000"))
+    # "document" keeps one vector index per uploaded file so filename-scoped queries touch only it
+    vector_partition_mode: str = os.getenv("VECTOR_PARTITION_MODE", "none")
+    # "sync" persists after every write; "write_behind" group-commits writes in the background
+    vector_persist_mode: str = os.getenv("VECTOR_PERSIST_MODE", "sync")
+    vector_flush_interval_seconds: float = float(os.getenv("VECTOR_FLUSH_INTERVAL_SECONDS", "1.0"))
+    vector_flush_max_pending: int = int(os.getenv("VECTOR_FLUSH_MAX_PENDING", "2000"))
     
     # PDF upload path
     pdf_upload_path: str = os.getenv("PDF_UPLOAD_PATH", "../data")
     
     # Embedding model configuration
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    # "huggingface" (fp32 PyTorch), "onnx_int8" (quantized ONNX Runtime on CPU) or "fake" (offline runs)
+    embedding_engine: str = os.getenv("EMBEDDING_ENGINE", "huggingface")
+    onnx_model_dir: str = os.getenv("ONNX_MODEL_DIR", "./onnx_models")
+    onnx_num_threads: int = int(os.getenv("ONNX_NUM_THREADS", "0"))  # 0 = all cores
+    onnx_batch_size: int = int(os.getenv("ONNX_BATCH_SIZE", "32"))
     
-    # LLM configuration
+    # Embedding cache configuration
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite")
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    query_embedding_cache_size: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+    
+    # LLM configuration ("cohere" or "fake" for local testing)
+    llm_provider: str = os.getenv("LLM_PROVIDER", "cohere")
     llm_model: str = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
     llm_temperature: float = float(os.getenv("LLM_TEMPERATURE", "0.1"))
+    # LLM gateway: concurrency cap with a bounded queue, identical-prompt coalescing,
+    # per-call deadline and jittered exponential backoff on retryable errors
+    llm_gateway_enabled: bool = os.getenv("LLM_GATEWAY_ENABLED", "True").lower() == "true"
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    llm_max_queue: int = int(os.getenv("LLM_MAX_QUEUE", "64"))
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_backoff_base_seconds: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.25"))
+    llm_backoff_max_seconds: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "4"))
     max_tokens: int = int(os.getenv("MAX_TOKENS", "1000"))
     
     # Chunking configuration
     chunk_size: int = int(os.getenv("CHUNK_SIZE", "1000"))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     
+    # Chunk store (SQLite) holding every stored chunk for listing and keyword fallback
+    chunk_store_path: str = os.getenv("CHUNK_STORE_PATH", os.path.join(os.getenv("PDF_UPLOAD_PATH", "../data"), "chunks.sqlite"))
+    
+    # Document registry (SQLite) tracking uploads, their status and content hash
+    document_registry_path: str = os.getenv("DOCUMENT_REGISTRY_PATH", os.path.join(os.getenv("PDF_UPLOAD_PATH", "../data"), "documents.sqlite"))
+    
+    # "remote" makes API workers use the shared embedding service (python embedding_server.py),
+    # which owns the model and vector store, instead of loading their own copies
+    embedding_service_mode: str = os.getenv("EMBEDDING_SERVICE_MODE", "local")
+    embedding_service_socket: str = os.getenv("EMBEDDING_SERVICE_SOCKET", "/tmp/rag-embedding.sock")
+    # Shared secret for the service socket; no default, remote mode refuses to start without it
+    embedding_service_authkey: str = os.getenv("EMBEDDING_SERVICE_AUTHKEY", "")
+    embedding_service_connect_timeout: float = float(os.getenv("EMBEDDING_SERVICE_CONNECT_TIMEOUT", "60"))
+    # Dynamic batching inside the service: wait up to this long for more texts, up to the max size
+    embedding_batch_max_size: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+    embedding_batch_wait_ms: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+    
+    # Numeric facts from financial tables, answering metric/ratio questions without the LLM (opt-in)
+    fact_store_path: str = os.getenv("FACT_STORE_PATH", os.path.join(os.getenv("PDF_UPLOAD_PATH", "../data"), "facts.sqlite"))
+    fact_answers_enabled: bool = os.getenv("FACT_ANSWERS_ENABLED", "False").lower() == "true"
+    
+    # PDF extraction configuration ("pdfplumber" or "pymupdf")
+    pdf_extraction_engine: str = os.getenv("PDF_EXTRACTION_ENGINE", "pymupdf")
+    pdf_extraction_workers: int = int(os.getenv("PDF_EXTRACTION_WORKERS", "4"))
+    
+    # Ingestion configuration
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    ingestion_batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "64"))
+    ingestion_queue_depth: int = int(os.getenv("INGESTION_QUEUE_DEPTH", "4"))
+    
     # Retrieval configuration
     retrieval_k: int = int(os.getenv("RETRIEVAL_K", "5"))
     similarity_threshold: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.9"))
+    # "hybrid" fuses BM25 and vector results; "vector" keeps the keyword-filtered dense search
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "hybrid")
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    rrf_k: int = int(os.getenv("RRF_K", "60"))
+    bm25_index_path: str = os.getenv("BM25_INDEX_PATH", "./lexical_index/bm25.sqlite")
+    
+    # Optional cross-encoder rerank: score rerank_candidates chunks within rerank_budget_ms, keep rerank_keep
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "False").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    rerank_keep: int = int(os.getenv("RERANK_KEEP", "4"))
+    rerank_budget_ms: float = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    rerank_max_length: int = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+    
+    # Context assembly: token budget measured with a tiktoken encoding
+    context_max_tokens: int = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+    context_encoding: str = os.getenv("CONTEXT_ENCODING", "cl100k_base")
+    
+    # Keyword filter vocabulary (JSON list); the built-in list is used when missing
+    keywords_path: str = os.getenv("KEYWORDS_PATH", "./keywords.json")
+    
+    # Batch chat configuration
+    batch_max_questions: int = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+    batch_llm_concurrency: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    
+    # Answer cache configuration
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "True").lower() == "true"
+    answer_cache_similarity: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+    answer_cache_ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    answer_cache_max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
     
     # Server configuration
     host: str = os.getenv("HOST", "0.0.0.0")
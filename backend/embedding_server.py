@@ -0,0 +1,49 @@
+"""Run the shared embedding and indexing service for multi-worker deployments.
+
+One process loads the embedding model and owns the vector store and BM25 index. API
+workers started with EMBEDDING_SERVICE_MODE=remote call it over a Unix socket instead
+of each loading the model and opening the persist directory, and embedding requests
+arriving from all workers at once are batched into shared forward passes.
+
+Usage (from the backend directory, with the same secret for both):
+    EMBEDDING_SERVICE_AUTHKEY=... python embedding_server.py
+    EMBEDDING_SERVICE_AUTHKEY=... EMBEDDING_SERVICE_MODE=remote uvicorn main:app --workers 8
+
+Ingestion jobs run on the worker that received the upload; their progress is kept in
+the document registry, so /api/jobs/{job_id} answers from any worker.
+"""
+import argparse
+import logging
+import time
+
+from services.embedding_service import EmbeddingServer, service_authkey
+from services.vector_store import VectorStoreService
+from config import settings
+
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding and indexing service")
+    parser.add_argument("--socket", default=settings.embedding_service_socket)
+    parser.add_argument("--max-batch", type=int, default=settings.embedding_batch_max_size)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.embedding_batch_wait_ms)
+    args = parser.parse_args()
+    authkey = service_authkey()
+
+    settings.embedding_batch_max_size = args.max_batch
+    settings.embedding_batch_wait_ms = args.max_wait_ms
+
+    start = time.time()
+    vector_store = VectorStoreService(dynamic_batching=True)
+    vector_store.warm_up()
+    logger.info(f"✅ Embedding service ready in {round(time.time() - start, 2)}s")
+
+    server = EmbeddingServer(vector_store, args.socket, authkey)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopping embedding service")
+    finally:
+        vector_store.close()
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from models.schemas import ChatRequest, ChatResponse, DocumentsResponse, UploadResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.concurrency import run_in_threadpool
+from models.schemas import (
+    ChatRequest, ChatResponse, DocumentsResponse, UploadResponse, JobStatusResponse,
+    BatchChatRequest, BatchChatResponse, ChunksResponse, DeleteDocumentResponse, SearchFilters
+)
 from services.pdf_processor import PDFProcessor
-from services.vector_store import VectorStoreService
+from services.embedding_service import create_vector_store
 from services.rag_pipeline import RAGPipeline
+from services.job_queue import IngestionJobQueue
+from services.chunk_store import ChunkStore
+from services.fact_store import FactStore
+from services.document_registry import DocumentRegistry, DELETING
+from services.chunk_ids import chunk_id
+from services.search_filter import SearchFilter
+from services.metrics import collect_spans, observe_stage
 from config import settings
+from typing import Optional
+from contextlib import contextmanager
+import asyncio
+import hashlib
 import logging
 import time
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+from uuid import uuid4
 
 
 # Configure logging
@@ -37,18 +54,103 @@ app.add_middleware(
 pdf_processor = None
 vector_store = None
 rag_pipeline = None
+ingestion_queue = None
+chunk_store = None
+fact_store = None
+document_registry = None
+
+
+# Readiness of the background warm-up, reported by /ready
+startup_state = {"ready": False, "error": None, "phases": {}}
+warm_up_task = None
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one startup phase and log it so cold-start regressions are visible"""
+    phase_start = time.time()
+    yield
+    elapsed = round(time.time() - phase_start, 3)
+    startup_state["phases"][name] = elapsed
+    logger.info(f"⏱ Startup phase '{name}' took {elapsed}s")
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize services on startup"""
-    global pdf_processor, vector_store, rag_pipeline
+    """Open the lightweight stores, then load models and indexes in the background"""
+    global pdf_processor, chunk_store, fact_store, document_registry, warm_up_task
 
     logger.info("🚀 Starting RAG Q&A System...")
 
+    with startup_phase("document_registry"):
+        document_registry = DocumentRegistry(settings.document_registry_path)
+        document_registry.import_legacy_json(LEGACY_METADATA_PATH)
+
+    with startup_phase("chunk_store"):
+        chunk_store = ChunkStore(settings.chunk_store_path)
+        chunk_store.import_legacy_json(settings.pdf_upload_path)
+
+    with startup_phase("fact_store"):
+        fact_store = FactStore(settings.fact_store_path)
+
     pdf_processor = PDFProcessor()
-    vector_store = VectorStoreService()
-    rag_pipeline = RAGPipeline(vector_store=vector_store)
+
+    # Accept connections right away; /ready flips once the models are warm
+    warm_up_task = asyncio.get_running_loop().create_task(warm_up())
+
+
+def load_models():
+    """Load the embedding model, vector indexes and RAG pipeline (runs off the event loop)"""
+    global vector_store, rag_pipeline
+
+    with startup_phase("vector_store"):
+        vector_store = create_vector_store()
+
+    with startup_phase("rag_pipeline"):
+        rag_pipeline = RAGPipeline(vector_store=vector_store, chunk_store=chunk_store, fact_store=fact_store)
+
+    with startup_phase("warm_up_embedding"):
+        vector_store.warm_up()
+
+    if rag_pipeline.reranker is not None:
+        with startup_phase("warm_up_reranker"):
+            rag_pipeline.reranker.warm_up()
+
+
+async def warm_up():
+    global ingestion_queue
+
+    warm_up_start = time.time()
+    try:
+        await run_in_threadpool(load_models)
+        ingestion_queue = IngestionJobQueue(
+            pdf_processor=pdf_processor,
+            vector_store=vector_store,
+            on_stage=record_job_stage,
+            on_batch=store_chunks,
+            on_complete=finalize_chunks,
+            previous_pages=chunk_store.page_hashes,
+            on_facts=store_facts if settings.fact_answers_enabled else None,
+            on_failure=discard_job,
+        )
+    except Exception as e:
+        logger.exception("❌ Warm-up failed")
+        startup_state["error"] = str(e)
+        return
+
+    startup_state["ready"] = True
+    logger.info(f"✅ Ready after {round(time.time() - warm_up_start, 3)}s warm-up")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain ingestion jobs and flush pending vector writes before exiting"""
+    if ingestion_queue:
+        await ingestion_queue.shutdown()
+    if vector_store:
+        await run_in_threadpool(vector_store.close)
+    if rag_pipeline:
+        rag_pipeline.close()
 
 @app.get("/")
 async def root():
@@ -56,9 +158,20 @@ async def root():
     return {"message": "RAG-based Financial Statement Q&A System is running"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once the models and indexes are loaded, 503 before"""
+    body = {
+        "ready": startup_state["ready"],
+        "error": startup_state["error"],
+        "phases": startup_state["phases"],
+    }
+    return JSONResponse(status_code=200 if startup_state["ready"] else 503, content=body)
+
+
 @app.post("/api/upload", response_model=UploadResponse)
 async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file"""
+    """Upload PDF file and queue it for background processing"""
     start_time = time.time()
 
 
@@ -66,55 +179,77 @@ async def upload_pdf(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
 
-    os.makedirs(settings.pdf_upload_path, exist_ok=True)
-    saved_path = os.path.join(settings.pdf_upload_path, file.filename)
-
-    with open(saved_path, "wb") as f:
-        f.write(await file.read())
-
-
-    try:
-        chunks = pdf_processor.process_pdf(saved_path)
-    except Exception as e:
-        logger.exception("❌ Error processing PDF")
-        raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
+    require_ready()
+    content = await file.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    # Identical bytes that are already processed (or being processed) are not ingested again
+    existing = document_registry.find_by_hash(content_hash)
+    if existing:
+        logger.info(f"⏭ Skipping duplicate upload of {file.filename} (same content as job {existing['job_id']})")
+        return UploadResponse(
+            filename=file.filename,
+            chunks_count=existing["chunks_count"],
+            processing_time=round(time.time() - start_time, 2),
+            message=f"Duplicate of {existing['filename']}, already {existing['status']}",
+            job_id=existing["job_id"],
+            status="duplicate"
+        )
 
+    # A running job re-reads its file for every page range, so it must not be overwritten
+    # mid-job, and a running delete would remove the new job's chunks; the check and the
+    # new job's entry are one registry transaction
+    job_id = str(uuid4())
+    upload_date = datetime.utcnow().isoformat() + "Z"
+    busy = document_registry.claim_upload(job_id, file.filename, upload_date, content_hash)
+    if busy == DELETING:
+        raise HTTPException(status_code=409, detail="This document is being deleted")
+    if busy is not None:
+        raise HTTPException(status_code=409, detail="A previous upload of this document is still being processed")
 
     try:
-        for chunk in chunks:
-            chunk.metadata["filename"] = file.filename
+        os.makedirs(settings.pdf_upload_path, exist_ok=True)
+        saved_path = os.path.join(settings.pdf_upload_path, file.filename)
 
-        vector_store.add_documents(chunks)
-
-        # vector_store.add_documents(chunks, metadata={"filename": file.filename})
-    except Exception as e:
-        logger.exception("❌ Error saving to vector store")
-        raise HTTPException(status_code=500, detail=f"Failed to store embeddings: {str(e)}")
+        # Write-then-rename so a running job never reads a half-written file
+        tmp_path = f"{saved_path}.{content_hash[:12]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, saved_path)
 
+        job = ingestion_queue.submit(file.filename, saved_path, content_hash=content_hash, job_id=job_id)
+    except Exception:
+        # Release the claim so the filename is not blocked by a job that never started
+        document_registry.record(job_id, file.filename, upload_date, "failed", content_hash=content_hash)
+        raise
 
     elapsed = round(time.time() - start_time, 2)
-    logger.info(f"✅ Uploaded and processed: {file.filename} ({len(chunks)} chunks, {elapsed}s)")
-
-    metadata_list = load_documents_metadata()
-    metadata_list.append({
-        "filename": file.filename,
-        "upload_date": datetime.utcnow().isoformat() + "Z",
-        "chunks_count": len(chunks),
-        "status": "processed"
-    })
-
-    save_documents_metadata(metadata_list)
-
-    store_chunks(file, chunks)
+    logger.info(f"📥 Uploaded {file.filename}, ingestion job {job.id} queued ({elapsed}s)")
 
     return UploadResponse(
         filename=file.filename,
-        chunks_count=len(chunks),
+        chunks_count=0,
         processing_time=elapsed,
-        message="Upload successful"
+        message="Upload accepted, processing in background",
+        job_id=job.id,
+        status=job.status
     )
 
 
+@app.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Get status, progress and timings of an ingestion job"""
+    require_ready()
+    job = ingestion_queue.get(job_id)
+    if job is not None:
+        return JobStatusResponse(**job.to_dict())
+    # Jobs run by another API worker are read from the shared registry
+    state = await run_in_threadpool(document_registry.get_job, job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**state)
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Process chat request and return AI response"""
@@ -123,80 +258,341 @@ async def chat(request: ChatRequest):
     # 2. Use RAG pipeline to generate answer
     # 3. Return response with sources
     # pass
+    require_ready()
     start_time = time.time()
 
     query = request.question.strip()
     if not query:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
-    # 1. Retrieve relevant documents
-    relevant_docs = rag_pipeline._retrieve_documents(query)
+    trace = {}
+    search_filter = to_search_filter(request.filters)
+
+    # Metric and ratio questions are answered from extracted table facts without the LLM
+    if not request.chat_history:
+        fact_answer = await run_in_threadpool(
+            traced(rag_pipeline.answer_from_facts, trace), query, search_filter=search_filter
+        )
+        if fact_answer:
+            observe_stage("chat_request", time.time() - start_time)
+            return ChatResponse(
+                answer=fact_answer['answer'],
+                sources=fact_answer['sources'],
+                processing_time=round(time.time() - start_time, 2),
+                fact_match=True,
+                debug=debug_info(trace, start_time) if request.debug else None
+            )
+
+    # 1. Retrieve relevant documents (embedding and search run off the event loop)
+    relevant_docs = await run_in_threadpool(
+        traced(rag_pipeline._retrieve_documents, trace), query, search_filter=search_filter
+    )
     if not relevant_docs:
         processing_time = round(time.time() - start_time, 2)
+        observe_stage("chat_request", time.time() - start_time)
         return ChatResponse(
             answer="Sorry, I couldn't find relevant information.",
             sources=[],
-            processing_time=processing_time
+            processing_time=processing_time,
+            debug=debug_info(trace, start_time) if request.debug else None
         )
 
-    # 2. Generate answer
-    answer_data = rag_pipeline.generate_answer(query, relevant_docs)
+    # 2. Generate answer from the documents retrieved above
+    answer_data = await run_in_threadpool(
+        traced(rag_pipeline.generate_answer, trace), query, request.chat_history, documents=relevant_docs
+    )
 
     # 3. Return response
     processing_time = round(time.time() - start_time, 2)
+    observe_stage("chat_request", time.time() - start_time)
     return ChatResponse(
         answer=answer_data['answer'],
         sources=answer_data['sources'],
-        processing_time=processing_time
+        processing_time=processing_time,
+        cached=answer_data.get('cached', False),
+        context_stats=answer_data.get('context_stats'),
+        debug=debug_info(trace, start_time) if request.debug else None
     )
 
 
-@app.get("/api/documents")
-async def get_documents():
-    """Get list of processed documents"""
-    # TODO: Implement document listing
-    # - Return list of uploaded and processed documents
-    # pass
-    metadata_list = load_documents_metadata()
-    return {"documents": metadata_list}
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """Answer many questions with shared embedding and retrieval work"""
+    require_ready()
+    start_time = time.time()
+
+    questions = [q.strip() for q in request.questions]
+    if not questions or any(not q for q in questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(questions) > settings.batch_max_questions:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.batch_max_questions} questions per batch"
+        )
 
+    search_filter = to_search_filter(request.filters)
+    batch = await run_in_threadpool(rag_pipeline.answer_batch, questions, request.max_concurrency, search_filter)
 
-@app.get("/api/chunks")
-async def get_chunks():
-    """Get document chunks (optional endpoint)"""
-    # TODO: Implement chunk listing
-    # - Return document chunks with metadata
-    # pass
-    result = []
+    return BatchChatResponse(
+        results=batch["results"],
+        unique_chunks=batch["unique_chunks"],
+        timings=batch["timings"],
+        processing_time=round(time.time() - start_time, 2)
+    )
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the answer as server-sent events: sources, tokens, then timings"""
+    require_ready()
+    query = request.question.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    search_filter = to_search_filter(request.filters)
+
+    def event_stream():
+        # A sync generator is iterated in Starlette's threadpool, so the blocking
+        # retrieval and LLM stream never hold up the event loop.
+        for event in rag_pipeline.stream_answer(query, request.chat_history, search_filter=search_filter):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/keywords")
+async def get_keywords():
+    """Get the keyword vocabulary used to filter retrieved chunks"""
+    require_ready()
+    return {"keywords": rag_pipeline.keywords}
+
+
+@app.post("/api/keywords/reload")
+async def reload_keywords():
+    """Reload the keyword vocabulary from settings.keywords_path without a restart"""
+    require_ready()
+    try:
+        keywords = await run_in_threadpool(rag_pipeline.reload_keywords)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reload keywords: {str(e)}")
+    return {"keywords": keywords, "count": len(keywords)}
+
+
+@app.get("/api/documents", response_model=DocumentsResponse)
+async def get_documents(
+    status: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Get list of current documents (replaced versions only with status=replaced), paginated with a cursor"""
+    documents, next_cursor = await run_in_threadpool(document_registry.list, status, cursor, limit)
+    total_count = await run_in_threadpool(document_registry.count, status)
+    return DocumentsResponse(
+        documents=documents,
+        total_count=total_count,
+        next_cursor=str(next_cursor) if next_cursor is not None else None
+    )
+
+
+@app.delete("/api/documents/{filename}", response_model=DeleteDocumentResponse)
+async def delete_document(filename: str):
+    """Remove a document's vectors, chunks, registry entries and uploaded file"""
+    require_ready()
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+
+    # Marking the entries "deleting" in the same transaction as the busy check keeps
+    # uploads of this filename out until the delete has finished
+    entries, busy = await run_in_threadpool(document_registry.begin_delete, filename)
+    if not entries:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if busy == DELETING:
+        raise HTTPException(status_code=409, detail="Document is already being deleted")
+    if busy is not None:
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    try:
+        removed = await run_in_threadpool(chunk_store.delete_file, filename)
+        await run_in_threadpool(fact_store.delete_file, filename)
+        ids = list({chunk_id(doc) for doc in removed})
+        if ids:
+            await run_in_threadpool(vector_store.delete_documents, ids)
+        await run_in_threadpool(document_registry.delete_filename, filename)
+    except Exception as e:
+        await run_in_threadpool(document_registry.fail_delete, filename)
+        logger.exception(f"❌ Failed to delete {filename}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
+
+    saved_path = os.path.join(settings.pdf_upload_path, filename)
+    if os.path.exists(saved_path):
+        os.remove(saved_path)
+
+    logger.info(f"🗑 Deleted {filename} ({len(removed)} chunks)")
+    return DeleteDocumentResponse(
+        filename=filename,
+        chunks_removed=len(removed),
+        message=f"Deleted {filename}"
+    )
+
+
+@app.get("/api/chunks", response_model=ChunksResponse)
+async def get_chunks(
+    filename: Optional[str] = None,
+    page: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get document chunks, paginated with a cursor and filterable by filename and page"""
     try:
-        for fname in os.listdir(settings.pdf_upload_path):
-            if fname.endswith(".chunks.json"):
-                with open(os.path.join(settings.pdf_upload_path, fname), "r") as f:
-                    file_chunks = json.load(f)
-                    result.extend(file_chunks)
-        return {"chunks": result}
+        chunks, next_cursor = await run_in_threadpool(chunk_store.list, filename, page, cursor, limit)
+        total_count = await run_in_threadpool(chunk_store.count, filename, page)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load chunks: {str(e)}")
 
+    return ChunksResponse(
+        chunks=chunks,
+        total_count=total_count,
+        next_cursor=str(next_cursor) if next_cursor is not None else None
+    )
+
+
+@app.get("/api/cache/embeddings")
+async def get_embedding_cache_stats():
+    """Get embedding cache hit/miss counters"""
+    require_ready()
+    return vector_store.get_embedding_cache_stats()
+
+
+@app.get("/api/cache/answers")
+async def get_answer_cache_stats():
+    """Get semantic answer cache hit/miss counters"""
+    require_ready()
+    if rag_pipeline.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag_pipeline.answer_cache.stats()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latency histograms, cache, token and fallback counters"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/api/stats/persistence")
+async def get_persistence_stats():
+    """Get vector store persistence mode, pending writes and flush latency"""
+    require_ready()
+    return vector_store.get_persistence_stats()
+
+
+@app.get("/api/stats/llm")
+async def get_llm_stats():
+    """Get LLM gateway queue depth, coalescing and retry counters and latency"""
+    require_ready()
+    return rag_pipeline.get_llm_stats()
+
+
+# Pre-registry metadata file, imported once into the document registry
+LEGACY_METADATA_PATH = os.path.join(settings.pdf_upload_path, "documents_metadata.json")
+
+def require_ready():
+    """Reject requests that need the models until the warm-up has finished"""
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail="Service is warming up, try again shortly")
+
+def to_search_filter(filters: Optional[SearchFilters]) -> Optional[SearchFilter]:
+    """Validate request filters and convert them to the form pushed down into the indexes"""
+    if filters is None:
+        return None
+    if filters.page_from is not None and filters.page_to is not None and filters.page_from > filters.page_to:
+        raise HTTPException(status_code=400, detail="page_from must not be after page_to")
+
+    def epoch(value: Optional[datetime]) -> Optional[float]:
+        if value is None:
+            return None
+        # Naive datetimes are taken as UTC, like the registry's upload dates
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+    search_filter = SearchFilter(
+        filenames=filters.filenames,
+        page_from=filters.page_from,
+        page_to=filters.page_to,
+        uploaded_after=epoch(filters.uploaded_after),
+        uploaded_before=epoch(filters.uploaded_before)
+    )
+    return search_filter or None
+
+def traced(fn, trace):
+    """Wrap ``fn`` so the spans it finishes are collected into ``trace`` in the worker thread"""
+    def run(*args, **kwargs):
+        with collect_spans(trace):
+            return fn(*args, **kwargs)
+    return run
+
+def debug_info(trace, start_time):
+    """Per-stage breakdown of one request in milliseconds (nested stages overlap)"""
+    return {
+        "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in trace.items()},
+        "total_ms": round((time.time() - start_time) * 1000, 2),
+    }
+
+def record_job_stage(job):
+    """Create or update the registry entry of an ingestion job"""
+    document_registry.record(
+        job_id=job.id,
+        filename=job.filename,
+        upload_date=job.created_at,
+        status=job.status,
+        chunks_count=job.chunks_total + job.chunks_reused,
+        content_hash=job.content_hash,
+        progress=job.to_dict()
+    )
+
+def store_chunks(job, chunks):
+    """Append a batch of the job's chunks to the chunk store and publish the job's progress"""
+    chunk_store.add(job.filename, chunks, job_id=job.id)
+    record_job_stage(job)
+
+def store_facts(job, facts):
+    """Index the numeric facts read from the job's financial tables"""
+    fact_store.add(job.filename, facts, job_id=job.id)
+    logger.info(f"📐 Stored {len(facts)} table facts from {job.filename}")
+
+def finalize_chunks(job):
+    """Once the upload has fully landed, drop chunks of earlier uploads on pages that changed"""
+    if settings.fact_answers_enabled:
+        fact_store.replace_previous(job.filename, job.id, keep_pages=job.unchanged_pages)
+    removed = chunk_store.replace_previous(job.filename, job.id, keep_pages=job.unchanged_pages)
+    chunk_store.set_page_hashes(job.filename, job.page_hashes)
+    document_registry.mark_replaced(job.filename, job.id)
+    job.chunks_reused = chunk_store.count(job.filename) - job.chunks_total
+    if not removed:
+        return
+
+    # A chunk re-extracted with identical text keeps its id, so only vanished ids are stale
+    live = {chunk_id(doc) for doc in chunk_store.iter_documents(filename=job.filename)}
+    stale = list({chunk_id(doc) for doc in removed} - live)
+    if stale:
+        vector_store.delete_documents(stale)
+    logger.info(
+        f"♻️ Replaced {len(removed)} chunks from a previous upload of {job.filename} "
+        f"({len(stale)} vectors removed, {job.chunks_reused} chunks reused)"
+    )
 
-METADATA_PATH = os.path.join(settings.pdf_upload_path, "documents_metadata.json")
-def load_documents_metadata():
-    if os.path.exists(METADATA_PATH):
-        with open(METADATA_PATH, "r") as f:
-            return json.load(f)
-    return []
-
-def save_documents_metadata(metadata_list):
-    with open(METADATA_PATH, "w") as f:
-        json.dump(metadata_list, f, indent=2)
-
-def store_chunks(file, chunks):
-    chunk_json_path = os.path.join(settings.pdf_upload_path, f"{file.filename}.chunks.json")
-    with open(chunk_json_path, "w") as f:
-        json.dump([
-            {"text": c.page_content, "metadata": c.metadata}
-            for c in chunks
-        ], f, indent=2)
+def discard_job(job):
+    """Remove the chunks, facts and vectors a failed job stored, leaving the previous upload live"""
+    fact_store.delete_job(job.id)
+    removed = chunk_store.delete_job(job.id)
+    if not removed:
+        return
+    # Ids shared with chunks of the previous upload still back those chunks
+    live = {chunk_id(doc) for doc in chunk_store.iter_documents(filename=job.filename)}
+    stale = list({chunk_id(doc) for doc in removed} - live)
+    if stale:
+        vector_store.delete_documents(stale)
+    logger.info(f"🧹 Discarded {len(removed)} chunks of failed job {job.id} ({len(stale)} vectors removed)")
 
 
 if __name__ == "__main__":
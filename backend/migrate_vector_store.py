@@ -0,0 +1,62 @@
+"""Copy an existing Chroma collection into a FAISS store without re-embedding.
+
+Usage (from the backend directory):
+    python migrate_vector_store.py --index-type hnsw
+
+Afterwards set VECTOR_DB_TYPE=faiss (and FAISS_INDEX_TYPE to the same type).
+"""
+import argparse
+import logging
+import os
+import time
+
+from langchain.embeddings.base import Embeddings
+from services.vector_backends import ChromaBackend, FaissBackend, FAISS_INDEX_TYPES
+from config import settings
+
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+
+class _NoEmbeddings(Embeddings):
+    """Stands in for the model: copied vectors are reused as-is, so nothing is embedded"""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("migrate_vector_store copies stored vectors and must not embed")
+
+    def embed_query(self, text):
+        raise RuntimeError("migrate_vector_store copies stored vectors and must not embed")
+
+
+def migrate(collection_name: str, index_type: str, batch_size: int) -> int:
+    embedding = _NoEmbeddings()
+    source = ChromaBackend(settings.vector_db_path, collection_name, embedding)
+    target = FaissBackend(
+        os.path.join(settings.vector_db_path, "faiss", collection_name),
+        embedding,
+        index_type=index_type,
+        ivf_nlist=settings.faiss_ivf_nlist,
+        hnsw_m=settings.faiss_hnsw_m
+    )
+
+    total = source.count()
+    logger.info(f"🚚 Migrating {total} chunks from Chroma to FAISS ({index_type})")
+    copied = 0
+    for ids, documents, embeddings in source.iter_batches(batch_size):
+        target.add(ids, documents, embeddings=embeddings)
+        copied += len(ids)
+        logger.info(f"  {copied}/{total}")
+    target.persist()
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a Chroma collection to FAISS")
+    parser.add_argument("--collection", default="bge_base_en_v1_5")
+    parser.add_argument("--index-type", default=settings.faiss_index_type, choices=FAISS_INDEX_TYPES)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.time()
+    count = migrate(args.collection, args.index_type, args.batch_size)
+    logger.info(f"✅ Migrated {count} chunks in {round(time.time() - start, 2)}s")
@@ -3,9 +3,20 @@ from pydantic import BaseModel
 from datetime import datetime
 
 
+class SearchFilters(BaseModel):
+    """Scope retrieval to some documents, pages (inclusive) or upload dates"""
+    filenames: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+
 class ChatRequest(BaseModel):
     question: str
     chat_history: Optional[List[Dict[str, str]]] = []
+    filters: Optional[SearchFilters] = None
+    debug: bool = False  # include the per-stage latency breakdown in the response
 
 
 class DocumentSource(BaseModel):
@@ -19,6 +30,28 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[DocumentSource]
     processing_time: float
+    cached: bool = False
+    fact_match: bool = False
+    context_stats: Optional[Dict[str, int]] = None
+    debug: Optional[Dict[str, Any]] = None
+
+
+class BatchChatRequest(BaseModel):
+    questions: List[str]
+    max_concurrency: Optional[int] = None
+    filters: Optional[SearchFilters] = None
+
+
+class BatchChatItem(ChatResponse):
+    question: str
+    timings: Dict[str, float] = {}
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
+    unique_chunks: int
+    timings: Dict[str, float] = {}
+    processing_time: float
 
 
 class DocumentInfo(BaseModel):
@@ -26,10 +59,14 @@ class DocumentInfo(BaseModel):
     upload_date: datetime
     chunks_count: int
     status: str
+    job_id: Optional[str] = None
+    content_hash: Optional[str] = None
 
 
 class DocumentsResponse(BaseModel):
     documents: List[DocumentInfo]
+    total_count: int = 0
+    next_cursor: Optional[str] = None
 
 
 class UploadResponse(BaseModel):
@@ -38,6 +75,28 @@ class UploadResponse(BaseModel):
     chunks_count: int
     processing_time: float
     message: str
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    pages_done: int
+    chunks_total: int
+    chunks_done: int
+    pages_total: int = 0
+    pages_changed: int = 0
+    error: Optional[str] = None
+    created_at: str
+    timings: Dict[str, float] = {}
+
+
+class DeleteDocumentResponse(BaseModel):
+    filename: str
+    chunks_removed: int
+    message: str
 
 
 class ChunkInfo(BaseModel):
@@ -49,4 +108,5 @@ class ChunkInfo(BaseModel):
 
 class ChunksResponse(BaseModel):
     chunks: List[ChunkInfo]
-    total_count: int 
\ No newline at end of file
+    total_count: int
+    next_cursor: Optional[str] = None 
\ No newline at end of file
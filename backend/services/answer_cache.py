@@ -0,0 +1,111 @@
+from typing import List, Dict, Any, Optional, FrozenSet
+from collections import OrderedDict
+from langchain.schema import Document
+from services.metrics import record_cache
+from services.chunk_ids import chunk_id
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class _Entry:
+    __slots__ = ("question", "vector", "answer", "sources", "created_at")
+
+    def __init__(self, question: str, vector: List[float], answer: str, sources: List[Dict[str, Any]]):
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.time()
+
+
+class SemanticAnswerCache:
+    """Answer cache matching questions by embedding similarity over the same retrieved chunks.
+
+    Entries are bucketed by the set of retrieved chunks, so a hit needs both a similar
+    question and an identical context. Everything is dropped when the corpus changes.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._buckets: "OrderedDict[FrozenSet[str], List[_Entry]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(documents: List[Document]) -> FrozenSet[str]:
+        return frozenset(chunk_id(doc) for doc in documents)
+
+    def lookup(self, vector: List[float], documents: List[Document]) -> Optional[Dict[str, Any]]:
+        key = self.make_key(documents)
+        now = time.time()
+        with self._lock:
+            entries = self._buckets.get(key, [])
+            live = [e for e in entries if now - e.created_at < self.ttl_seconds]
+            if len(live) != len(entries):
+                self._size -= len(entries) - len(live)
+                if live:
+                    self._buckets[key] = live
+                else:
+                    self._buckets.pop(key, None)
+
+            best, best_score = None, 0.0
+            for entry in live:
+                score = _cosine(vector, entry.vector)
+                if score > best_score:
+                    best, best_score = entry, score
+
+            if best is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                record_cache("answer", 0, 1)
+                return None
+
+            self.hits += 1
+            record_cache("answer", 1, 0)
+            self._buckets.move_to_end(key)
+            logger.info(f"♻️ Answer cache hit ({best_score:.3f}) for cached question: {best.question}")
+            return {"answer": best.answer, "sources": best.sources, "similarity": round(best_score, 4)}
+
+    def store(self, question: str, vector: List[float], documents: List[Document], answer: str,
+              sources: List[Dict[str, Any]]) -> None:
+        key = self.make_key(documents)
+        with self._lock:
+            self._buckets.setdefault(key, []).append(_Entry(question, vector, answer, sources))
+            self._buckets.move_to_end(key)
+            self._size += 1
+            while self._size > self.max_entries and self._buckets:
+                _, evicted = self._buckets.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, **_) -> None:
+        """Drop every entry; accepts the vector store change-listener arguments"""
+        with self._lock:
+            if self._size:
+                logger.info(f"🧹 Invalidating {self._size} cached answers after corpus change")
+            self._buckets.clear()
+            self._size = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self._size,
+            "invalidations": self.invalidations,
+        }
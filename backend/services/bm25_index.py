@@ -0,0 +1,220 @@
+from typing import List, Dict, Tuple, Iterable, Optional
+from collections import Counter
+from langchain.schema import Document
+from services.search_filter import SearchFilter
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Keeps financial tokens such as "sg&a", "1,234.5" and "year-over-year" whole
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[a-z]+(?:[&'\-][a-z]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were what which "
+    "with how much many did does do".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        # Compound words are also indexed by their parts ("year-over-year" -> "year", "over")
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part and part not in _STOPWORDS)
+        if "," in token:
+            tokens.append(token.replace(",", ""))
+    return tokens
+
+
+class BM25Index:
+    """Incrementally maintained BM25 index persisted in SQLite.
+
+    Postings carry the document length so a query touches only the posting lists of
+    its own terms, and scoring and top-k selection run inside SQLite; corpus statistics
+    are kept in memory and updated on every write.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL, length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, doc_len INTEGER NOT NULL,
+                PRIMARY KEY (term, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_id ON postings(id);
+            CREATE INDEX IF NOT EXISTS idx_docs_filename ON docs(json_extract(metadata, '$.filename'));
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+        self._doc_count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        self._total_length = total
+        logger.info(f"📚 BM25 index at {path}: {self._doc_count} chunks")
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def add(self, ids: List[str], documents: List[Document]) -> None:
+        with self._lock:
+            existing = self._existing(ids)
+            if existing:
+                self._delete_locked(list(existing))
+
+            docs_rows, posting_rows = [], []
+            df_delta: Counter = Counter()
+            for doc_id, doc in zip(ids, documents):
+                counts = Counter(tokenize(doc.page_content))
+                length = sum(counts.values())
+                docs_rows.append((doc_id, doc.page_content, json.dumps(doc.metadata), length))
+                posting_rows.extend((term, doc_id, tf, length) for term, tf in counts.items())
+                df_delta.update(counts.keys())
+                self._doc_count += 1
+                self._total_length += length
+
+            self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", docs_rows)
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", posting_rows)
+            self._conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                df_delta.items()
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._conn.commit()
+
+    def _existing(self, ids: List[str]) -> set:
+        found = set()
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            found.update(
+                row[0] for row in self._conn.execute(f"SELECT id FROM docs WHERE id IN ({placeholders})", part)
+            )
+        return found
+
+    def _delete_locked(self, ids: List[str]) -> None:
+        for doc_id in ids:
+            row = self._conn.execute("SELECT length FROM docs WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            terms = [t for (t,) in self._conn.execute("SELECT term FROM postings WHERE id = ?", (doc_id,))]
+            self._conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", [(t,) for t in terms])
+            self._conn.execute("DELETE FROM postings WHERE id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+            self._doc_count -= 1
+            self._total_length -= row[0]
+        self._conn.execute("DELETE FROM terms WHERE df <= 0")
+
+    # Filter fields live in the metadata JSON; filename has an expression index
+    _FILTER_COLUMNS = {field: f"json_extract(metadata, '$.{field}')" for field in ("filename", "page", "uploaded_at")}
+
+    def search(
+        self, query: str, k: int = 10, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[str, Document, float]]:
+        """Return (id, document, bm25 score) for the best ``k`` chunks matching the filter"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            n = self._doc_count
+            if n == 0:
+                return []
+            avgdl = self._total_length / n
+
+            placeholders = ",".join("?" * len(terms))
+            dfs = dict(self._conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms))
+            if not dfs:
+                return []
+            weighted = [(t, math.log(1 + (n - df + 0.5) / (df + 0.5))) for t, df in dfs.items()]
+
+            clause, filter_params = search_filter.to_sql(self._FILTER_COLUMNS) if search_filter else (None, [])
+            # Terms in most chunks have long posting lists but little weight. Score only the
+            # chunks holding a selective term first (MaxScore): if the k-th score beats
+            # anything the common terms alone could add up to, that is the exact top k.
+            selective = [t for t, _ in weighted if dfs[t] <= n / 2]
+            common_bound = sum(idf * (self.k1 + 1) for t, idf in weighted if dfs[t] > n / 2)
+            top = None
+            if selective and common_bound:
+                top = self._top_k(weighted, avgdl, k, clause, filter_params, candidate_terms=selective)
+                if len(top) < k or top[-1][1] < common_bound:
+                    top = None
+            if top is None:
+                top = self._top_k(weighted, avgdl, k, clause, filter_params)
+            if not top:
+                return []
+            rows = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    f"SELECT id, content, metadata FROM docs WHERE id IN ({','.join('?' * len(top))})",
+                    [doc_id for doc_id, _ in top]
+                )
+            }
+
+        results = []
+        for doc_id, score in top:
+            content, metadata = rows[doc_id]
+            results.append((doc_id, Document(page_content=content, metadata=json.loads(metadata)), score))
+        return results
+
+
+    def _top_k(
+        self, weighted: List[Tuple[str, float]], avgdl: float, k: int, clause: Optional[str], filter_params: List,
+        candidate_terms: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Standard BM25 summed per chunk inside SQLite, so only the top k rows reach Python
+
+        With ``candidate_terms`` only chunks holding one of them are scored, each with a
+        primary-key lookup per query term instead of a scan of every posting list.
+        """
+        values = ",".join("(?, ?)" for _ in weighted)
+        allowed = f"IN (SELECT id FROM docs WHERE {clause})" if clause else "IS NOT NULL"
+        score = "SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * p.doc_len / ?)))"
+        params: List = [value for pair in weighted for value in pair]
+        if candidate_terms is None:
+            sql = (
+                f"WITH q(term, idf) AS (VALUES {values}) "
+                f"SELECT p.id, {score} AS score FROM q JOIN postings p ON p.term = q.term "
+                f"WHERE p.id {allowed} "
+            )
+            params += [self.k1, self.k1, self.b, self.b, avgdl] + filter_params
+        else:
+            sql = (
+                f"WITH q(term, idf) AS (VALUES {values}), "
+                f"c(id) AS (SELECT DISTINCT id FROM postings WHERE term IN ({','.join('?' * len(candidate_terms))}) "
+                f"AND id {allowed}) "
+                f"SELECT p.id, {score} AS score FROM c CROSS JOIN q JOIN postings p ON p.term = q.term AND p.id = c.id "
+            )
+            params += candidate_terms + filter_params + [self.k1, self.k1, self.b, self.b, avgdl]
+        sql += "GROUP BY p.id ORDER BY score DESC LIMIT ?"
+        return self._conn.execute(sql, params + [k]).fetchall()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuse several ranked id lists: score(id) = sum of 1 / (k + rank)"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return fused
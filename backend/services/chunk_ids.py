@@ -0,0 +1,14 @@
+from langchain.schema import Document
+import hashlib
+
+
+def chunk_id(doc: Document) -> str:
+    """Stable id of a stored chunk: its vector id and its key in every in-memory index
+
+    Built from filename, page, position on the page and content, so a re-extracted chunk
+    keeps its id while identical chunks on one page (repeated headers or table rows) stay
+    separate, one vector per chunk-store row.
+    """
+    meta = doc.metadata
+    raw = f"{meta.get('filename', '')}\0{meta.get('page', '')}\0{meta.get('chunk', '')}\0{doc.page_content}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
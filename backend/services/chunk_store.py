@@ -0,0 +1,224 @@
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Iterable, NamedTuple
+from langchain.schema import Document
+from services.chunk_ids import chunk_id
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkLocator(NamedTuple):
+    """Where a chunk lives in the store, plus the metadata searches filter on"""
+    filename: str
+    page: int
+    chunk: int
+    uploaded_at: Optional[float]
+
+    @classmethod
+    def of(cls, doc: Document) -> "ChunkLocator":
+        meta = doc.metadata
+        return cls(
+            sys.intern(str(meta.get("filename", ""))),
+            int(meta.get("page", 0)),
+            int(meta.get("chunk", 0)),
+            meta.get("uploaded_at")
+        )
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "page": self.page, "chunk": self.chunk, "uploaded_at": self.uploaded_at}
+
+
+class ChunkStore:
+    """Compact SQLite store of document chunks with indexed filename/page lookups.
+
+    Replaces the per-file ``<filename>.chunks.json`` dumps so chunk listings can be
+    paginated and filtered without loading the whole corpus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                filename TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                chunk INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_filename_page ON chunks(filename, page, id);
+            CREATE INDEX IF NOT EXISTS idx_chunks_page ON chunks(page, id);
+            CREATE INDEX IF NOT EXISTS idx_chunks_job ON chunks(job_id);
+            CREATE TABLE IF NOT EXISTS pages (
+                filename TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (filename, page)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    def add(self, filename: str, documents: List[Document], job_id: Optional[str] = None) -> None:
+        rows = [
+            (
+                job_id,
+                filename,
+                int(doc.metadata.get("page", 0)),
+                int(doc.metadata.get("chunk", 0)),
+                doc.page_content,
+                json.dumps(doc.metadata, separators=(",", ":"))
+            )
+            for doc in documents
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (job_id, filename, page, chunk, content, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def replace_previous(self, filename: str, job_id: str, keep_pages: Iterable[int] = ()) -> List[Document]:
+        """Drop chunks of earlier uploads of ``filename`` once ``job_id`` has fully landed
+
+        Chunks on ``keep_pages`` (pages the new upload left unchanged) are kept.
+        Returns the removed chunks.
+        """
+        keep = sorted(set(keep_pages))
+        where = "filename = ? AND (job_id IS NULL OR job_id != ?)"
+        if keep:
+            where += f" AND page NOT IN ({','.join('?' * len(keep))})"
+        params = [filename, job_id] + keep
+        with self._lock, self._conn:
+            rows = self._conn.execute(f"SELECT content, metadata FROM chunks WHERE {where}", params).fetchall()
+            self._conn.execute(f"DELETE FROM chunks WHERE {where}", params)
+        return [Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows]
+
+    def delete_job(self, job_id: str) -> List[Document]:
+        """Remove the chunks written by one ingestion job; returns the removed chunks"""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT content, metadata FROM chunks WHERE job_id = ?", (job_id,)).fetchall()
+            self._conn.execute("DELETE FROM chunks WHERE job_id = ?", (job_id,))
+        return [Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows]
+
+    def delete_file(self, filename: str) -> List[Document]:
+        """Remove every chunk and page hash of ``filename``; returns the removed chunks"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT content, metadata FROM chunks WHERE filename = ?", (filename,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM pages WHERE filename = ?", (filename,))
+        return [Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows]
+
+    def find_chunks(self, locators: Dict[str, ChunkLocator]) -> Dict[str, Document]:
+        """Load the chunks with the given ids, looked up by their locators"""
+        found: Dict[str, Document] = {}
+        with self._lock:
+            for position in {(loc.filename, loc.page, loc.chunk) for loc in locators.values()}:
+                rows = self._conn.execute(
+                    "SELECT content, metadata FROM chunks WHERE filename = ? AND page = ? AND chunk = ?", position
+                ).fetchall()
+                for content, metadata in rows:
+                    doc = Document(page_content=content, metadata=json.loads(metadata))
+                    key = chunk_id(doc)
+                    if key in locators:
+                        found[key] = doc
+        return found
+
+    def page_hashes(self, filename: str) -> Dict[int, str]:
+        """Content hash of every page of the last fully ingested upload of ``filename``"""
+        with self._lock:
+            rows = self._conn.execute("SELECT page, hash FROM pages WHERE filename = ?", (filename,)).fetchall()
+        return dict(rows)
+
+    def set_page_hashes(self, filename: str, hashes: Dict[int, str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages WHERE filename = ?", (filename,))
+            self._conn.executemany(
+                "INSERT INTO pages (filename, page, hash) VALUES (?, ?, ?)",
+                [(filename, page, digest) for page, digest in hashes.items()]
+            )
+
+    @staticmethod
+    def _where(filename: Optional[str], page: Optional[int]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if filename is not None:
+            clauses.append("filename = ?")
+            params.append(filename)
+        if page is not None:
+            clauses.append("page = ?")
+            params.append(page)
+        return (" AND ".join(clauses) or "1 = 1"), params
+
+    def count(self, filename: Optional[str] = None, page: Optional[int] = None) -> int:
+        where, params = self._where(filename, page)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM chunks WHERE {where}", params).fetchone()[0]
+
+    def list(
+        self,
+        filename: Optional[str] = None,
+        page: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return one page of chunks after ``cursor`` and the cursor of the next page"""
+        where, params = self._where(filename, page)
+        if cursor is not None:
+            where += " AND id > ?"
+            params.append(cursor)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, page, content, metadata FROM chunks WHERE {where} ORDER BY id LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        chunks = [
+            {"id": str(row[0]), "page": row[1], "content": row[2], "metadata": json.loads(row[3])}
+            for row in rows[:limit]
+        ]
+        return chunks, next_cursor
+
+    def iter_documents(self, batch_size: int = 1000, filename: Optional[str] = None) -> Iterator[Document]:
+        where, params = self._where(filename, None)
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, content, metadata FROM chunks WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                    params + [last, batch_size]
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, content, metadata in rows:
+                yield Document(page_content=content, metadata=json.loads(metadata))
+
+    def import_legacy_json(self, directory: str) -> int:
+        """One-off import of ``*.chunks.json`` files written before the store existed"""
+        if self.count() > 0 or not os.path.isdir(directory):
+            return 0
+        imported = 0
+        for fname in sorted(os.listdir(directory)):
+            if not fname.endswith(".chunks.json"):
+                continue
+            with open(os.path.join(directory, fname), "r") as f:
+                data = json.load(f)
+            filename = fname[:-len(".chunks.json")]
+            self.add(filename, [Document(page_content=c["text"], metadata=c["metadata"]) for c in data])
+            imported += len(data)
+        if imported:
+            logger.info(f"📥 Imported {imported} chunks from legacy JSON files")
+        return imported
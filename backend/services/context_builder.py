@@ -0,0 +1,112 @@
+from typing import List, Dict, Any, Tuple
+from langchain.schema import Document
+import hashlib
+import logging
+import re
+import tiktoken
+from services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Splitter overlaps shorter than this are treated as coincidence, not repeated text
+MIN_OVERLAP_CHARS = 8
+MAX_OVERLAP_CHARS = 400
+SEPARATOR = "\n\n"
+
+
+def _strip_overlap(previous: str, current: str) -> str:
+    """Drop the prefix of ``current`` that repeats the end of ``previous``"""
+    longest = min(len(previous), len(current), MAX_OVERLAP_CHARS)
+    for n in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:n]):
+            return current[n:].lstrip()
+    return current
+
+
+class ContextBuilder:
+    """Assembles the LLM context from ranked chunks under a token budget.
+
+    Exact duplicates are dropped, neighbouring chunks of the same page are merged with
+    their splitter overlap removed, and the merged blocks are packed in rank order
+    (the retriever returns chunks best-first) until the budget is spent.
+    """
+
+    def __init__(self, max_tokens: int = 3000, encoding_name: str = "cl100k_base"):
+        self.max_tokens = max_tokens
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self._separator_tokens = len(self.encoding.encode(SEPARATOR))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _dedupe(self, documents: List[Document]) -> List[Tuple[int, Document]]:
+        seen = set()
+        unique = []
+        for rank, doc in enumerate(documents):
+            digest = hashlib.sha1(_WHITESPACE_RE.sub(" ", doc.page_content).strip().encode("utf-8")).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            unique.append((rank, doc))
+        return unique
+
+    def _merge(self, ranked: List[Tuple[int, Document]]) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Merge runs of consecutive chunks from the same page into single blocks"""
+        groups: Dict[Tuple[Any, Any], List[Tuple[int, Document]]] = {}
+        for rank, doc in ranked:
+            key = (doc.metadata.get("filename"), doc.metadata.get("page"))
+            groups.setdefault(key, []).append((rank, doc))
+
+        blocks = []
+        for (filename, page), members in groups.items():
+            members.sort(key=lambda item: item[1].metadata.get("chunk", 0))
+            run_rank, run_text, run_chunks, last_chunk = None, "", [], None
+            for rank, doc in members:
+                chunk_no = doc.metadata.get("chunk")
+                if run_chunks and chunk_no is not None and last_chunk is not None and chunk_no == last_chunk + 1:
+                    run_text = run_text + "\n" + _strip_overlap(run_text, doc.page_content)
+                    run_rank = min(run_rank, rank)
+                    run_chunks.append(chunk_no)
+                else:
+                    if run_chunks:
+                        blocks.append((run_rank, run_text, {"filename": filename, "page": page, "chunks": run_chunks}))
+                    run_rank, run_text, run_chunks = rank, doc.page_content, [chunk_no]
+                last_chunk = chunk_no
+            if run_chunks:
+                blocks.append((run_rank, run_text, {"filename": filename, "page": page, "chunks": run_chunks}))
+
+        blocks.sort(key=lambda block: block[0])
+        return blocks
+
+    @timed("context_build")
+    def build(self, documents: List[Document]) -> Dict[str, Any]:
+        unique = self._dedupe(documents)
+        blocks = self._merge(unique)
+
+        parts, used, dropped, dropped_blocks = [], 0, 0, 0
+        for _, text, _ in blocks:
+            tokens = self.count_tokens(text)
+            cost = tokens + (self._separator_tokens if parts else 0)
+            if used + cost <= self.max_tokens:
+                parts.append(text)
+                used += cost
+            else:
+                dropped += tokens
+                dropped_blocks += 1
+
+        stats = {
+            "tokens_used": used,
+            "tokens_dropped": dropped,
+            "token_budget": self.max_tokens,
+            "chunks_in": len(documents),
+            "duplicates_removed": len(documents) - len(unique),
+            "blocks_used": len(parts),
+            "blocks_dropped": dropped_blocks,
+        }
+        logger.info(
+            f"🧱 Context: {used}/{self.max_tokens} tokens from {len(parts)} blocks "
+            f"({dropped} tokens dropped, {stats['duplicates_removed']} duplicates removed)"
+        )
+        return {"context": SEPARATOR.join(parts), "stats": stats}
@@ -0,0 +1,240 @@
+from typing import List, Dict, Any, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS_STATUSES = ("queued", "extracting", "embedding")
+# Processed uploads superseded by a later upload of the same filename
+REPLACED = "replaced"
+# Entries of a filename whose delete is running; no upload of it may start meanwhile
+DELETING = "deleting"
+DELETE_FAILED = "delete_failed"
+# Statuses that block both a new upload and a delete of the same filename
+BUSY_STATUSES = IN_PROGRESS_STATUSES + (DELETING,)
+
+
+class DocumentRegistry:
+    """Transactional registry of uploaded documents.
+
+    Every status change is a single-row SQLite transaction, so concurrent uploads
+    never lose entries and a write costs the same however many documents exist. The
+    entry also carries the job's progress, so any API worker can report on a job
+    that another worker is running.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT UNIQUE,
+                filename TEXT NOT NULL,
+                content_hash TEXT,
+                upload_date TEXT NOT NULL,
+                chunks_count INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                progress TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents(filename);
+            CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(content_hash);
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "progress" not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN progress TEXT")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "job_id": row[1],
+            "filename": row[2],
+            "content_hash": row[3],
+            "upload_date": row[4],
+            "chunks_count": row[5],
+            "status": row[6],
+        }
+
+    _COLUMNS = "id, job_id, filename, content_hash, upload_date, chunks_count, status"
+
+    def record(self, job_id: str, filename: str, upload_date: str, status: str,
+               chunks_count: int = 0, content_hash: Optional[str] = None,
+               progress: Optional[Dict[str, Any]] = None) -> None:
+        """Insert or update the entry of an ingestion job"""
+        progress_json = json.dumps(progress) if progress is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO documents (job_id, filename, content_hash, upload_date, chunks_count, status, progress) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, chunks_count = excluded.chunks_count, "
+                "content_hash = COALESCE(excluded.content_hash, documents.content_hash), "
+                "progress = COALESCE(excluded.progress, documents.progress)",
+                (job_id, filename, content_hash, upload_date, chunks_count, status, progress_json)
+            )
+
+    def claim_upload(self, job_id: str, filename: str, upload_date: str,
+                     content_hash: Optional[str] = None) -> Optional[str]:
+        """Record a queued job for ``filename`` unless an ingestion or delete of it is running
+
+        The check and the insert are one write transaction, so API workers racing on
+        the same filename cannot both start. Returns the blocking status, or None once
+        the job is recorded.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            busy = self._busy_status(filename)
+            if busy is None:
+                self._conn.execute(
+                    "INSERT INTO documents (job_id, filename, content_hash, upload_date, status) "
+                    "VALUES (?, ?, ?, ?, 'queued')",
+                    (job_id, filename, content_hash, upload_date)
+                )
+        return busy
+
+    def begin_delete(self, filename: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Mark every entry of ``filename`` as deleting, in the same transaction as the busy check
+
+        Returns the entries and the status that blocked the delete, if any; nothing is
+        marked when there are no entries or one is still busy.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM documents WHERE filename = ? ORDER BY id", (filename,)
+            ).fetchall()
+            busy = self._busy_status(filename)
+            if rows and busy is None:
+                self._conn.execute("UPDATE documents SET status = ? WHERE filename = ?", (DELETING, filename))
+        return [self._row_to_dict(row) for row in rows], busy
+
+    def fail_delete(self, filename: str) -> None:
+        """Release a delete that did not finish, so it can be retried or the file re-uploaded"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE documents SET status = ? WHERE filename = ? AND status = ?", (DELETE_FAILED, filename, DELETING)
+            )
+
+    def _busy_status(self, filename: str) -> Optional[str]:
+        row = self._conn.execute(
+            f"SELECT status FROM documents WHERE filename = ? AND status IN ({','.join('?' * len(BUSY_STATUSES))}) "
+            "LIMIT 1",
+            (filename, *BUSY_STATUSES)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Last recorded progress of an ingestion job, in the shape of ``IngestionJob.to_dict``"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._COLUMNS}, progress FROM documents WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[7]:
+            return json.loads(row[7])
+        # Entries recorded before progress was stored
+        entry = self._row_to_dict(row)
+        done = entry["chunks_count"] if entry["status"] == "processed" else 0
+        return {
+            "job_id": job_id,
+            "filename": entry["filename"],
+            "status": entry["status"],
+            "pages_done": 0,
+            "chunks_total": entry["chunks_count"],
+            "chunks_done": done,
+            "created_at": entry["upload_date"],
+        }
+
+    def mark_replaced(self, filename: str, job_id: str) -> int:
+        """Retire the processed uploads of ``filename`` other than ``job_id``, whose chunks it replaced"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE documents SET status = ? WHERE filename = ? AND status = 'processed' "
+                "AND (job_id IS NULL OR job_id != ?)",
+                (REPLACED, filename, job_id)
+            )
+        return cursor.rowcount
+
+    def find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Latest current (processed or in-progress) upload with identical content
+
+        Replaced versions do not count, so re-uploading an older version reverts to it.
+        """
+        statuses = ("processed",) + IN_PROGRESS_STATUSES
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM documents WHERE content_hash = ? "
+                f"AND status IN ({','.join('?' * len(statuses))}) ORDER BY id DESC LIMIT 1",
+                (content_hash, *statuses)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find_by_filename(self, filename: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM documents WHERE filename = ? ORDER BY id", (filename,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    @staticmethod
+    def _status_clause(status: Optional[str]) -> Tuple[str, List[Any]]:
+        """Rows of ``status``; without one, every row but replaced versions"""
+        if status is None:
+            return "status != ?", [REPLACED]
+        return "status = ?", [status]
+
+    def count(self, status: Optional[str] = None) -> int:
+        clause, params = self._status_clause(status)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM documents WHERE {clause}", params).fetchone()[0]
+
+    def list(self, status: Optional[str] = None, cursor: Optional[int] = None,
+             limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        clause, params = self._status_clause(status)
+        clauses = [clause]
+        if cursor is not None:
+            clauses.append("id > ?")
+            params.append(cursor)
+        where = " AND ".join(clauses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM documents WHERE {where} ORDER BY id LIMIT ?", params + [limit + 1]
+            ).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [self._row_to_dict(row) for row in rows[:limit]], next_cursor
+
+    def delete_filename(self, filename: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+        return cursor.rowcount
+
+    def import_legacy_json(self, metadata_path: str) -> int:
+        """One-off import of the old documents_metadata.json list"""
+        if not os.path.exists(metadata_path):
+            return 0
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+                return 0
+        with open(metadata_path, "r") as f:
+            entries = json.load(f)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO documents (job_id, filename, content_hash, upload_date, chunks_count, status) "
+                "VALUES (?, ?, NULL, ?, ?, ?)",
+                [
+                    (e.get("job_id"), e["filename"], e["upload_date"], e.get("chunks_count", 0), e.get("status", "processed"))
+                    for e in entries
+                ]
+            )
+        logger.info(f"📥 Imported {len(entries)} documents from {metadata_path}")
+        return len(entries)
@@ -0,0 +1,251 @@
+from typing import List, Optional, Dict, Any
+from concurrent.futures import Future
+from langchain.embeddings.base import Embeddings
+from config import settings
+import hashlib
+import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_ENGINES = ("huggingface", "onnx_int8", "fake")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words vectors for offline runs and benchmarks.
+
+    Needs no model download. Texts sharing words land close together, so retrieval
+    still returns plausible neighbours.
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in _TOKEN_RE.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class OnnxInt8Embeddings(Embeddings):
+    """CPU embedding engine running an int8 dynamically quantized ONNX export of the model.
+
+    The model is exported and quantized once and cached under ``cache_dir``. Texts are
+    embedded in batches of similar token length so little compute is spent on padding.
+    Vectors are CLS-pooled and L2-normalized like the sentence-transformers config of BGE
+    (which ends in a Normalize module), so they live in the same space as the fp32
+    ``HuggingFaceEmbeddings`` baseline and can share its collection.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = "./onnx_models",
+        num_threads: Optional[int] = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+    ):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self._np = np
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.model_path = os.path.join(self.model_dir, "model.int8.onnx")
+
+        if not os.path.exists(self.model_path):
+            self._export()
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        # InferenceSession.run is thread-safe, but one run already uses every intra-op thread
+        self._lock = threading.Lock()
+        logger.info(f"⚡ ONNX int8 embeddings loaded from {self.model_path} ({options.intra_op_num_threads} threads)")
+
+    def _export(self) -> None:
+        """Export the fp32 model to ONNX and quantize its weights to int8"""
+        import torch
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        from transformers import AutoModel, AutoTokenizer
+
+        start = time.time()
+        os.makedirs(self.model_dir, exist_ok=True)
+        logger.info(f"📤 Exporting {self.model_name} to ONNX (one-off)")
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        sample = tokenizer(["warm-up"], return_tensors="pt")
+
+        fp32_path = os.path.join(self.model_dir, "model.fp32.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask", "token_type_ids"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "token_type_ids": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14,
+            )
+
+        # Write-then-rename so a crash mid-quantization never leaves a model that looks cached
+        tmp_path = self.model_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, self.model_path)
+        os.remove(fp32_path)
+        tokenizer.save_pretrained(self.model_dir)
+        logger.info(f"✅ Exported and quantized {self.model_name} in {round(time.time() - start, 2)}s")
+
+    def _embed_batch(self, texts: List[str]):
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        inputs = {name: encoded[name].astype(self._np.int64) for name in self._input_names}
+        with self._lock:
+            hidden = self.session.run(None, inputs)[0]
+        cls = hidden[:, 0]
+        return cls / self._np.maximum(self._np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Sort by token length so each batch pads to roughly its own length
+        lengths = [
+            len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+        ]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for i in range(0, len(order), self.batch_size):
+            batch = order[i:i + self.batch_size]
+            for index, vector in zip(batch, self._embed_batch([texts[j] for j in batch])):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+
+class DynamicBatchingEmbeddings(Embeddings):
+    """Merges concurrent embedding calls from many threads into shared model batches.
+
+    One worker thread takes the oldest waiting call, then keeps collecting calls for
+    up to ``max_wait_ms`` while the batch holds fewer than ``max_batch`` texts, runs a
+    single forward pass and hands every caller its own slice. Used by the shared
+    embedding service, where query and ingestion calls arrive from many API workers.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._stats = {"calls": 0, "batches": 0, "texts": 0, "max_batch_texts": 0}
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+            with self._lock:
+                self._stats["calls"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["texts"] += len(texts)
+                self._stats["max_batch_texts"] = max(self._stats["max_batch_texts"], len(texts))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch_texts"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queued_calls"] = self._queue.qsize()
+        return stats
+
+
+def create_embedding_model(model_name: str) -> Embeddings:
+    """Build the embedding engine chosen by ``settings.embedding_engine``"""
+    engine = settings.embedding_engine
+    if engine == "fake":
+        return FakeEmbeddings()
+    if engine == "onnx_int8":
+        return OnnxInt8Embeddings(
+            model_name,
+            cache_dir=settings.onnx_model_dir,
+            num_threads=settings.onnx_num_threads or None,
+            batch_size=settings.onnx_batch_size,
+        )
+    if engine != "huggingface":
+        raise ValueError(f"Unknown embedding engine: {engine}")
+
+    # Imported here so importing the service stays cheap; the model loads on construction
+    from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={"device": "cuda" if settings.use_gpu else "cpu"}
+    )
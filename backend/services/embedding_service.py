@@ -0,0 +1,252 @@
+from typing import List, Any, Tuple, Callable, Optional
+from collections import deque
+from multiprocessing.connection import Client, Listener
+from langchain.schema import Document
+from services.embedding_cache import QueryEmbeddingLRU
+from services.vector_store import VectorStoreService
+from services.search_filter import SearchFilter
+from services.metrics import span
+from config import settings
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# VectorStoreService methods API workers may call on the service
+EXPOSED_METHODS = frozenset({
+    "add_documents", "delete_documents", "embed_query", "embed_queries", "similarity_search_by_vectors",
+    "lexical_search", "get_document_count", "flush", "wait_until_persisted", "warm_up", "get_persistence_stats",
+    "get_embedding_cache_stats",
+})
+
+
+class EmbeddingServiceError(RuntimeError):
+    """The embedding service is unreachable or the remote call failed"""
+
+
+class EmbeddingServer:
+    """Serves one VectorStoreService to the API workers over a Unix socket.
+
+    Each connection is handled on its own thread; embedding calls from all of them
+    meet in the store's dynamic batcher. Corpus changes are kept in a short numbered
+    log so workers can replay them into their in-memory keyword indexes and caches.
+    """
+
+    def __init__(self, vector_store: VectorStoreService, socket_path: str, authkey: bytes, change_log_size: int = 256):
+        self.vector_store = vector_store
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._changes = deque(maxlen=change_log_size)
+        vector_store.add_change_listener(self._record_change)
+
+    def _record_change(self, added: List[Document], deleted_ids: List[str]) -> None:
+        with self._lock:
+            self._seq += 1
+            self._changes.append((self._seq, added, deleted_ids))
+
+    def changes(self, since: int) -> Tuple[List[Tuple[int, List[Document], List[str]]], bool]:
+        """Changes after ``since`` and whether the log still reaches back that far"""
+        with self._lock:
+            entries = [entry for entry in self._changes if entry[0] > since]
+            complete = not self._changes or self._changes[0][0] <= since + 1
+            return entries, complete
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        # A deep backlog so many workers connecting at startup are not refused
+        listener = Listener(self.socket_path, family="AF_UNIX", backlog=128, authkey=self.authkey)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"🔌 Embedding service listening on {self.socket_path}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"⚠️ Rejected embedding service connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _handle(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method == "changes":
+                        result = self.changes(*args)
+                    elif method in EXPOSED_METHODS:
+                        result = getattr(self.vector_store, method)(*args, **kwargs)
+                    else:
+                        raise ValueError(f"Unknown method: {method}")
+                    response = ("ok", result, self._seq)
+                except Exception as e:
+                    logger.exception(f"❌ Embedding service call {method} failed")
+                    response = ("error", f"{type(e).__name__}: {e}", self._seq)
+                try:
+                    conn.send(response)
+                except (EOFError, OSError):
+                    return
+
+
+class RemoteVectorStore:
+    """VectorStoreService stand-in for API workers when the embedding service owns the model and index.
+
+    Connections are pooled per worker. Query vectors are still memoised locally, and
+    every response carries the service's change number, so corpus changes made through
+    any worker reach this worker's change listeners on its next call.
+    """
+
+    def __init__(self, socket_path: str, authkey: bytes, connect_timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._change_listeners: List[Callable[..., None]] = []
+        self._sync_lock = threading.Lock()
+        self.query_cache = QueryEmbeddingLRU(
+            lambda query: self._call("embed_query", query), max_size=settings.query_embedding_cache_size
+        )
+        # Local state is loaded from the chunk store, so only changes from now on are replayed
+        _, self._seq = self._request("get_document_count")
+        logger.info(f"✅ Connected to the embedding service at {socket_path}")
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() >= deadline:
+                    raise EmbeddingServiceError(f"Embedding service at {self.socket_path} is not running: {e}")
+                time.sleep(0.5)
+
+    def _request(self, method: str, *args, **kwargs) -> Tuple[Any, int]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send((method, args, kwargs))
+            status, result, seq = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise EmbeddingServiceError(f"Embedding service connection failed: {e}")
+        self._idle.put(conn)
+        if status == "error":
+            raise EmbeddingServiceError(result)
+        return result, seq
+
+    def _call(self, method: str, *args, **kwargs):
+        result, seq = self._request(method, *args, **kwargs)
+        if seq > self._seq:
+            self._sync()
+        return result
+
+    def _sync(self) -> None:
+        """Replay corpus changes made through the service since the last call"""
+        with self._sync_lock:
+            (entries, complete), _ = self._request("changes", self._seq)
+            if not complete:
+                logger.warning("⚠️ Missed embedding service changes; restart this worker to reload its indexes")
+            for seq, added, deleted_ids in entries:
+                self._notify_change(added=added, deleted_ids=deleted_ids)
+                self._seq = seq
+
+    def add_documents(self, documents: List[Document]) -> None:
+        logger.info(f"➕ Sending {len(documents)} documents to the embedding service...")
+        self._call("add_documents", documents)
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        self._call("delete_documents", document_ids)
+
+    def similarity_search(
+        self, query: str, k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        vector = self.embed_query(query)
+        with span("vector_search"):
+            return self._call("similarity_search_by_vectors", [vector], k=k, search_filter=search_filter)[0]
+
+    def lexical_search(
+        self, query: str, k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        with span("lexical_search"):
+            return self._call("lexical_search", query, k=k, search_filter=search_filter)
+
+    def similarity_search_by_vectors(
+        self, vectors: List[List[float]], k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        with span("vector_search_batch"):
+            return self._call("similarity_search_by_vectors", vectors, k=k, search_filter=search_filter)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.query_cache.get(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return self.query_cache.get_many(queries, lambda texts: self._call("embed_queries", texts))
+
+    def warm_up(self) -> None:
+        self._call("warm_up")
+
+    def flush(self) -> int:
+        return self._call("flush")
+
+    def wait_until_persisted(self, timeout: float = 60.0) -> None:
+        self._call("wait_until_persisted", timeout)
+
+    def close(self) -> None:
+        """Close this worker's connections; the service keeps running"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def get_persistence_stats(self) -> dict:
+        return self._call("get_persistence_stats")
+
+    def get_embedding_cache_stats(self) -> dict:
+        stats = self._call("get_embedding_cache_stats")
+        return {**stats, "service_query_cache": stats.get("query_cache"), "query_cache": self.query_cache.stats()}
+
+    def get_document_count(self) -> int:
+        return self._call("get_document_count")
+
+    def add_change_listener(self, listener: Callable[..., None]) -> None:
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, added: List[Document] = None, deleted_ids: List[str] = None) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(added=added or [], deleted_ids=deleted_ids or [])
+            except Exception:
+                logger.exception("❌ Vector store change listener failed")
+
+
+def service_authkey() -> bytes:
+    """The configured socket secret; connections exchange pickles, so there is no default"""
+    if not settings.embedding_service_authkey:
+        raise ValueError("EMBEDDING_SERVICE_AUTHKEY must be set to use the embedding service")
+    return settings.embedding_service_authkey.encode("utf-8")
+
+
+def create_vector_store():
+    """The in-process VectorStoreService, or a client of the shared embedding service"""
+    if settings.embedding_service_mode == "remote":
+        return RemoteVectorStore(
+            settings.embedding_service_socket,
+            service_authkey(),
+            connect_timeout=settings.embedding_service_connect_timeout
+        )
+    if settings.embedding_service_mode != "local":
+        raise ValueError(f"Unknown embedding service mode: {settings.embedding_service_mode}")
+    return VectorStoreService()
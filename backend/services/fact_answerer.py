@@ -0,0 +1,222 @@
+from typing import List, Dict, Any, Optional
+from services.fact_store import FactStore, METRICS, METRIC_NAMES, QUESTION_ALIASES, LABEL_METRICS, normalize_label
+from services.search_filter import SearchFilter
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_YEAR_RE = re.compile(r"\b(?:FY\s?)?((?:19|20)\d{2})\b", re.I)
+_QUALITATIVE_RE = re.compile(r"\b(why|explain|describe|reasons?|strategy|outlook|risks?|drivers?|impact)\b", re.I)
+_GROWTH_RE = re.compile(
+    r"growth|\bgrow|\byoy\b|year[- ]over[- ]year|\bchange|increase|decrease|decline|compared|\bvs\.?\b|versus", re.I
+)
+_DEBT_TO_EQUITY_RE = re.compile(r"debt[- ]to[- ]equity|debt\s*/\s*equity|\bd/e\b|leverage ratio", re.I)
+# Ratios and per-share figures the fact path does not compute go to the LLM
+_UNSUPPORTED_RE = re.compile(r"\bratio\b|margin|return on|per share|\bpercent|\beps\b|\broe\b|\broa\b", re.I)
+_NON_CONSOLIDATED_RE = re.compile(r"non[- ]consolidated|separate", re.I)
+
+# Row labels too generic to name a metric in a question ("cost of sales", "sales and marketing")
+_LABEL_ONLY = {"sales"}
+_PHRASES = {
+    phrase: {"metric": metric}
+    for metric, phrases in list(METRICS.items()) + list(QUESTION_ALIASES.items())
+    for phrase in phrases if phrase not in _LABEL_ONLY
+}
+# Words that may surround a metric name without changing which line item it is; any
+# other neighbour ("deferred revenue", "revenue per employee") makes the match partial
+_FRAME_WORDS = {
+    "what", "was", "were", "is", "are", "the", "our", "its", "their", "how", "much", "did", "does",
+    "show", "give", "me", "tell", "report", "reported", "in", "for", "during", "at", "as", "by", "from",
+    "to", "between", "vs", "versus", "compared", "with", "year", "fy", "last", "this", "over", "yoy",
+    "growth", "change", "increase", "decrease", "decline", "grow", "grew", "amount", "value", "level", "figure",
+}
+
+def _format_value(value: float, unit: str) -> str:
+    text = f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+    return f"{text} ({unit})" if unit else text
+
+
+class FactAnswerer:
+    """Answers metric, growth and debt-to-equity questions straight from the fact store.
+
+    Returns None whenever the question is qualitative or a needed fact is missing, so
+    the caller falls back to retrieval and the LLM.
+    """
+
+    def __init__(self, fact_store: FactStore):
+        self.fact_store = fact_store
+
+    @staticmethod
+    def _is_whole(tokens: List[str], start: int, end: int) -> bool:
+        """Whether tokens[start:end] names the whole line item rather than part of a longer one"""
+        before = tokens[start - 1] if start > 0 else None
+        after = tokens[end] if end < len(tokens) else None
+        if before == "of":
+            # "growth of revenue" but not "cost of sales"
+            before = tokens[start - 2] if start > 1 else None
+        elif before is not None and before.endswith("'s"):
+            before = None
+        return (before is None or before in _FRAME_WORDS) and (after is None or after in _FRAME_WORDS)
+
+    def _match_metric(self, question: str) -> Optional[Dict[str, str]]:
+        """The one line item the question names, or None when it is partial or ambiguous
+
+        Question phrases and stored row labels compete together and the longest match
+        wins, so a stored "cost of sales" row beats the revenue synonym inside it.
+        """
+        candidates = dict(_PHRASES)
+        for label in self.fact_store.labels:
+            if label not in candidates and len(label.split()) >= 2:
+                metric = LABEL_METRICS.get(label)
+                candidates[label] = {"metric": metric} if metric else {"label": label}
+
+        tokens = normalize_label(question).split()
+        text = f" {' '.join(tokens)} "
+        spans = []
+        for phrase, key in candidates.items():
+            if f" {phrase} " not in text:
+                continue
+            words = phrase.split()
+            for start in range(len(tokens) - len(words) + 1):
+                if tokens[start:start + len(words)] == words:
+                    spans.append((start, start + len(words), key))
+
+        # Matches inside a longer match ("sales" in "net sales") are not separate mentions
+        outer = [
+            (start, end, key) for start, end, key in spans
+            if not any(s <= start and end <= e and (s, e) != (start, end) for s, e, _ in spans)
+        ]
+        keys = {tuple(key.items()) for _, _, key in outer}
+        if len(keys) != 1 or not all(self._is_whole(tokens, start, end) for start, end, _ in outer):
+            return None
+        return dict(keys.pop())
+
+    def _facts(
+        self, key: Dict[str, str], scope: str, search_filter: Optional[SearchFilter] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Latest fact per period for a metric from its one reporting file, preferring the requested scope"""
+        facts = self.fact_store.find(**key)
+        if search_filter:
+            # Facts carry filename and page but no upload time, so date-scoped questions miss
+            facts = [fact for fact in facts if search_filter.matches(fact)]
+        if len({fact["filename"] for fact in facts}) != 1:
+            # Several filings report it and the question doesn't say which: leave it to retrieval
+            return {}
+        by_period: Dict[str, Dict[str, Any]] = {}
+        preference = [scope, "", "separate", "non-consolidated"] if scope else ["consolidated", "", "separate", "non-consolidated"]
+        for fact in facts:
+            current = by_period.get(fact["period"])
+            rank = preference.index(fact["scope"]) if fact["scope"] in preference else len(preference)
+            if current is None or rank < current["_rank"]:
+                by_period[fact["period"]] = {**fact, "_rank": rank}
+        return by_period
+
+    @staticmethod
+    def _source(fact: Dict[str, Any]) -> Dict[str, Any]:
+        content = f"{fact['label']} ({fact['period']}): {_format_value(fact['value'], fact['unit'])}"
+        metadata = {k: fact[k] for k in ("filename", "page", "statement", "label", "scope", "period", "value", "unit")}
+        return {"content": content, "page": fact["page"], "score": 1.0, "metadata": {**metadata, "source": "fact_store"}}
+
+    def answer(self, question: str, search_filter: Optional[SearchFilter] = None) -> Optional[Dict[str, Any]]:
+        if _QUALITATIVE_RE.search(question):
+            return None
+        years = sorted(set(_YEAR_RE.findall(question)), reverse=True)
+        scope = "non-consolidated" if _NON_CONSOLIDATED_RE.search(question) else ""
+
+        if _DEBT_TO_EQUITY_RE.search(question):
+            return self._debt_to_equity(years, scope, search_filter)
+        if _UNSUPPORTED_RE.search(question):
+            return None
+
+        key = self._match_metric(question)
+        if key is None:
+            return None
+        facts = self._facts(key, scope, search_filter)
+        if not facts:
+            return None
+        name = METRIC_NAMES.get(key.get("metric"), (key.get("label") or "").capitalize())
+
+        if _GROWTH_RE.search(question):
+            return self._growth(name, facts, years)
+
+        periods = years or [max(facts)]
+        if any(period not in facts for period in periods):
+            return None
+        used = [facts[period] for period in periods]
+        parts = [f"{_format_value(f['value'], f['unit'])} in {f['period']}" for f in used]
+        return self._result(f"{name} was {' and '.join(parts)}", used)
+
+    def _growth(self, name: str, facts: Dict[str, Dict[str, Any]], years: List[str]) -> Optional[Dict[str, Any]]:
+        if len(years) >= 2:
+            current, previous = years[0], years[1]
+        elif len(years) == 1:
+            current, previous = years[0], str(int(years[0]) - 1)
+        else:
+            ordered = sorted(facts, reverse=True)
+            if len(ordered) < 2:
+                return None
+            current, previous = ordered[0], ordered[1]
+        if current not in facts or previous not in facts:
+            return None
+
+        now, before = facts[current], facts[previous]
+        text = (
+            f"{name} was {_format_value(now['value'], now['unit'])} in {current} "
+            f"versus {_format_value(before['value'], before['unit'])} in {previous}"
+        )
+        if before["value"]:
+            growth = (now["value"] - before["value"]) / abs(before["value"]) * 100
+            text += f", a year-over-year change of {growth:+.1f}%"
+        return self._result(text, [now, before])
+
+    def _debt_to_equity(
+        self, years: List[str], scope: str, search_filter: Optional[SearchFilter] = None
+    ) -> Optional[Dict[str, Any]]:
+        debt = self._facts({"metric": "total_debt"}, scope, search_filter)
+        debt_name = "total debt"
+        if not debt:
+            debt, debt_name = self._facts({"metric": "total_liabilities"}, scope, search_filter), "total liabilities"
+        equity = self._facts({"metric": "total_equity"}, scope, search_filter)
+        assets = self._facts({"metric": "total_assets"}, scope, search_filter)
+
+        candidates = years or sorted(debt, reverse=True)[:1]
+        if not candidates:
+            return None
+        period = candidates[0]
+        if period not in debt:
+            return None
+
+        used = [debt[period]]
+        if period in equity:
+            equity_value = equity[period]["value"]
+            used.append(equity[period])
+            equity_text = _format_value(equity_value, equity[period]["unit"])
+        elif debt_name == "total liabilities" and period in assets:
+            # Equity derived from the balance sheet identity when no equity row was extracted
+            equity_value = assets[period]["value"] - debt[period]["value"]
+            used.append(assets[period])
+            equity_text = f"{_format_value(equity_value, assets[period]['unit'])} (total assets minus total liabilities)"
+        else:
+            return None
+        if not equity_value or len({fact["filename"] for fact in used}) != 1:
+            return None
+
+        ratio = debt[period]["value"] / equity_value
+        text = (
+            f"The debt-to-equity ratio for {period} was {ratio:.2f} "
+            f"({debt_name} {_format_value(debt[period]['value'], debt[period]['unit'])} / equity {equity_text})"
+        )
+        return self._result(text, used)
+
+    def _result(self, text: str, facts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        pages = sorted({(f["filename"], f["page"]) for f in facts})
+        citation = "; ".join(f"{filename}, page {page}" for filename, page in pages)
+        logger.info(f"📐 Answered from the fact store ({len(facts)} facts)")
+        return {
+            "answer": f"{text}. [Source: {citation}]",
+            "sources": [self._source(f) for f in facts],
+            "retrieved_docs_count": 0,
+            "cached": False,
+            "fact_match": True
+        }
@@ -0,0 +1,303 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Set
+import fitz
+import logging
+import os
+import pdfplumber
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Canonical metrics and the row labels / question phrases that name them
+METRICS: Dict[str, Tuple[str, ...]] = {
+    "revenue": ("revenue", "revenues", "total revenue", "total revenues", "sales", "net sales"),
+    "gross_profit": ("gross profit",),
+    "operating_income": ("operating income", "operating profit", "income from operations", "operating loss"),
+    "net_income": ("net income", "net profit", "profit for the year", "profit for the period", "net loss"),
+    "total_assets": ("total assets",),
+    "total_liabilities": ("total liabilities",),
+    "total_equity": ("total equity", "total shareholders' equity", "total stockholders' equity", "equity"),
+    "total_debt": ("total debt", "total borrowings", "borrowings"),
+    "cash": ("cash and cash equivalents",),
+    "operating_cash_flow": (
+        "net cash from operating activities", "net cash provided by operating activities",
+        "net cash flows from operating activities", "cash flows from operating activities",
+    ),
+}
+METRIC_NAMES = {
+    "revenue": "Revenue", "gross_profit": "Gross profit", "operating_income": "Operating income",
+    "net_income": "Net income", "total_assets": "Total assets", "total_liabilities": "Total liabilities",
+    "total_equity": "Total equity", "total_debt": "Total debt", "cash": "Cash and cash equivalents",
+    "operating_cash_flow": "Net cash from operating activities",
+}
+# Extra phrasings that only appear in questions
+QUESTION_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "operating_cash_flow": ("operating cash flow", "cash from operations"),
+    "cash": ("cash balance", "cash position"),
+}
+
+STATEMENT_PATTERNS = (
+    ("income_statement", re.compile(
+        r"income statement|statements? of (?:comprehensive )?(?:income|operations|profit or loss)", re.I)),
+    ("balance_sheet", re.compile(r"balance sheet|statements? of financial position", re.I)),
+    ("cash_flow", re.compile(r"statements? of cash flows?|cash flow statement", re.I)),
+    ("summary", re.compile(r"summary financial|financial highlights|selected financial data", re.I)),
+)
+
+_PERIOD_RE = re.compile(r"\b(?:FY\s?)?((?:19|20)\d{2})\b")
+_VALUE_RE = re.compile(r"^\(?-?\d[\d,]*(?:\.\d+)?\)?%?$")
+_DASHES = {"-", "–", "—"}
+_UNIT_RE = re.compile(
+    r"unit\s*:\s*([^)\n]+)|\bin\s+((?:thousands|millions|billions)(?:\s+of\s+[A-Za-z]+)?)", re.I
+)
+_SCOPE_RE = re.compile(r"\((non-consolidated|consolidated|separate)\)", re.I)
+_NOTE_RE = re.compile(r"\(\s*notes?[^)]*\)|\([^)]*\)", re.I)
+_WORD_RE = re.compile(r"[a-z][a-z' &/-]*[a-z]")
+
+
+def normalize_label(label: str) -> str:
+    label = _NOTE_RE.sub(" ", label.lower())
+    return " ".join(_WORD_RE.findall(label))
+
+
+LABEL_METRICS = {synonym: metric for metric, synonyms in METRICS.items() for synonym in synonyms}
+
+
+def _parse_value(token: str) -> Optional[float]:
+    token = token.strip().rstrip("%")
+    if not token or token in _DASHES:
+        return None
+    negative = token.startswith("(") and token.endswith(")") or token.startswith("-")
+    try:
+        value = float(token.strip("()-").replace(",", ""))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def _periods(cells: Iterable[str]) -> List[str]:
+    return [m.group(1) for cell in cells for m in _PERIOD_RE.finditer(cell or "")]
+
+
+def _is_period_header(cells: List[str]) -> bool:
+    periods = _periods(cells)
+    words = sum(len(_WORD_RE.findall((cell or "").lower())) for cell in cells)
+    return len(periods) >= 2 and words <= len(periods) + 3
+
+
+def _line_row(line: str, n_periods: int) -> Optional[Tuple[str, List[Optional[float]]]]:
+    """Split ``Label 1,234 (567) - 89`` into its label and trailing values"""
+    tokens = line.split()
+    values: List[str] = []
+    while tokens and (_VALUE_RE.match(tokens[-1]) or tokens[-1] in _DASHES):
+        values.insert(0, tokens.pop())
+    label = " ".join(tokens)
+    if not values or not re.search(r"[A-Za-z]", label):
+        return None
+
+    # "Operating Income - 7,730,313 ..." : a dash before a number is a sign when there
+    # are more tokens than periods, otherwise it stands for a nil value
+    merged: List[Optional[float]] = []
+    i, surplus = 0, len(values) - n_periods
+    while i < len(values):
+        if values[i] in _DASHES and surplus > 0 and i + 1 < len(values) and values[i + 1] not in _DASHES:
+            merged.append(-abs(_parse_value(values[i + 1]) or 0.0))
+            i += 2
+            surplus -= 1
+        else:
+            merged.append(_parse_value(values[i]))
+            i += 1
+    return label, merged
+
+
+def _classify(text: str) -> str:
+    for statement, pattern in STATEMENT_PATTERNS:
+        if pattern.search(text):
+            return statement
+    return "table"
+
+
+def _unit(text: str) -> str:
+    match = _UNIT_RE.search(text)
+    if not match:
+        return ""
+    return (match.group(1) or match.group(2)).strip()
+
+
+def _fact(page: int, statement: str, unit: str, label: str, period: str, value: float) -> Dict[str, Any]:
+    scope = _SCOPE_RE.search(label)
+    normalized = normalize_label(label)
+    return {
+        "page": page,
+        "statement": statement,
+        "label": normalized,
+        "metric": LABEL_METRICS.get(normalized),
+        "scope": scope.group(1).lower() if scope else "",
+        "period": period,
+        "value": value,
+        "unit": unit,
+    }
+
+
+def _facts_from_tables(tables, page: int, statement: str, unit: str) -> List[Dict[str, Any]]:
+    facts = []
+    for table in tables:
+        columns: Dict[int, str] = {}
+        for row in table:
+            cells = [(cell or "").strip() for cell in row]
+            if _is_period_header(cells):
+                columns = {i: _periods([cell])[0] for i, cell in enumerate(cells) if _periods([cell])}
+                continue
+            if not columns:
+                continue
+            label = next((cell for cell in cells if re.search(r"[A-Za-z]", cell)), "")
+            if not label:
+                continue
+            for i, period in columns.items():
+                value = _parse_value(cells[i]) if i < len(cells) else None
+                if value is not None:
+                    facts.append(_fact(page, statement, unit, label, period, value))
+    return facts
+
+
+def _facts_from_text(text: str, page: int, statement: str, unit: str) -> List[Dict[str, Any]]:
+    facts, periods = [], []
+    for line in text.splitlines():
+        if _is_period_header(line.split()):
+            periods = _periods([line])
+            continue
+        if not periods:
+            continue
+        row = _line_row(line, len(periods))
+        if row is None:
+            continue
+        label, values = row
+        for period, value in zip(periods, values[-len(periods):]):
+            if value is not None:
+                facts.append(_fact(page, statement, unit, label, period, value))
+    return facts
+
+
+def extract_facts(file_path: str, pages: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+    """Pull (line item, period, value) facts out of the financial tables of a PDF
+
+    Pages are screened with PyMuPDF text for a period header row; only those are read
+    with pdfplumber, whose table extraction keeps the period columns aligned. Pages
+    where no table is found fall back to parsing the text line by line.
+    """
+    with fitz.open(file_path) as pdf:
+        wanted = range(1, pdf.page_count + 1) if pages is None else sorted(set(pages))
+        candidates = []
+        for page_number in wanted:
+            text = pdf[page_number - 1].get_text("text") or ""
+            if any(_is_period_header(line.split()) for line in text.splitlines()):
+                candidates.append(page_number)
+
+    facts: List[Dict[str, Any]] = []
+    if not candidates:
+        return facts
+    with pdfplumber.open(file_path) as pdf:
+        for page_number in candidates:
+            page = pdf.pages[page_number - 1]
+            text = page.extract_text() or ""
+            statement, unit = _classify(text), _unit(text)
+            page_facts = _facts_from_tables(page.extract_tables(), page_number, statement, unit)
+            if not page_facts:
+                page_facts = _facts_from_text(text, page_number, statement, unit)
+            facts.extend(page_facts)
+    return facts
+
+
+class FactStore:
+    """Indexed SQLite store of numeric facts from financial statement tables"""
+
+    _COLUMNS = "id, filename, page, statement, label, metric, scope, period, value, unit"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS facts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                filename TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                statement TEXT NOT NULL,
+                label TEXT NOT NULL,
+                metric TEXT,
+                scope TEXT NOT NULL,
+                period TEXT NOT NULL,
+                value REAL NOT NULL,
+                unit TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_facts_metric ON facts(metric, period);
+            CREATE INDEX IF NOT EXISTS idx_facts_label ON facts(label, period);
+            CREATE INDEX IF NOT EXISTS idx_facts_filename_page ON facts(filename, page);
+            """
+        )
+        self._conn.commit()
+        self._labels = self._load_labels()
+
+    def _load_labels(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT label FROM facts")}
+
+    def add(self, filename: str, facts: List[Dict[str, Any]], job_id: Optional[str] = None) -> None:
+        rows = [
+            (job_id, filename, f["page"], f["statement"], f["label"], f["metric"], f["scope"],
+             f["period"], f["value"], f["unit"])
+            for f in facts
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO facts (job_id, filename, page, statement, label, metric, scope, period, value, unit) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._labels.update(f["label"] for f in facts)
+
+    def replace_previous(self, filename: str, job_id: str, keep_pages: Iterable[int] = ()) -> int:
+        """Drop facts of earlier uploads of ``filename``, except on pages left unchanged"""
+        keep = sorted(set(keep_pages))
+        where = "filename = ? AND (job_id IS NULL OR job_id != ?)"
+        if keep:
+            where += f" AND page NOT IN ({','.join('?' * len(keep))})"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"DELETE FROM facts WHERE {where}", [filename, job_id] + keep)
+        self._labels = self._load_labels()
+        return cursor.rowcount
+
+    def delete_job(self, job_id: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM facts WHERE job_id = ?", (job_id,))
+        self._labels = self._load_labels()
+        return cursor.rowcount
+
+    def delete_file(self, filename: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM facts WHERE filename = ?", (filename,))
+        self._labels = self._load_labels()
+        return cursor.rowcount
+
+    @property
+    def labels(self) -> Set[str]:
+        return self._labels
+
+    def find(self, metric: Optional[str] = None, label: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Facts for a canonical metric or a raw row label, newest upload first"""
+        column, key = ("metric", metric) if metric is not None else ("label", label)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM facts WHERE {column} = ? ORDER BY id DESC", (key,)
+            ).fetchall()
+        names = [c.strip() for c in self._COLUMNS.split(",")]
+        return [dict(zip(names, row)) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
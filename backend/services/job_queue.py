@@ -0,0 +1,290 @@
+from typing import List, Dict, Any, Optional, Callable, Set
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+from langchain.schema import Document
+from services.pdf_processor import PDFProcessor, page_hashes
+from services.fact_store import extract_facts
+from services.vector_store import VectorStoreService
+from services.metrics import observe_stage
+from config import settings
+import asyncio
+import queue
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_END_OF_STREAM = object()
+
+
+class IngestionJob:
+    def __init__(self, filename: str, file_path: str, content_hash: Optional[str] = None, job_id: Optional[str] = None):
+        self.id = job_id or str(uuid4())
+        self.filename = filename
+        self.file_path = file_path
+        self.content_hash = content_hash
+        self.status = "queued"
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.pages_total = 0
+        self.pages_changed = 0
+        self.chunks_reused = 0
+        # Page hashes of this upload and the pages whose content matches the previous upload
+        self.page_hashes: Dict[int, str] = {}
+        self.unchanged_pages: Set[int] = set()
+        self._facts_future = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat() + "Z"
+        self.timings: Dict[str, float] = {}
+        self._started = time.time()
+        # Stamped on every chunk so searches can filter by upload date
+        self.uploaded_at = round(self._started, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "chunks_total": self.chunks_total,
+            "chunks_done": self.chunks_done,
+            "pages_total": self.pages_total,
+            "pages_changed": self.pages_changed,
+            "error": self.error,
+            "created_at": self.created_at,
+            "timings": dict(self.timings),
+        }
+
+
+class IngestionJobQueue:
+    """Runs PDF ingestion off the event loop with a bounded number of concurrent jobs.
+
+    Each job is a two-stage stream: a producer thread extracts pages (page ranges go to
+    the process pool) and splits them into fixed-size chunk batches, and a consumer
+    embeds and stores each batch as it arrives. A bounded queue between the two stages
+    provides backpressure, so memory stays flat and chunks become searchable batch by
+    batch. When ``previous_pages`` knows the page hashes of an earlier upload of the same
+    file, only pages whose content changed are extracted and embedded. If a job fails,
+    ``on_failure`` discards what it had already stored.
+    """
+
+    def __init__(
+        self,
+        pdf_processor: PDFProcessor,
+        vector_store: VectorStoreService,
+        max_workers: int = None,
+        batch_size: int = None,
+        queue_depth: int = None,
+        on_stage: Optional[Callable[[IngestionJob], None]] = None,
+        on_batch: Optional[Callable[[IngestionJob, List[Document]], None]] = None,
+        on_complete: Optional[Callable[[IngestionJob], None]] = None,
+        previous_pages: Optional[Callable[[str], Dict[int, str]]] = None,
+        on_facts: Optional[Callable[[IngestionJob, List[Dict[str, Any]]], None]] = None,
+        on_failure: Optional[Callable[[IngestionJob], None]] = None,
+    ):
+        self.pdf_processor = pdf_processor
+        self.vector_store = vector_store
+        self.max_workers = max_workers or settings.ingestion_workers
+        self.batch_size = batch_size or settings.ingestion_batch_size
+        self.queue_depth = queue_depth or settings.ingestion_queue_depth
+        self.on_stage = on_stage
+        self.on_batch = on_batch
+        self.on_complete = on_complete
+        self.previous_pages = previous_pages
+        self.on_facts = on_facts
+        self.on_failure = on_failure
+
+        self._process_pool = ProcessPoolExecutor(max_workers=pdf_processor.extraction_workers)
+        self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, filename: str, file_path: str, content_hash: Optional[str] = None, job_id: Optional[str] = None
+    ) -> IngestionJob:
+        """Register a job and schedule it on the running event loop
+
+        Finished jobs are evicted; ``on_stage`` has recorded their final state by then.
+        """
+        job = IngestionJob(filename, file_path, content_hash=content_hash, job_id=job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._set_stage(job, "queued")
+
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        logger.info(f"🗂 Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    async def _run(self, job: IngestionJob) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            job.timings["queued"] = round(time.time() - job._started, 3)
+            try:
+                await loop.run_in_executor(self._thread_pool, self._stream, job)
+
+                if job.chunks_total == 0 and not job.unchanged_pages:
+                    raise ValueError("No text found in PDF.")
+
+                if job._facts_future is not None:
+                    await self._store_facts(job)
+
+                if self.on_complete:
+                    await loop.run_in_executor(self._thread_pool, self.on_complete, job)
+
+                job.timings["total"] = round(time.time() - job._started, 3)
+                self._set_stage(job, "processed")
+                logger.info(
+                    f"✅ Job {job.id} processed {job.filename} "
+                    f"({job.chunks_total} chunks, {job.timings['total']}s)"
+                )
+            except Exception as e:
+                logger.exception(f"❌ Ingestion job {job.id} failed")
+                job.error = str(e)
+                # Batches stored before the failure must not be served next to the previous version
+                if self.on_failure:
+                    try:
+                        await loop.run_in_executor(self._thread_pool, self.on_failure, job)
+                    except Exception:
+                        logger.exception(f"❌ Failed to discard the partial output of job {job.id}")
+                job.timings["total"] = round(time.time() - job._started, 3)
+                self._set_stage(job, "failed")
+            finally:
+                with self._lock:
+                    self._jobs.pop(job.id, None)
+
+    async def _store_facts(self, job: IngestionJob) -> None:
+        """Collect the table facts extracted alongside the chunks; failures only cost the fast path"""
+        loop = asyncio.get_running_loop()
+        stage_start = time.time()
+        try:
+            facts = await asyncio.wrap_future(job._facts_future)
+            await loop.run_in_executor(self._thread_pool, self.on_facts, job, facts)
+        except Exception:
+            logger.exception(f"❌ Fact extraction failed for job {job.id}")
+        finally:
+            job._facts_future = None
+            job.timings["facts"] = round(time.time() - stage_start, 3)
+
+    def _stream(self, job: IngestionJob) -> None:
+        """Consume chunk batches from the producer and embed them as they arrive"""
+        batches: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+
+        producer = threading.Thread(
+            target=self._produce, args=(job, batches, stop), name=f"extract-{job.id[:8]}", daemon=True
+        )
+        self._set_stage(job, "extracting")
+        producer.start()
+
+        embedding_time = 0.0
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _END_OF_STREAM:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+
+                if job.status != "embedding":
+                    self._set_stage(job, "embedding")
+
+                stage_start = time.time()
+                self.vector_store.add_documents(batch)
+                embedding_time += time.time() - stage_start
+
+                job.chunks_done += len(batch)
+                if self.on_batch:
+                    self.on_batch(job, batch)
+
+            # With write-behind persistence the batches above were only buffered: wait for
+            # the group commit that covers them so "processed" means the vectors are stored
+            stage_start = time.time()
+            self.vector_store.wait_until_persisted()
+            job.timings["persist_wait"] = round(time.time() - stage_start, 3)
+        finally:
+            stop.set()
+            producer.join()
+            job.timings["embedding"] = round(embedding_time, 3)
+            observe_stage("ingest_embedding", embedding_time)
+
+    def _plan_pages(self, job: IngestionJob) -> Optional[List[int]]:
+        """Pages to (re-)extract, or None for the whole document"""
+        job.page_hashes = page_hashes(job.file_path)
+        job.pages_total = len(job.page_hashes)
+        previous = self.previous_pages(job.filename) if self.previous_pages else {}
+        if not previous:
+            job.pages_changed = job.pages_total
+            return None
+
+        changed = [page for page, digest in job.page_hashes.items() if previous.get(page) != digest]
+        job.unchanged_pages = set(job.page_hashes) - set(changed)
+        job.pages_changed = len(changed)
+        logger.info(
+            f"🧩 {job.filename}: {len(changed)}/{job.pages_total} pages changed since the previous upload"
+        )
+        return changed
+
+    def _produce(self, job: IngestionJob, batches: queue.Queue, stop: threading.Event) -> None:
+        stage_start = time.time()
+        try:
+            pages = self._plan_pages(job)
+            if self.on_facts:
+                # Table facts are read in a worker process while the chunks are embedded
+                job._facts_future = self._process_pool.submit(extract_facts, job.file_path, pages)
+            for batch in self.pdf_processor.iter_chunk_batches(
+                job.file_path, self.batch_size, executor=self._process_pool, pages=pages
+            ):
+                for chunk in batch:
+                    chunk.metadata["filename"] = job.filename
+                    chunk.metadata["uploaded_at"] = job.uploaded_at
+                job.chunks_total += len(batch)
+                job.pages_done = max(job.pages_done, batch[-1].metadata["page"])
+                if not self._put(batches, batch, stop):
+                    return
+            self._put(batches, _END_OF_STREAM, stop)
+        except Exception as e:
+            self._put(batches, e, stop)
+        finally:
+            job.timings["extracting"] = round(time.time() - stage_start, 3)
+            observe_stage("ingest_extracting", time.time() - stage_start)
+
+    @staticmethod
+    def _put(batches: queue.Queue, item, stop: threading.Event) -> bool:
+        """Block while the consumer is behind; give up once it has stopped"""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _set_stage(self, job: IngestionJob, status: str) -> None:
+        job.status = status
+        if self.on_stage:
+            try:
+                self.on_stage(job)
+            except Exception:
+                logger.exception(f"❌ Failed to record stage '{status}' for job {job.id}")
+
+    async def shutdown(self) -> None:
+        """Wait for running jobs, then tear down the worker pools"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._thread_pool.shutdown(wait=True)
+        self._process_pool.shutdown(wait=True)
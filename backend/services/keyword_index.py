@@ -0,0 +1,189 @@
+from typing import List, Dict, Set, FrozenSet, Iterable, Optional
+from collections import deque
+import heapq
+from langchain.schema import Document
+from services.chunk_ids import chunk_id
+from services.chunk_store import ChunkStore, ChunkLocator
+from services.search_filter import SearchFilter
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORDS = [
+    "revenue", "total revenue", "net sales", "sales", "2025", "income", "amount",
+    "operating profit", "growth", "increase", "change", "yoy", "year-over-year", "2024", "2023", "%",
+    "cost of goods", "operating expenses", "cost", "cogs", "sg&a", "main expenses", "expenditure", "items",
+    "cash flow", "operating cash", "financing cash", "investing cash", "net cash", "free cash flow",
+    "debt ratio", "total liabilities", "equity", "leverage", "debt to equity", "financial structure"
+]
+
+
+def load_keywords(path: Optional[str]) -> List[str]:
+    """Read the keyword vocabulary from a JSON list, falling back to the built-in one"""
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            keywords = [str(kw).lower() for kw in json.load(f) if str(kw).strip()]
+        logger.info(f"🔑 Loaded {len(keywords)} keywords from {path}")
+        return keywords
+    return list(DEFAULT_KEYWORDS)
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton finding every keyword occurring in a text in one pass"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({kw.lower() for kw in keywords if kw})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[FrozenSet[str]] = [frozenset()]
+
+        outputs: List[Set[str]] = [set()]
+        for kw in self.keywords:
+            node = 0
+            for ch in kw:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                node = nxt
+            outputs[node].add(kw)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                outputs[child] |= outputs[self._fail[child]]
+
+        self._out = [frozenset(o) for o in outputs]
+
+    def find(self, text: str) -> FrozenSet[str]:
+        found: Set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return frozenset(found)
+
+
+class KeywordIndex:
+    """Per-chunk keyword hits computed once at ingestion, with an inverted index over them
+
+    Only ids, keyword sets and the few metadata fields searches filter on are kept in
+    memory; chunk text stays in the chunk store and is read back for the handful of
+    chunks a keyword scan returns. Every API worker holds one of these, so its size
+    must not grow with the corpus text.
+    """
+
+    def __init__(self, keywords: Iterable[str], chunk_store: ChunkStore):
+        self.matcher = KeywordMatcher(keywords)
+        self.chunk_store = chunk_store
+        self._hits: Dict[str, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._locators: Dict[str, ChunkLocator] = {}
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        # Most chunks hit one of a few keyword combinations; each is stored once
+        self._hit_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def keywords(self) -> List[str]:
+        return self.matcher.keywords
+
+    def add_documents(self, documents: Iterable[Document]) -> None:
+        with self._lock:
+            for doc in documents:
+                self._index(chunk_id(doc), doc)
+
+    def _index(self, key: str, doc: Document) -> FrozenSet[str]:
+        hits = self.matcher.find(doc.page_content)
+        hits = self._hit_sets.setdefault(hits, hits)
+        self._hits[key] = hits
+        if key not in self._locators:
+            self._locators[key] = ChunkLocator.of(doc)
+            self._order[key] = self._next_order
+            self._next_order += 1
+        for kw in hits:
+            self._postings.setdefault(kw, set()).add(key)
+        return hits
+
+    def remove(self, keys: Iterable[str]) -> None:
+        """Forget chunks by id"""
+        with self._lock:
+            for key in keys:
+                hits = self._hits.pop(key, frozenset())
+                self._locators.pop(key, None)
+                self._order.pop(key, None)
+                for kw in hits:
+                    self._postings.get(kw, set()).discard(key)
+
+    def keywords_for(self, doc: Document) -> FrozenSet[str]:
+        """Keyword hits of a chunk; chunks not seen at ingestion are matched once and remembered"""
+        key = chunk_id(doc)
+        hits = self._hits.get(key)
+        if hits is None:
+            with self._lock:
+                hits = self._index(key, doc)
+        return hits
+
+    def has_keyword(self, doc: Document) -> bool:
+        return bool(self.keywords_for(doc))
+
+    def matching_documents(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        limit: int = 50,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Document]:
+        """Documents containing any of the given keywords (all keywords by default), in ingestion order"""
+        with self._lock:
+            terms = self.keywords if keywords is None else [kw.lower() for kw in keywords]
+            keys: Set[str] = set()
+            for kw in terms:
+                keys |= self._postings.get(kw, set())
+            if search_filter:
+                keys = {key for key in keys if search_filter.matches(self._locators[key].metadata())}
+            first = heapq.nsmallest(limit, keys, key=self._order.__getitem__)
+            locators = {key: self._locators[key] for key in first}
+        # Chunks whose rows are not written yet (or already replaced) are skipped
+        found = self.chunk_store.find_chunks(locators)
+        return [found[key] for key in first if key in found]
+
+    def rebuild(self, keywords: Iterable[str]) -> None:
+        """Swap in a new vocabulary and re-match every indexed chunk, reading its text from the chunk store"""
+        matcher = KeywordMatcher(keywords)
+        with self._lock:
+            # Chunks indexed from now on are matched with the new vocabulary directly
+            self.matcher = matcher
+            stale = set(self._hits)
+
+        rematched: Dict[str, FrozenSet[str]] = {}
+        for doc in self.chunk_store.iter_documents():
+            key = chunk_id(doc)
+            if key in stale:
+                rematched[key] = matcher.find(doc.page_content)
+
+        with self._lock:
+            for key, hits in rematched.items():
+                if key in self._hits:
+                    self._hits[key] = self._hit_sets.setdefault(hits, hits)
+            self._postings = {}
+            for key, hits in self._hits.items():
+                for kw in hits:
+                    self._postings.setdefault(kw, set()).add(key)
+        logger.info(f"🔑 Keyword index rebuilt: {len(self.keywords)} keywords, {len(rematched)} chunks")
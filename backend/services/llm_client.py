@@ -0,0 +1,142 @@
+from typing import Iterator, Optional
+from config import settings
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upstream HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LLMClient:
+    """Minimal completion interface used by RAGPipeline"""
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Complete ``prompt``, giving up on the upstream call after ``timeout`` seconds"""
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield the completion as text fragments; defaults to a single fragment"""
+        yield self.generate(prompt, timeout=timeout)
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed call may succeed when repeated (network errors by default)"""
+        # requests' connection and timeout errors derive from OSError too
+        return isinstance(error, OSError)
+
+
+class CohereLLMClient(LLMClient):
+    """Cohere generate endpoint over one pooled HTTP session
+
+    The cohere 4.x SDK opens a new ``requests.Session`` per call and only takes a
+    client-wide timeout, so the endpoint is called directly: connections are kept
+    alive across calls and every call gets its own timeout.
+    """
+
+    def __init__(self, api_key: str, model: str = "command", max_tokens: int = 512, temperature: float = 0,
+                 timeout: float = 120.0, pool_size: int = 10, api_url: str = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = f"{(api_url or os.getenv('CO_API_URL', 'https://api.cohere.ai')).rstrip('/')}/v1/generate"
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"BEARER {api_key}", "Request-Source": "rag-backend"})
+        # Keep-alive connections sized to the gateway's concurrency cap; retries are left
+        # to the gateway so backoff is not applied twice
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def _post(self, prompt: str, stream: bool, timeout: Optional[float]):
+        body = {
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+        response = self.session.post(self.url, json=body, stream=stream, timeout=timeout or self.timeout)
+        if response.status_code >= 400:
+            with response:
+                response.raise_for_status()
+        return response
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        with self._post(prompt, False, timeout) as response:
+            return response.json()["generations"][0]["text"].strip()
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        # ``timeout`` bounds the connect and each wait between streamed lines
+        with self._post(prompt, True, timeout) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("is_finished"):
+                    return
+                if event.get("text"):
+                    yield event["text"]
+
+    def is_retryable(self, error):
+        from requests import HTTPError
+
+        if isinstance(error, HTTPError):
+            return error.response is not None and error.response.status_code in RETRYABLE_STATUSES
+        return super().is_retryable(error)
+
+
+class FakeLLMClient(LLMClient):
+    """Deterministic local stand-in: answers with the opening of the prompt's context
+
+    ``latency`` is slept before the first fragment (at most ``timeout``, then it raises
+    TimeoutError like an HTTP read timeout) and the first ``fail_first`` calls raise
+    ConnectionError, to exercise the gateway's timeouts and retries.
+    """
+
+    def __init__(self, words: int = 40, delay: float = 0.0, latency: float = 0.0, fail_first: int = 0):
+        self.words = words
+        self.delay = delay
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return "".join(self.stream(prompt, timeout=timeout)).strip()
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        with self._lock:
+            self.calls += 1
+            failing = self.calls <= self.fail_first
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake LLM read timed out after {timeout}s")
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ConnectionError("Fake LLM failure")
+        context = prompt.split("\n", 1)[-1]
+        for i, word in enumerate(context.split()[:self.words]):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word if i == 0 else " " + word
+
+
+def create_llm_client() -> LLMClient:
+    """Build the LLM client selected by settings.llm_provider"""
+    if settings.llm_provider == "fake":
+        logger.info("🧪 Using fake LLM client")
+        return FakeLLMClient()
+    if settings.llm_provider == "cohere":
+        return CohereLLMClient(
+            settings.openai_api_key, timeout=settings.llm_timeout_seconds, pool_size=settings.llm_max_concurrency
+        )
+    raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
@@ -0,0 +1,295 @@
+from typing import Dict, Any, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, TimeoutError as FutureTimeoutError
+from collections import deque
+from services.llm_client import LLMClient, create_llm_client
+from services.metrics import LLM_CALLS, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, observe_stage
+from config import settings
+import hashlib
+import logging
+import math
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STREAM_END = object()
+
+
+class LLMTimeoutError(TimeoutError):
+    """The call did not complete before its deadline"""
+
+
+class LLMOverloadedError(RuntimeError):
+    """The gateway queue is full; the call was rejected without waiting"""
+
+
+class LLMGatewayClosedError(RuntimeError):
+    """The gateway was closed before the call could run"""
+
+
+def _percentile_ms(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank] * 1000, 1)
+
+
+class LLMGateway(LLMClient):
+    """Shared front for one provider client: bounded concurrency, coalescing, deadlines and retries.
+
+    Upstream calls run on a fixed pool of ``max_concurrency`` workers; callers beyond
+    that wait in a queue of at most ``max_queue`` calls and are rejected once it is full.
+    Concurrent ``generate`` calls with the same prompt share one upstream call. Every
+    caller waits at most ``timeout`` seconds, and retryable errors are retried with
+    full-jitter exponential backoff while the deadline allows. Streams are not
+    coalesced and are only retried before their first fragment.
+
+    Each upstream attempt gets the time left until the deadline as its client timeout,
+    so a worker slot is released about when its caller gives up rather than holding
+    on for a full upstream timeout. For streams that timeout bounds each wait between
+    fragments, and a stream its caller abandoned is closed at the next fragment.
+    """
+
+    def __init__(self, client: LLMClient, max_concurrency: int = 8, max_queue: int = 64, timeout: float = 30.0,
+                 max_retries: int = 2, backoff_base: float = 0.25, backoff_max: float = 4.0):
+        self.client = client
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        # Re-entrant: a done-callback may run inline while the submitting thread holds the lock
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, Future] = {}
+        self._queued = 0
+        self._active = 0
+        self._closed = False
+        self._latencies = deque(maxlen=1000)
+        self._queue_waits = deque(maxlen=1000)
+        self._counters = {
+            "requests": 0, "upstream_calls": 0, "coalesced": 0, "retries": 0,
+            "timeouts": 0, "failures": 0, "rejected": 0,
+        }
+        LLM_QUEUE_DEPTH.set_function(lambda: self._queued)
+        LLM_IN_FLIGHT.set_function(lambda: self._active)
+        logger.info(
+            f"🚦 LLM gateway: {self.max_concurrency} concurrent calls, queue {max_queue}, "
+            f"{timeout}s deadline, {max_retries} retries"
+        )
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """Queue ``fn`` for a worker slot; the caller holds the lock"""
+        if self._closed:
+            raise LLMGatewayClosedError("LLM gateway is closed")
+        if self._queued >= self.max_queue:
+            self._counters["rejected"] += 1
+            LLM_CALLS.labels("rejected").inc()
+            raise LLMOverloadedError(f"LLM queue is full ({self.max_queue} waiting)")
+        future = self._executor.submit(self._run, fn, time.perf_counter(), *args)
+        # Still under the lock, so ``_run`` cannot dequeue the call before it is counted
+        self._queued += 1
+        future.add_done_callback(self._dequeue_cancelled)
+        return future
+
+    def _dequeue_cancelled(self, future: Future) -> None:
+        # A call cancelled by ``close`` never reaches ``_run``, which dequeues the others
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _run(self, fn: Callable, enqueued: float, *args):
+        wait = time.perf_counter() - enqueued
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._queue_waits.append(wait)
+        observe_stage("llm_queue_wait", wait)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _with_retries(self, call: Callable, deadline: float, can_retry: Callable[[], bool] = lambda: True):
+        attempt = 0
+        while True:
+            if time.monotonic() >= deadline:
+                raise LLMTimeoutError("LLM deadline passed before the call could start")
+            with self._lock:
+                self._counters["upstream_calls"] += 1
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= self.max_retries or not can_retry() or not self.client.is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    raise
+                with self._lock:
+                    self._counters["retries"] += 1
+                LLM_CALLS.labels("retry").inc()
+                logger.warning(f"⚠️ LLM call failed ({e}); retry {attempt + 1} in {round(delay, 2)}s")
+                time.sleep(delay)
+                attempt += 1
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        return max(0.001, deadline - time.monotonic())
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _record(self, outcome: str, started: float = None) -> None:
+        with self._lock:
+            if outcome == "timeout":
+                self._counters["timeouts"] += 1
+            elif outcome == "error":
+                self._counters["failures"] += 1
+            elif started is not None:
+                self._latencies.append(time.perf_counter() - started)
+        LLM_CALLS.labels(outcome).inc()
+
+    def generate(self, prompt: str) -> str:
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._closed:
+                raise LLMGatewayClosedError("LLM gateway is closed")
+            self._counters["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                # An identical prompt is already in flight: wait for its answer instead
+                self._counters["coalesced"] += 1
+                LLM_CALLS.labels("coalesced").inc()
+            else:
+                future = self._submit(
+                    self._with_retries,
+                    lambda: self.client.generate(prompt, timeout=self._remaining(deadline)),
+                    deadline
+                )
+                self._inflight[key] = future
+                future.add_done_callback(lambda done: self._forget(key, done))
+
+        try:
+            answer = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except CancelledError as e:
+            self._record("error")
+            raise LLMGatewayClosedError("LLM gateway closed before the call could run") from e
+        except Exception as e:
+            # The upstream call itself is cut off at the deadline, with the client's own timeout error
+            if isinstance(e, (FutureTimeoutError, LLMTimeoutError)) or time.monotonic() >= deadline:
+                self._record("timeout")
+                raise LLMTimeoutError(f"LLM call exceeded its {self.timeout}s deadline") from e
+            self._record("error")
+            raise
+        self._record("ok", started)
+        return answer
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        fragments: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        with self._lock:
+            self._counters["requests"] += 1
+            future = self._submit(self._pump, prompt, fragments, cancelled, deadline)
+
+        def fail_if_cancelled(done: Future) -> None:
+            if done.cancelled():
+                fragments.put(LLMGatewayClosedError("LLM gateway closed before the stream could start"))
+
+        future.add_done_callback(fail_if_cancelled)
+
+        try:
+            while True:
+                try:
+                    item = fragments.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._record("timeout")
+                    raise LLMTimeoutError(f"LLM stream exceeded its {self.timeout}s deadline")
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, LLMTimeoutError) or isinstance(item, Exception) and time.monotonic() >= deadline:
+                    self._record("timeout")
+                    raise LLMTimeoutError(f"LLM stream exceeded its {self.timeout}s deadline") from item
+                if isinstance(item, Exception):
+                    self._record("error")
+                    raise item
+                yield item
+        finally:
+            # Stops the upstream stream if the consumer went away or timed out
+            cancelled.set()
+        self._record("ok", started)
+
+    def _pump(self, prompt: str, fragments: queue.Queue, cancelled: threading.Event, deadline: float) -> None:
+        emitted = False
+
+        def call():
+            nonlocal emitted
+            upstream = self.client.stream(prompt, timeout=self._remaining(deadline))
+            try:
+                for fragment in upstream:
+                    if cancelled.is_set() or time.monotonic() >= deadline:
+                        return
+                    emitted = True
+                    fragments.put(fragment)
+            finally:
+                # Closes the HTTP response, so the connection is not held for an abandoned stream
+                upstream.close()
+
+        try:
+            self._with_retries(call, deadline, can_retry=lambda: not emitted)
+            fragments.put(_STREAM_END)
+        except Exception as e:
+            fragments.put(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, concurrency, outcome counters and latency percentiles"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            waits = sorted(self._queue_waits)
+            return {
+                "enabled": True,
+                "provider": type(self.client).__name__,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout,
+                "queue_depth": self._queued,
+                "in_flight": self._active,
+                "coalescing_prompts": len(self._inflight),
+                **self._counters,
+                "latency_p50_ms": _percentile_ms(latencies, 50),
+                "latency_p95_ms": _percentile_ms(latencies, 95),
+                "latency_p99_ms": _percentile_ms(latencies, 99),
+                "queue_wait_p95_ms": _percentile_ms(waits, 95),
+            }
+
+    def close(self) -> None:
+        """Stop taking calls and fail the ones still queued with ``LLMGatewayClosedError``"""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_llm_gateway() -> LLMClient:
+    """The configured provider client, behind the gateway unless it is disabled"""
+    client = create_llm_client()
+    if not settings.llm_gateway_enabled:
+        return client
+    return LLMGateway(
+        client,
+        max_concurrency=settings.llm_max_concurrency,
+        max_queue=settings.llm_max_queue,
+        timeout=settings.llm_timeout_seconds,
+        max_retries=settings.llm_max_retries,
+        backoff_base=settings.llm_backoff_base_seconds,
+        backoff_max=settings.llm_backoff_max_seconds
+    )
@@ -0,0 +1,70 @@
+from typing import Dict, Optional, Iterator, Callable
+from contextlib import contextmanager
+from functools import wraps
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram
+import time
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Latency of pipeline stages",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CHUNKS_EMBEDDED = Counter("rag_chunks_embedded_total", "Chunks sent to the embedding model")
+CACHE_LOOKUPS = Counter("rag_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+LLM_TOKENS = Counter("rag_llm_tokens_total", "LLM tokens by direction", ["kind"])
+FACT_LOOKUPS = Counter("rag_fact_lookups_total", "Fact-store fast path lookups by result", ["result"])
+RERANK_TRUNCATED = Counter("rag_rerank_truncated_total", "Rerank stages cut short by the latency budget")
+LLM_CALLS = Counter("rag_llm_calls_total", "LLM gateway calls by outcome", ["outcome"])
+LLM_QUEUE_DEPTH = Gauge("rag_llm_queue_depth", "LLM calls waiting for a gateway slot")
+LLM_IN_FLIGHT = Gauge("rag_llm_in_flight", "LLM calls currently running upstream")
+FALLBACKS = Counter("rag_fallback_total", "Requests served by a fallback path", ["path"])
+
+# Per-request stage breakdown, only collected while a trace is active
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("rag_trace", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block into the stage histogram and the active request trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of ``span`` for whole functions"""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_spans(trace: Dict[str, float]) -> Iterator[Dict[str, float]]:
+    """Record every span finished in this context into ``trace`` (seconds per stage)"""
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
@@ -1,18 +1,118 @@
+import hashlib
 import os
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Tuple, Iterator, Iterable, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor
+from collections import deque
 import PyPDF2
 import pdfplumber
+import fitz
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from services.metrics import span
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+EXTRACTION_ENGINES = ("pdfplumber", "pymupdf")
+
+# Pages handed to a worker per task when streaming a document
+PAGES_PER_TASK = 16
+
+# A page counts as tabular when this share of its lines holds two or more numbers
+TABULAR_LINE_RATIO = 0.3
+_NUMBER_RE = re.compile(r"\(?-?\d[\d,]*(?:\.\d+)?\)?%?")
+
+
+def _looks_tabular(text: str) -> bool:
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return False
+    numeric_lines = sum(1 for line in lines if len(_NUMBER_RE.findall(line)) >= 2)
+    return numeric_lines / len(lines) >= TABULAR_LINE_RATIO
+
+
+def _extract_range_pdfplumber(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) with pdfplumber"""
+    results = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in range(start, end):
+            results.append((i + 1, pdf.pages[i].extract_text() or ""))
+    return results
+
+
+def _extract_range_pymupdf(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) with PyMuPDF, re-reading tabular pages with pdfplumber"""
+    results = []
+    tabular = []
+    with fitz.open(file_path) as pdf:
+        for i in range(start, end):
+            text = pdf[i].get_text("text") or ""
+            if _looks_tabular(text):
+                tabular.append(len(results))
+            results.append((i + 1, text))
+
+    if tabular:
+        with pdfplumber.open(file_path) as pdf:
+            for idx in tabular:
+                page_number = results[idx][0]
+                results[idx] = (page_number, pdf.pages[page_number - 1].extract_text() or "")
+    return results
+
+
+_RANGE_EXTRACTORS = {
+    "pdfplumber": _extract_range_pdfplumber,
+    "pymupdf": _extract_range_pymupdf,
+}
+
+
+def _count_pages(file_path: str) -> int:
+    with fitz.open(file_path) as pdf:
+        return pdf.page_count
+
+
+def _page_ranges(page_numbers: Iterable[int]) -> List[Tuple[int, int]]:
+    """Group 1-based page numbers into 0-based [start, end) ranges of at most PAGES_PER_TASK pages"""
+    ranges: List[Tuple[int, int]] = []
+    for page_number in sorted(set(page_numbers)):
+        i = page_number - 1
+        if ranges and ranges[-1][1] == i and i - ranges[-1][0] < PAGES_PER_TASK:
+            ranges[-1] = (ranges[-1][0], i + 1)
+        else:
+            ranges.append((i, i + 1))
+    return ranges
+
+
+def page_hashes(file_path: str) -> Dict[int, str]:
+    """Hash the extracted text of each page, which is what its chunks are built from
+
+    The raw content stream is not enough: text drawn from form XObjects or re-encoded
+    fonts changes without the stream changing. PyMuPDF's text pass is still far
+    cheaper than the full extraction it lets unchanged pages skip.
+    """
+    with fitz.open(file_path) as pdf:
+        return {
+            i + 1: hashlib.sha1((pdf[i].get_text("text") or "").encode("utf-8")).hexdigest()
+            for i in range(pdf.page_count)
+        }
+
 
 class PDFProcessor:
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        extraction_engine: str = None,
+        extraction_workers: int = None,
+    ):
         # TODO: Initialize text splitter with chunk size and overlap settings
+        self.extraction_engine = extraction_engine or settings.pdf_extraction_engine
+        if self.extraction_engine not in EXTRACTION_ENGINES:
+            raise ValueError(f"Unknown PDF extraction engine: {self.extraction_engine}")
+        self.extraction_workers = max(1, extraction_workers or settings.pdf_extraction_workers)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -20,47 +120,103 @@ class PDFProcessor:
         )
 
     
+    def iter_pages(
+        self, file_path: str, executor: Optional[Executor] = None, pages: Optional[Iterable[int]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield page-wise content in page order without holding the whole document
+
+        ``pages`` restricts extraction to those 1-based page numbers.
+        """
+        # Fixed-size page ranges are farmed out to worker processes with a bounded
+        # number of tasks in flight, so memory stays flat however long the PDF is.
+        extract_range = _RANGE_EXTRACTORS[self.extraction_engine]
+        if pages is None:
+            page_count = _count_pages(file_path)
+            ranges = [(s, min(s + PAGES_PER_TASK, page_count)) for s in range(0, page_count, PAGES_PER_TASK)]
+        else:
+            ranges = _page_ranges(pages)
+
+        own_pool = None
+        if executor is None and self.extraction_workers > 1 and len(ranges) > 1:
+            own_pool = executor = ProcessPoolExecutor(max_workers=min(self.extraction_workers, len(ranges)))
+
+        try:
+            if executor is None:
+                extracted = (item for s, e in ranges for item in extract_range(file_path, s, e))
+            else:
+                extracted = self._iter_parallel(executor, extract_range, file_path, ranges)
+
+            for page_number, text in extracted:
+                if text and text.strip():
+                    yield {
+                        "page": page_number,
+                        "text": text.strip()
+                    }
+        finally:
+            if own_pool is not None:
+                own_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_parallel(self, executor: Executor, extract_range, file_path: str, ranges) -> Iterator[Tuple[int, str]]:
+        in_flight = deque()
+        pending = iter(ranges)
+        max_in_flight = self.extraction_workers * 2
+
+        for s, e in pending:
+            in_flight.append(executor.submit(extract_range, file_path, s, e))
+            if len(in_flight) >= max_in_flight:
+                break
+
+        while in_flight:
+            results = in_flight.popleft().result()
+            next_range = next(pending, None)
+            if next_range is not None:
+                in_flight.append(executor.submit(extract_range, file_path, *next_range))
+            yield from results
+
     def extract_text_from_pdf(self, file_path: str) -> List[Dict[str, Any]]:
         """Extract text from PDF and return page-wise content"""
-        # TODO: Implement PDF text extraction
-        # - Use pdfplumber or PyPDF2 to extract text from each page
-        # - Return list of dictionaries with page content and metadata
-        pages = []
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        pages.append({
-                            "page": i + 1,
-                            "text": text.strip()
-                        })
+            pages = list(self.iter_pages(file_path))
         except Exception as e:
             logger.exception(f"❌ Failed to extract text from PDF: {e}")
             raise e
 
+        logger.info(f"📑 Extracted {len(pages)} pages with {self.extraction_engine}")
         return pages
-    
-    def split_into_chunks(self, pages_content: List[Dict[str, Any]]) -> List[Document]:
-        """Split page content into chunks"""
-        # TODO: Implement text chunking
-        # - Split each page content into smaller chunks
-        # - Create Document objects with proper metadata
-        # - Return list of Document objects
-        documents = []
 
-        for page in pages_content:
+    def iter_chunks(self, pages: Iterable[Dict[str, Any]]) -> Iterator[Document]:
+        """Split a stream of pages into a stream of chunk Documents"""
+        for page in pages:
             page_text = page["text"]
             page_number = page["page"]
 
             chunks = self.splitter.split_text(page_text)
             for i, chunk in enumerate(chunks):
-                documents.append(Document(
+                yield Document(
                     page_content=chunk,
                     metadata={"page": page_number, "chunk": i + 1}
-                ))
+                )
 
-        return documents
+    def iter_chunk_batches(
+        self,
+        file_path: str,
+        batch_size: int,
+        executor: Optional[Executor] = None,
+        pages: Optional[Iterable[int]] = None
+    ) -> Iterator[List[Document]]:
+        """Stream a PDF (or only the given pages) as fixed-size batches of chunk Documents"""
+        batch = []
+        for chunk in self.iter_chunks(self.iter_pages(file_path, executor=executor, pages=pages)):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def split_into_chunks(self, pages_content: List[Dict[str, Any]]) -> List[Document]:
+        """Split page content into chunks"""
+        return list(self.iter_chunks(pages_content))
     
     def process_pdf(self, file_path: str) -> List[Document]:
         """Process PDF file and return list of Document objects"""
@@ -69,11 +225,13 @@ class PDFProcessor:
         # 2. Split text into chunks
         # 3. Return processed documents
         logger.info(f"📄 Processing PDF: {file_path}")
-        pages = self.extract_text_from_pdf(file_path)
+        with span("pdf_extract"):
+            pages = self.extract_text_from_pdf(file_path)
         if not pages:
             raise ValueError("No text found in PDF.")
 
-        documents = self.split_into_chunks(pages)
+        with span("pdf_chunk"):
+            documents = self.split_into_chunks(pages)
         logger.info(f"✅ Extracted {len(documents)} chunks from {len(pages)} pages.")
         return documents
  
\ No newline at end of file
@@ -1,37 +1,37 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from langchain.schema import Document
 from services.vector_store import VectorStoreService
+from services.answer_cache import SemanticAnswerCache
+from services.chunk_ids import chunk_id
+from services.bm25_index import reciprocal_rank_fusion
+from services.llm_gateway import LLMGateway, create_llm_gateway
+from services.keyword_index import KeywordIndex, load_keywords
+from services.context_builder import ContextBuilder
+from services.chunk_store import ChunkStore
+from services.fact_store import FactStore
+from services.fact_answerer import FactAnswerer
+from services.search_filter import SearchFilter
+from services.reranker import CrossEncoderReranker
+from services.metrics import FACT_LOOKUPS, FALLBACKS, LLM_TOKENS, observe_stage, span, timed
 from config import settings
-import logging, re, os, json
+import logging, re, os, json, time
 
-from langchain.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from langchain.schema import HumanMessage
-
-# from langchain_cohere import ChatCohere
-from cohere import Client as CohereClient
-from langchain.vectorstores import Chroma
-from transformers import pipeline
 
 logger = logging.getLogger(__name__)
 
-def load_all_documents_from_json() -> list[Document]:
-        METADATA_PATH = os.path.join(settings.pdf_upload_path, "documents_metadata.json")    
-
-        with open(METADATA_PATH, "r") as f:
-            metadata_list = json.load(f)
-        
-        if not metadata_list:
-            return []
-
-    
-        path = os.path.join(settings.pdf_upload_path, f"{metadata_list[-1]['filename']}.chunks.json")
-        with open(path, "r") as f:
-            data = json.load(f)
-        return [Document(page_content=chunk["text"], metadata=chunk["metadata"]) for chunk in data]
+LLM_FAILURE_MESSAGE = "Sorry, I can't answer that right now."
 
 class RAGPipeline:
-    def __init__(self, vector_store: VectorStoreService, top_k: int = 10, similarity_threshold: float = 0.9):
+    def __init__(
+        self,
+        vector_store: VectorStoreService,
+        top_k: int = 10,
+        similarity_threshold: float = 0.9,
+        chunk_store: Optional[ChunkStore] = None,
+        fact_store: Optional[FactStore] = None
+    ):
         # TODO: Initialize RAG pipeline components
         # - Vector store service
         # - LLM client
@@ -39,16 +39,41 @@ class RAGPipeline:
         self.vector_store = vector_store
         self.top_k = top_k
         self.similarity_threshold = similarity_threshold
-        self.all_documents = load_all_documents_from_json()
-        self.keywords = [
-            "revenue", "total revenue", "net sales", "sales", "2025", "income", "amount",
-            "operating profit", "growth", "increase", "change", "yoy", "year-over-year", "2024", "2023", "%",
-            "cost of goods", "operating expenses", "cost", "cogs", "sg&a", "main expenses", "expenditure", "items",
-            "cash flow", "operating cash", "financing cash", "investing cash", "net cash", "free cash flow",
-            "debt ratio", "total liabilities", "equity", "leverage", "debt to equity", "financial structure"
-        ]
+        self.chunk_store = chunk_store or ChunkStore(settings.chunk_store_path)
+        # Streamed from the chunk store; the index keeps ids and keyword hits, not the text
+        self.keyword_index = KeywordIndex(load_keywords(settings.keywords_path), self.chunk_store)
+        self.keyword_index.add_documents(self.chunk_store.iter_documents())
+        self.vector_store.add_change_listener(self._on_corpus_change)
        
-        self.client = CohereClient(settings.openai_api_key)
+        self.llm = create_llm_gateway()
+        self.fact_answerer = None
+        if fact_store is not None and settings.fact_answers_enabled:
+            self.fact_answerer = FactAnswerer(fact_store)
+
+        # With reranking on, retrieval gathers a wider candidate set for the cross-encoder
+        self.reranker = None
+        self.candidate_k = top_k
+        if settings.rerank_enabled:
+            self.reranker = CrossEncoderReranker(
+                settings.rerank_model,
+                batch_size=settings.rerank_batch_size,
+                budget_ms=settings.rerank_budget_ms,
+                max_length=settings.rerank_max_length
+            )
+            self.candidate_k = max(top_k, settings.rerank_candidates)
+        self.context_builder = ContextBuilder(
+            max_tokens=settings.context_max_tokens,
+            encoding_name=settings.context_encoding
+        )
+
+        self.answer_cache = None
+        if settings.answer_cache_enabled:
+            self.answer_cache = SemanticAnswerCache(
+                similarity_threshold=settings.answer_cache_similarity,
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                max_entries=settings.answer_cache_max_entries
+            )
+            self.vector_store.add_change_listener(self.answer_cache.invalidate)
         # self.generator = pipeline(
         #     "text2text-generation",
         #     model="google/flan-t5-base",  # ganti model ringan
@@ -70,35 +95,144 @@ class RAGPipeline:
             )
         )
 
-    def generate_answer(self, question: str, chat_history: List[Dict[str, str]] = None) -> Dict[str, Any]:
-        """Generate answer using RAG pipeline"""
-        # TODO: Implement RAG pipeline
-        # 1. Retrieve relevant documents
-        # 2. Generate context from retrieved documents
-        # 3. Generate answer using LLM
-        # 4. Return answer with sources
-        # pass
-        
-        # print('docs', docs)
-        
-        # fallback_docs = [
-        #     doc for doc in self.all_documents
-        #     if any(kw in doc.page_content.lower() for kw in self.keywords)
-        # ]
-        # return fallback_docs[:20]
-        # print('fallback_docs[:20]', fallback_docs[:20])
-
-        logger.info(f"🔍 Retrieving documents for question: {question}")
-        docs = self._retrieve_documents(question)
-        # print('docs', docs)
-        # print('\n')
-        context = self._generate_context(docs)
-        # print('context', context)
-
-        logger.info(f"🧠 Generating answer using HF model")
+    def answer_from_facts(
+        self, question: str, search_filter: Optional[SearchFilter] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Answer metric and ratio questions from extracted table facts; None means use the LLM"""
+        if self.fact_answerer is None:
+            return None
+        with span("fact_lookup"):
+            answer = self.fact_answerer.answer(question, search_filter=search_filter)
+        FACT_LOOKUPS.labels("hit" if answer else "miss").inc()
+        return answer
+
+    def generate_answer(
+        self,
+        question: str,
+        chat_history: List[Dict[str, str]] = None,
+        documents: Optional[List[Document]] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> Dict[str, Any]:
+        """Generate answer using RAG pipeline
+
+        Pass ``documents`` when they were already retrieved for this question so
+        the query is embedded and searched only once.
+        """
+        if documents is None:
+            logger.info(f"🔍 Retrieving documents for question: {question}")
+            documents = self._retrieve_documents(question, search_filter=search_filter)
+        docs = documents
+
+        # Follow-up questions depend on the conversation, so only standalone ones are cached
+        use_cache = self.answer_cache is not None and not chat_history and bool(docs)
+        if use_cache:
+            query_vector = self.vector_store.embed_query(question)
+            with span("answer_cache_lookup"):
+                cached = self.answer_cache.lookup(query_vector, docs)
+            if cached:
+                return {
+                    "answer": cached["answer"],
+                    "sources": cached["sources"],
+                    "retrieved_docs_count": len(docs),
+                    "cached": True
+                }
+
+        built = self.context_builder.build(docs)
+        context = built["context"]
+
+        logger.info(f"🧠 Generating answer using LLM")
         answer = self._generate_llm_response(question, context, chat_history)
         
-        sources = [
+        sources = self._build_sources(docs)
+
+        if use_cache and answer != LLM_FAILURE_MESSAGE:
+            self.answer_cache.store(question, query_vector, docs, answer, sources)
+
+        return {
+            "answer": answer,
+            "sources": sources,
+            "retrieved_docs_count": len(docs),
+            "cached": False,
+            "context_stats": built["stats"]
+        }
+    
+    def stream_answer(
+        self,
+        question: str,
+        chat_history: List[Dict[str, str]] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream the answer as events: sources first, then tokens, then per-stage timings"""
+        timings = {}
+        start = time.time()
+
+        fact = None if chat_history else self.answer_from_facts(question, search_filter=search_filter)
+        if fact:
+            yield {"event": "sources", "data": fact["sources"]}
+            yield {"event": "token", "data": fact["answer"]}
+            timings["total"] = round(time.time() - start, 3)
+            yield {"event": "done", "data": {"timings": timings, "cached": False, "fact_match": True}}
+            return
+
+        stage_start = time.time()
+        docs = self._retrieve_documents(question, search_filter=search_filter)
+        timings["retrieval"] = round(time.time() - stage_start, 3)
+
+        sources = self._build_sources(docs)
+        yield {"event": "sources", "data": sources}
+
+        if not docs:
+            yield {"event": "token", "data": "Sorry, I couldn't find relevant information."}
+            timings["total"] = round(time.time() - start, 3)
+            yield {"event": "done", "data": {"timings": timings, "cached": False}}
+            return
+
+        use_cache = self.answer_cache is not None and not chat_history
+        if use_cache:
+            query_vector = self.vector_store.embed_query(question)
+            with span("answer_cache_lookup"):
+                cached = self.answer_cache.lookup(query_vector, docs)
+            if cached:
+                yield {"event": "token", "data": cached["answer"]}
+                timings["total"] = round(time.time() - start, 3)
+                yield {"event": "done", "data": {"timings": timings, "cached": True}}
+                return
+
+        stage_start = time.time()
+        built = self.context_builder.build(docs)
+        prompt = self.prompt_template.format(context=built["context"], question=question)
+        timings["context"] = round(time.time() - stage_start, 3)
+
+        stage_start = time.time()
+        parts = []
+        try:
+            for token in self.llm.stream(prompt):
+                if not parts:
+                    timings["first_token"] = round(time.time() - stage_start, 3)
+                parts.append(token)
+                yield {"event": "token", "data": token}
+        except Exception as e:
+            logger.error(f"❌ LLM streaming failed: {e}")
+            FALLBACKS.labels("llm_failure").inc()
+            if not parts:
+                parts.append(LLM_FAILURE_MESSAGE)
+                yield {"event": "token", "data": LLM_FAILURE_MESSAGE}
+            use_cache = False
+        timings["generation"] = round(time.time() - stage_start, 3)
+        observe_stage("llm_stream", time.time() - stage_start)
+        if "first_token" in timings:
+            observe_stage("llm_first_token", timings["first_token"])
+
+        answer = "".join(parts).strip()
+        self._count_llm_tokens(prompt, answer)
+        if use_cache and answer and answer != LLM_FAILURE_MESSAGE:
+            self.answer_cache.store(question, query_vector, docs, answer, sources)
+
+        timings["total"] = round(time.time() - start, 3)
+        yield {"event": "done", "data": {"timings": timings, "cached": False, "context_stats": built["stats"]}}
+
+    def _build_sources(self, docs: List[Document]) -> List[Dict[str, Any]]:
+        return [
             {
                 "content": doc.page_content[:200],
                 "page": doc.metadata.get("page", 0),
@@ -108,30 +242,124 @@ class RAGPipeline:
             for doc in docs
         ]
 
-        return {
-            "answer": answer,
-            "sources": sources,
-            "retrieved_docs_count": len(docs)
-        }
-    
-    def _retrieve_documents(self, query: str) -> List[Document]:
-        """Retrieve relevant documents for the query"""
+    def answer_batch(
+        self,
+        questions: List[str],
+        max_concurrency: int = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> Dict[str, Any]:
+        """Answer many questions with one embedding pass and one batched vector search"""
+        start = time.time()
+        timings = {}
+
+        stage_start = time.time()
+        vectors = self.vector_store.embed_queries(questions)
+        timings["embedding"] = round(time.time() - stage_start, 3)
+
+        stage_start = time.time()
+        k = max(self.candidate_k, settings.hybrid_candidates) if settings.retrieval_mode == "hybrid" else self.candidate_k
+        batch_results = self.vector_store.similarity_search_by_vectors(vectors, k=k, search_filter=search_filter)
+        timings["vector_search"] = round(time.time() - stage_start, 3)
+
+        # Chunks retrieved by several questions share one text copy; each question still
+        # gets its own metadata so per-question scores do not clobber each other.
+        shared: Dict[str, Document] = {}
+        per_question = []
+        for results in batch_results:
+            deduped = []
+            for doc, distance in results:
+                base = shared.setdefault(chunk_id(doc), doc)
+                deduped.append((Document(page_content=base.page_content, metadata=dict(base.metadata)), distance))
+            per_question.append(deduped)
+
+        def answer_one(item: Tuple[str, List[Tuple[Document, float]]]) -> Dict[str, Any]:
+            question, vector_results = item
+            item_timings = {}
+            item_start = time.time()
+            answer = self.answer_from_facts(question, search_filter=search_filter)
+            if answer is None:
+                docs = self._retrieve_documents(question, vector_results=vector_results, search_filter=search_filter)
+                item_timings["retrieval"] = round(time.time() - item_start, 3)
+
+                if not docs:
+                    answer = {"answer": "Sorry, I couldn't find relevant information.", "sources": [], "cached": False}
+                else:
+                    generation_start = time.time()
+                    answer = self.generate_answer(question, documents=docs)
+                    item_timings["generation"] = round(time.time() - generation_start, 3)
+            item_timings["total"] = round(time.time() - item_start, 3)
+
+            return {
+                "question": question,
+                "answer": answer["answer"],
+                "sources": answer["sources"],
+                "cached": answer.get("cached", False),
+                "context_stats": answer.get("context_stats"),
+                "processing_time": item_timings["total"],
+                "timings": item_timings
+            }
+
+        stage_start = time.time()
+        workers = max(1, max_concurrency or settings.batch_llm_concurrency)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-llm") as pool:
+            results = list(pool.map(answer_one, zip(questions, per_question)))
+        timings["answering"] = round(time.time() - stage_start, 3)
+        timings["total"] = round(time.time() - start, 3)
+
+        logger.info(
+            f"📦 Answered {len(questions)} questions in {timings['total']}s "
+            f"({len(shared)} unique chunks retrieved)"
+        )
+        return {"results": results, "unique_chunks": len(shared), "timings": timings}
+
+    @timed("retrieval")
+    def _retrieve_documents(
+        self,
+        query: str,
+        vector_results: Optional[List[Tuple[Document, float]]] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Document]:
+        """Retrieve relevant documents for the query
+
+        ``vector_results`` lets batched callers pass in a vector search that was
+        already run for this query. ``search_filter`` scopes every search path,
+        including the keyword fallback, to matching chunks.
+        """
         # TODO: Implement document retrieval
         # - Search vector store for similar documents
         # - Filter by similarity threshold
         # - Return top-k documents
         # pass
-        results = self.vector_store.similarity_search(query, k=self.top_k)
+        if self.reranker is None:
+            return self._candidate_documents(query, self.top_k, vector_results, search_filter)
+
+        # Only the best few of the wider candidate set reach the LLM, keeping prompts small
+        candidates = self._candidate_documents(query, self.candidate_k, vector_results, search_filter)
+        return self.reranker.rerank(query, candidates, keep=settings.rerank_keep)
+
+    def _candidate_documents(
+        self,
+        query: str,
+        k: int,
+        vector_results: Optional[List[Tuple[Document, float]]] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Document]:
+        """First-stage retrieval: hybrid fusion, or dense search with the keyword and threshold filters"""
+        if settings.retrieval_mode == "hybrid":
+            return self._hybrid_retrieve(query, k, vector_results=vector_results, search_filter=search_filter)
+
+        if vector_results is not None:
+            results = vector_results[:k]
+        else:
+            results = self.vector_store.similarity_search(query, k=k, search_filter=search_filter)
 
         docs_with_scores = []
         for doc, score in results:
             doc.metadata["score"] = score
             docs_with_scores.append(doc)
 
-        keyword_filtered = [
-            doc for doc in docs_with_scores
-            if any(kw in doc.page_content.lower() for kw in self.keywords)
-        ]
+        with span("keyword_filter"):
+            keyword_filtered = [doc for doc in docs_with_scores if self.keyword_index.has_keyword(doc)]
 
         threshold_filtered = sorted(
             [doc for doc in keyword_filtered if doc.metadata["score"] >= self.similarity_threshold],
@@ -145,20 +373,82 @@ class RAGPipeline:
 
         if keyword_filtered:
             logger.warning(f"⚠️ No documents passed threshold. Returning {len(keyword_filtered)} keyword matches.")
+            FALLBACKS.labels("below_threshold").inc()
             return keyword_filtered
 
 
         if not results:
             logger.warning("⚠️ No similarity search results. Trying keyword fallback on all documents...")
-            fallback_docs = [
-                doc for doc in self.all_documents
-                if any(kw in doc.page_content.lower() for kw in self.keywords)
-            ]
-            return fallback_docs[:50]
+            FALLBACKS.labels("keyword_scan").inc()
+            with span("keyword_scan"):
+                return self.keyword_index.matching_documents(limit=50, search_filter=search_filter)
         
         logger.warning(f"⚠️ No documents matched keywords. Returning top {len(docs_with_scores)} results.")
+        FALLBACKS.labels("unfiltered").inc()
         return docs_with_scores
     
+    def _hybrid_retrieve(
+        self,
+        query: str,
+        k: int,
+        vector_results: Optional[List[Tuple[Document, float]]] = None,
+        search_filter: Optional[SearchFilter] = None
+    ) -> List[Document]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion"""
+        candidates = max(k, settings.hybrid_candidates)
+        if vector_results is None:
+            vector_results = self.vector_store.similarity_search(query, k=candidates, search_filter=search_filter)
+        lexical_results = self.vector_store.lexical_search(query, k=candidates, search_filter=search_filter)
+
+        docs: Dict[str, Document] = {}
+        vector_ranking, lexical_ranking = [], []
+        for doc, distance in vector_results:
+            key = chunk_id(doc)
+            docs.setdefault(key, doc).metadata["vector_distance"] = distance
+            vector_ranking.append(key)
+        for doc, score in lexical_results:
+            key = chunk_id(doc)
+            docs.setdefault(key, doc).metadata["bm25_score"] = round(score, 4)
+            lexical_ranking.append(key)
+
+        with span("rank_fusion"):
+            fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=settings.rrf_k)
+            ranked = sorted(fused, key=fused.get, reverse=True)[:k]
+        for key in ranked:
+            docs[key].metadata["score"] = round(fused[key], 6)
+
+        logger.info(
+            f"🔀 Hybrid retrieval: {len(vector_results)} vector + {len(lexical_results)} BM25 "
+            f"candidates fused into {len(ranked)}"
+        )
+        return [docs[key] for key in ranked]
+
+    def get_llm_stats(self) -> Dict[str, Any]:
+        """LLM gateway queue depth, outcome counters and latency percentiles"""
+        if not isinstance(self.llm, LLMGateway):
+            return {"enabled": False}
+        return self.llm.stats()
+
+    def close(self) -> None:
+        if isinstance(self.llm, LLMGateway):
+            self.llm.close()
+
+    @property
+    def keywords(self) -> List[str]:
+        return self.keyword_index.keywords
+
+    def reload_keywords(self, keywords: Optional[List[str]] = None) -> List[str]:
+        """Rebuild the keyword matcher from ``keywords`` or the keywords file"""
+        self.keyword_index.rebuild(keywords if keywords is not None else load_keywords(settings.keywords_path))
+        return self.keywords
+
+    def _on_corpus_change(self, added: List[Document], deleted_ids: List[str]) -> None:
+        # Keyword hits are matched once per chunk as it is ingested
+        if added:
+            self.keyword_index.add_documents(added)
+        if deleted_ids:
+            self.keyword_index.remove(set(deleted_ids))
+
     def _generate_context(self, documents: List[Document]) -> str:
         """Generate context from retrieved documents"""
         # TODO: Generate context string from documents
@@ -182,7 +472,7 @@ class RAGPipeline:
 
 
         # return "\n".join(list(filtered_lines)[:50])
-        return "\n\n".join([doc.page_content for doc in documents])
+        return self.context_builder.build(documents)["context"]
    
     def _generate_llm_response(self, question: str, context: str, chat_history: List[Dict[str, str]] = None) -> str:
         prompt = self.prompt_template.format(context=context, question=question)
@@ -193,15 +483,17 @@ class RAGPipeline:
 
         # return outputs[0]["generated_text"]
         try:
-            response = self.client.generate(
-                model="command",
-                prompt=prompt,
-                temperature=0,
-                max_tokens=512,
-            )
-            # print('response', response)
-            return response.generations[0].text.strip()
+            with span("llm_generate"):
+                answer = self.llm.generate(prompt)
         except Exception as e:
-            logger.error(f"❌ Cohere call failed: {e}")
-            return "Sorry, I can't answer that right now."
+            logger.error(f"❌ LLM call failed: {e}")
+            FALLBACKS.labels("llm_failure").inc()
+            return LLM_FAILURE_MESSAGE
+        self._count_llm_tokens(prompt, answer)
+        return answer
+
+    def _count_llm_tokens(self, prompt: str, answer: str) -> None:
+        # Counted with the context encoding; close to, not exactly, the provider's tokenizer
+        LLM_TOKENS.labels("prompt").inc(self.context_builder.count_tokens(prompt))
+        LLM_TOKENS.labels("completion").inc(self.context_builder.count_tokens(answer))
         
\ No newline at end of file
@@ -0,0 +1,63 @@
+from typing import List, Tuple
+from langchain.schema import Document
+from services.metrics import RERANK_TRUNCATED, span
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Rescores retrieval candidates with a small CPU cross-encoder under a latency budget.
+
+    Candidates are scored in batches in first-stage order. Before each batch the time of
+    the previous one is used to predict whether it still fits the budget; when it does
+    not, the unscored candidates keep their first-stage order behind the scored ones, so
+    a slow request degrades to plain retrieval instead of waiting.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16, budget_ms: float = 150.0, max_length: int = 256):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.budget_seconds = budget_ms / 1000
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+        logger.info(f"🎯 Cross-encoder reranker: {model_name} (budget {budget_ms}ms, batch {self.batch_size})")
+
+    def warm_up(self) -> None:
+        """Score one pair so the first real request doesn't pay for lazy init"""
+        self._score("warm-up", [Document(page_content="warm-up")])
+
+    def _score(self, query: str, documents: List[Document]) -> List[float]:
+        pairs = [(query, doc.page_content) for doc in documents]
+        return [float(s) for s in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+
+    def rerank(self, query: str, documents: List[Document], keep: int) -> List[Document]:
+        """Best ``keep`` documents by cross-encoder score, as copies carrying ``rerank_score``"""
+        if not documents:
+            return []
+
+        scored: List[Tuple[Document, float]] = []
+        start = time.perf_counter()
+        last_batch = 0.0
+        with span("rerank"):
+            for offset in range(0, len(documents), self.batch_size):
+                elapsed = time.perf_counter() - start
+                if offset and elapsed + last_batch > self.budget_seconds:
+                    RERANK_TRUNCATED.inc()
+                    logger.warning(
+                        f"⚠️ Rerank budget reached after {len(scored)}/{len(documents)} candidates "
+                        f"({round(elapsed * 1000, 1)}ms)"
+                    )
+                    break
+                batch_start = time.perf_counter()
+                batch = documents[offset:offset + self.batch_size]
+                scored.extend(zip(batch, self._score(query, batch)))
+                last_batch = time.perf_counter() - batch_start
+
+        ranked = [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "rerank_score": round(score, 4)})
+            for doc, score in sorted(scored, key=lambda item: item[1], reverse=True)
+        ]
+        return (ranked + documents[len(scored):])[:keep]
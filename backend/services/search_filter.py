@@ -0,0 +1,77 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+
+class SearchFilter:
+    """Constraints on chunk metadata, pushed down into the vector and BM25 indexes.
+
+    ``uploaded_after`` / ``uploaded_before`` are epoch seconds compared with the
+    ``uploaded_at`` metadata stamped on chunks at ingestion; chunks without it never
+    match a date bound. Page bounds are inclusive.
+    """
+
+    def __init__(
+        self,
+        filenames: Optional[Iterable[str]] = None,
+        page_from: Optional[int] = None,
+        page_to: Optional[int] = None,
+        uploaded_after: Optional[float] = None,
+        uploaded_before: Optional[float] = None
+    ):
+        self.filenames = sorted(set(filenames)) if filenames else None
+        self.page_from = page_from
+        self.page_to = page_to
+        self.uploaded_after = uploaded_after
+        self.uploaded_before = uploaded_before
+
+    def __bool__(self) -> bool:
+        return any(v is not None for v in (
+            self.filenames, self.page_from, self.page_to, self.uploaded_after, self.uploaded_before
+        ))
+
+    def _bounds(self) -> List[Tuple[str, str, Any]]:
+        """(field, operator, value) comparisons besides the filename set"""
+        bounds = []
+        if self.page_from is not None:
+            bounds.append(("page", ">=", self.page_from))
+        if self.page_to is not None:
+            bounds.append(("page", "<=", self.page_to))
+        if self.uploaded_after is not None:
+            bounds.append(("uploaded_at", ">=", self.uploaded_after))
+        if self.uploaded_before is not None:
+            bounds.append(("uploaded_at", "<=", self.uploaded_before))
+        return bounds
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        if self.filenames is not None and metadata.get("filename") not in self.filenames:
+            return False
+        for field, op, bound in self._bounds():
+            value = metadata.get(field)
+            if value is None:
+                return False
+            if op == ">=" and value < bound or op == "<=" and value > bound:
+                return False
+        return True
+
+    def to_chroma_where(self) -> Optional[Dict[str, Any]]:
+        """Chroma ``where`` clause; single-key clauses because $and needs two or more"""
+        clauses = []
+        if self.filenames is not None:
+            # $or of $eq rather than $in, which older Chroma releases lack
+            by_name = [{"filename": {"$eq": name}} for name in self.filenames]
+            clauses.append(by_name[0] if len(by_name) == 1 else {"$or": by_name})
+        operators = {">=": "$gte", "<=": "$lte"}
+        clauses.extend({field: {operators[op]: bound}} for field, op, bound in self._bounds())
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def to_sql(self, columns: Dict[str, str]) -> Tuple[str, List[Any]]:
+        """SQL condition and parameters, with ``columns`` mapping each field to its SQL expression"""
+        conditions, params = [], []
+        if self.filenames is not None:
+            conditions.append(f"{columns['filename']} IN ({','.join('?' * len(self.filenames))})")
+            params.extend(self.filenames)
+        for field, op, bound in self._bounds():
+            conditions.append(f"{columns[field]} {op} ?")
+            params.append(bound)
+        return " AND ".join(conditions) or "1", params
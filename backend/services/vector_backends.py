@@ -0,0 +1,489 @@
+from typing import List, Dict, Tuple, Iterator, Optional, Callable
+from langchain.schema import Document
+from langchain.embeddings.base import Embeddings
+from services.search_filter import SearchFilter
+from config import settings
+import hashlib
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+FAISS_INDEX_TYPES = ("flat", "ivf", "hnsw")
+VECTOR_PARTITION_MODES = ("none", "document")
+
+
+class VectorBackend:
+    """Storage interface behind VectorStoreService"""
+
+    def add(self, ids: List[str], documents: List[Document], embeddings: Optional[List[List[float]]] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def search_by_vector(
+        self, vector: List[float], k: int, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return (document, squared L2 distance) pairs, closest first, among chunks matching the filter"""
+        raise NotImplementedError
+
+    def search_by_vectors(
+        self, vectors: List[List[float]], k: int, search_filter: Optional[SearchFilter] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Batched search; backends with a native multi-query search override this"""
+        return [self.search_by_vector(vector, k, search_filter) for vector in vectors]
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def persist(self) -> None:
+        pass
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[Document], List[List[float]]]]:
+        """Yield (ids, documents, embeddings) for every stored chunk"""
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, path: str, collection_name: str, embedding: Embeddings):
+        from langchain.vectorstores import Chroma
+
+        self.vectorstore = Chroma(
+            persist_directory=path,
+            embedding_function=embedding,
+            collection_name=collection_name
+        )
+
+    def add(self, ids, documents, embeddings=None):
+        if embeddings is None:
+            self.vectorstore.add_documents(documents, ids=ids)
+        else:
+            self.vectorstore._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[d.page_content for d in documents],
+                metadatas=[d.metadata for d in documents]
+            )
+
+    def delete(self, ids):
+        self.vectorstore._collection.delete(ids=ids)
+
+    def search_by_vector(self, vector, k, search_filter=None):
+        where = search_filter.to_chroma_where() if search_filter else None
+        return self.vectorstore.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=where)
+
+    def search_by_vectors(self, vectors, k, search_filter=None):
+        if not vectors:
+            return []
+        k = min(k, self.count())
+        if k == 0:
+            return [[] for _ in vectors]
+        # The where clause is applied by Chroma before the nearest-neighbour search
+        result = self.vectorstore._collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=search_filter.to_chroma_where() if search_filter else None,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=metadata or {}), distance)
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(result["documents"], result["metadatas"], result["distances"])
+        ]
+
+    def count(self):
+        return self.vectorstore._collection.count()
+
+    def persist(self):
+        self.vectorstore.persist()
+
+    def iter_batches(self, batch_size=1000):
+        total = self.count()
+        for offset in range(0, total, batch_size):
+            data = self.vectorstore._collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            documents = [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(data["documents"], data["metadatas"])
+            ]
+            yield data["ids"], documents, data["embeddings"]
+
+
+class FaissBackend(VectorBackend):
+    """FAISS index with a SQLite side store for chunk text and metadata.
+
+    The index file is memory-mapped on open for a fast cold start and only read fully
+    into memory on the first write. Flat and IVF indexes remove vectors in place; HNSW
+    cannot, so deleted rows are tombstoned in the side store and skipped at search time.
+
+    Filename, page and upload time are also kept as indexed side-store columns, so a
+    filtered search first selects the matching vector ids in SQLite and only scores those.
+    """
+
+    # Side-store columns holding the metadata a SearchFilter can constrain
+    _FILTER_COLUMNS = {"filename": "filename", "page": "page", "uploaded_at": "uploaded_at"}
+
+    def __init__(self, path: str, embedding: Embeddings, index_type: str = "flat",
+                 ivf_nlist: int = 256, hnsw_m: int = 32, exact_filter_max: int = 5000):
+        import faiss
+        import numpy as np
+
+        if index_type not in FAISS_INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+        self._faiss = faiss
+        self._np = np
+        self.path = path
+        self.embedding = embedding
+        self.index_type = index_type
+        self.ivf_nlist = ivf_nlist
+        self.hnsw_m = hnsw_m
+        self.exact_filter_max = exact_filter_max
+        self.index = None
+        self._mmapped = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, f"index_{index_type}.faiss")
+        self._conn = sqlite3.connect(os.path.join(path, "docstore.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "faiss_id INTEGER PRIMARY KEY AUTOINCREMENT, doc_id TEXT UNIQUE NOT NULL, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, "
+            "filename TEXT, page INTEGER, uploaded_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(docs)")}
+        if "filename" not in columns:
+            # Side stores written before filtered search: lift the fields out of the metadata JSON
+            for column, kind in (("filename", "TEXT"), ("page", "INTEGER"), ("uploaded_at", "REAL")):
+                self._conn.execute(f"ALTER TABLE docs ADD COLUMN {column} {kind}")
+            self._conn.execute(
+                "UPDATE docs SET filename = json_extract(metadata, '$.filename'), "
+                "page = json_extract(metadata, '$.page'), uploaded_at = json_extract(metadata, '$.uploaded_at')"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_filename_page ON docs(filename, page)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_uploaded_at ON docs(uploaded_at)")
+        self._conn.commit()
+
+        if os.path.exists(self.index_path):
+            self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._mmapped = True
+            logger.info(f"📦 Memory-mapped FAISS {index_type} index with {self.index.ntotal} vectors")
+
+    def _new_index(self, dim: int):
+        faiss = self._faiss
+        if self.index_type == "hnsw":
+            return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, self.hnsw_m))
+        # IVF starts as an exact index and is retrained once there is enough data
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+    def _writable(self, dim: int):
+        if self.index is None:
+            self.index = self._new_index(dim)
+        elif self._mmapped:
+            self.index = self._faiss.read_index(self.index_path)
+            self._mmapped = False
+        return self.index
+
+    def _maybe_train_ivf(self) -> None:
+        """Switch an IVF-configured store from exact search to IVF once it has enough vectors"""
+        faiss, np = self._faiss, self._np
+        if self.index_type != "ivf" or not isinstance(self.index, faiss.IndexIDMap2):
+            return
+        if self.index.ntotal < self.ivf_nlist * 39:
+            return
+        ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        quantizer = faiss.IndexFlatL2(vectors.shape[1])
+        ivf = faiss.IndexIVFFlat(quantizer, vectors.shape[1], self.ivf_nlist)
+        ivf.train(vectors)
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        ivf.add_with_ids(vectors, ids)
+        ivf.nprobe = max(1, self.ivf_nlist // 16)
+        self.index = ivf
+        logger.info(f"🏗 Trained IVF index ({self.ivf_nlist} lists) on {len(ids)} vectors")
+
+    def add(self, ids, documents, embeddings=None):
+        np = self._np
+        if embeddings is None:
+            embeddings = self.embedding.embed_documents([d.page_content for d in documents])
+        vectors = np.asarray(embeddings, dtype="float32")
+
+        with self._lock:
+            existing = [doc_id for doc_id in ids if self._faiss_id(doc_id) is not None]
+            if existing:
+                self._delete_locked(existing)
+
+            faiss_ids = []
+            for doc_id, doc in zip(ids, documents):
+                cursor = self._conn.execute(
+                    "INSERT INTO docs (doc_id, content, metadata, filename, page, uploaded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_id, doc.page_content, json.dumps(doc.metadata), doc.metadata.get("filename"),
+                     doc.metadata.get("page"), doc.metadata.get("uploaded_at"))
+                )
+                faiss_ids.append(cursor.lastrowid)
+            self._conn.commit()
+
+            index = self._writable(vectors.shape[1])
+            index.add_with_ids(vectors, np.asarray(faiss_ids, dtype="int64"))
+            self._maybe_train_ivf()
+            self._dirty = True
+
+    def _faiss_id(self, doc_id: str) -> Optional[int]:
+        row = self._conn.execute("SELECT faiss_id FROM docs WHERE doc_id = ? AND deleted = 0", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete_locked(ids)
+
+    def _delete_locked(self, ids: List[str]) -> None:
+        np = self._np
+        faiss_ids = [fid for fid in (self._faiss_id(doc_id) for doc_id in ids) if fid is not None]
+        if not faiss_ids:
+            return
+        if self.index_type == "hnsw":
+            self._conn.executemany("UPDATE docs SET deleted = 1 WHERE faiss_id = ?", [(f,) for f in faiss_ids])
+            # Tombstoned rows keep their doc_id free for re-insertion
+            self._conn.executemany(
+                "UPDATE docs SET doc_id = doc_id || ':deleted:' || faiss_id WHERE faiss_id = ?",
+                [(f,) for f in faiss_ids]
+            )
+        else:
+            index = self._writable(0)
+            index.remove_ids(np.asarray(faiss_ids, dtype="int64"))
+            self._conn.executemany("DELETE FROM docs WHERE faiss_id = ?", [(f,) for f in faiss_ids])
+        self._conn.commit()
+        self._dirty = True
+
+    def search_by_vector(self, vector, k, search_filter=None):
+        return self.search_by_vectors([vector], k, search_filter)[0]
+
+    def search_by_vectors(self, vectors, k, search_filter=None):
+        np = self._np
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0 or not vectors:
+                return [[] for _ in vectors]
+            queries = np.asarray(vectors, dtype="float32")
+            if search_filter:
+                labels, distances = self._search_filtered(queries, k, search_filter)
+            else:
+                tombstones = 0
+                if self.index_type == "hnsw":
+                    tombstones = self._conn.execute("SELECT COUNT(*) FROM docs WHERE deleted = 1").fetchone()[0]
+                fetch = min(self.index.ntotal, k + tombstones)
+                distances, labels = self.index.search(queries, fetch)
+
+            found = [
+                [(int(label), float(dist)) for label, dist in zip(row_labels, row_distances) if label >= 0]
+                for row_labels, row_distances in zip(labels, distances)
+            ]
+            # Chunks shared between queries are loaded from the side store once
+            unique = list({label for row in found for label, _ in row})
+            rows = {}
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                rows.update(
+                    (row[0], row[1:])
+                    for row in self._conn.execute(
+                        f"SELECT faiss_id, content, metadata FROM docs "
+                        f"WHERE deleted = 0 AND faiss_id IN ({','.join('?' * len(part))})",
+                        part
+                    )
+                )
+
+        results = []
+        for row in found:
+            hits = []
+            for label, dist in row:
+                if label in rows:
+                    content, metadata = rows[label]
+                    hits.append((Document(page_content=content, metadata=json.loads(metadata)), dist))
+                if len(hits) >= k:
+                    break
+            results.append(hits)
+        return results
+
+    def _search_filtered(self, queries, k: int, search_filter: SearchFilter):
+        """(labels, distances) over only the vectors whose side-store row matches the filter"""
+        faiss, np = self._faiss, self._np
+        clause, params = search_filter.to_sql(self._FILTER_COLUMNS)
+        allowed = np.fromiter(
+            (row[0] for row in self._conn.execute(f"SELECT faiss_id FROM docs WHERE deleted = 0 AND {clause}", params)),
+            dtype="int64"
+        )
+        if len(allowed) == 0:
+            return np.empty((len(queries), 0), dtype="int64"), np.empty((len(queries), 0), dtype="float32")
+
+        if len(allowed) <= self.exact_filter_max:
+            # Small scopes (one filing, a page range) are scored exactly against just their vectors
+            scoped = np.vstack([self.index.reconstruct(int(faiss_id)) for faiss_id in allowed])
+            distances = (
+                (queries ** 2).sum(1)[:, None] - 2 * queries @ scoped.T + (scoped ** 2).sum(1)[None, :]
+            )
+            top = np.argsort(distances, axis=1)[:, :k]
+            return allowed[top], np.take_along_axis(distances, top, axis=1)
+
+        selector = faiss.IDSelectorBatch(len(allowed), faiss.swig_ptr(allowed))
+        if isinstance(self.index, faiss.IndexIVF):
+            search_params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        else:
+            search_params = faiss.SearchParameters(sel=selector)
+        distances, labels = self.index.search(queries, min(k, len(allowed)), params=search_params)
+        return labels, distances
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM docs WHERE deleted = 0").fetchone()[0]
+
+    def persist(self):
+        with self._lock:
+            if not self._dirty or self.index is None:
+                return
+            tmp_path = self.index_path + ".tmp"
+            self._faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def iter_batches(self, batch_size=1000):
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT faiss_id, doc_id, content, metadata FROM docs "
+                    "WHERE deleted = 0 AND faiss_id > ? ORDER BY faiss_id LIMIT ?", (last, batch_size)
+                ).fetchall()
+                if not rows:
+                    return
+                embeddings = [self.index.reconstruct(int(row[0])).tolist() for row in rows]
+            last = rows[-1][0]
+            documents = [Document(page_content=row[2], metadata=json.loads(row[3])) for row in rows]
+            yield [row[1] for row in rows], documents, embeddings
+
+
+class PartitionedBackend(VectorBackend):
+    """One backend per document, so searches scoped to filenames touch only their vectors.
+
+    Partitions are opened lazily and listed in a small JSON manifest. Unscoped searches
+    fan out to every partition and merge by distance, and deletes (which only carry
+    chunk ids) are sent to every partition, so this suits corpora that are mostly queried
+    one filing at a time.
+    """
+
+    def __init__(self, factory: Callable[[str], VectorBackend], collection_name: str, manifest_path: str):
+        self._factory = factory
+        self.collection_name = collection_name
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, VectorBackend] = {}
+        # filename -> partition (collection) name
+        self._names: Dict[str, str] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                self._names = json.load(f)
+        logger.info(f"🗂 Per-document vector partitions: {len(self._names)} documents")
+
+    def _partition(self, filename: str, create: bool = False) -> Optional[VectorBackend]:
+        with self._lock:
+            backend = self._partitions.get(filename)
+            if backend is not None:
+                return backend
+            if filename not in self._names:
+                if not create:
+                    return None
+                digest = hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16]
+                self._names[filename] = f"{self.collection_name}_doc_{digest}"
+                self._write_manifest()
+            backend = self._factory(self._names[filename])
+            self._partitions[filename] = backend
+            return backend
+
+    def _write_manifest(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._names, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _all_partitions(self) -> List[VectorBackend]:
+        with self._lock:
+            filenames = list(self._names)
+        return [self._partition(filename) for filename in filenames]
+
+    def add(self, ids, documents, embeddings=None):
+        groups: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            groups.setdefault(doc.metadata.get("filename", ""), []).append(i)
+        for filename, positions in groups.items():
+            self._partition(filename, create=True).add(
+                [ids[i] for i in positions],
+                [documents[i] for i in positions],
+                None if embeddings is None else [embeddings[i] for i in positions]
+            )
+
+    def delete(self, ids):
+        for backend in self._all_partitions():
+            backend.delete(ids)
+
+    def search_by_vector(self, vector, k, search_filter=None):
+        return self.search_by_vectors([vector], k, search_filter)[0]
+
+    def search_by_vectors(self, vectors, k, search_filter=None):
+        if search_filter and search_filter.filenames is not None:
+            backends = [b for b in (self._partition(name) for name in search_filter.filenames) if b is not None]
+        else:
+            backends = self._all_partitions()
+        per_partition = [backend.search_by_vectors(vectors, k, search_filter) for backend in backends]
+        return [
+            heapq.nsmallest(k, (hit for results in per_partition for hit in results[i]), key=lambda hit: hit[1])
+            for i in range(len(vectors))
+        ]
+
+    def count(self):
+        return sum(backend.count() for backend in self._all_partitions())
+
+    def persist(self):
+        with self._lock:
+            opened = list(self._partitions.values())
+        for backend in opened:
+            backend.persist()
+
+    def iter_batches(self, batch_size=1000):
+        for backend in self._all_partitions():
+            yield from backend.iter_batches(batch_size)
+
+
+def _create_single_backend(embedding: Embeddings, collection_name: str) -> VectorBackend:
+    if settings.vector_db_type == "chromadb":
+        return ChromaBackend(settings.vector_db_path, collection_name, embedding)
+    if settings.vector_db_type == "faiss":
+        return FaissBackend(
+            os.path.join(settings.vector_db_path, "faiss", collection_name),
+            embedding,
+            index_type=settings.faiss_index_type,
+            ivf_nlist=settings.faiss_ivf_nlist,
+            hnsw_m=settings.faiss_hnsw_m,
+            exact_filter_max=settings.faiss_exact_filter_max
+        )
+    raise ValueError(f"Unknown vector DB type: {settings.vector_db_type}")
+
+
+def create_vector_backend(embedding: Embeddings, collection_name: str) -> VectorBackend:
+    """Build the backend selected by settings.vector_db_type, partitioned per document if configured"""
+    if settings.vector_partition_mode not in VECTOR_PARTITION_MODES:
+        raise ValueError(f"Unknown vector partition mode: {settings.vector_partition_mode}")
+    if settings.vector_partition_mode == "document":
+        return PartitionedBackend(
+            lambda name: _create_single_backend(embedding, name),
+            collection_name,
+            os.path.join(settings.vector_db_path, f"{collection_name}_partitions.json")
+        )
+    return _create_single_backend(embedding, collection_name)
@@ -1,10 +1,14 @@
-from typing import List, Tuple
-from uuid import uuid4
+from typing import List, Dict, Tuple, Callable, Optional
 from langchain.schema import Document
 # from langchain.vectorstores import VectorStore
-from langchain.vectorstores import Chroma
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.embeddings import HuggingFaceEmbeddings
+from services.embedding_engines import DynamicBatchingEmbeddings, create_embedding_model
+from services.embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingLRU
+from services.bm25_index import BM25Index
+from services.vector_backends import create_vector_backend
+from services.write_behind import WriteBehindBuffer
+from services.metrics import CHUNKS_EMBEDDED, span
+from services.chunk_ids import chunk_id
+from services.search_filter import SearchFilter
 from config import settings
 import os
 import logging
@@ -13,27 +17,65 @@ logger = logging.getLogger(__name__)
 
 
 class VectorStoreService:
-    def __init__(self):
+    def __init__(self, dynamic_batching: bool = False):
         # TODO: Initialize vector store (ChromaDB, FAISS, etc.)
         # pass
         # self._chunks = []
-        self.db_path = "./vector_store_db"  
+        self.db_path = settings.vector_db_path
         self.collection_name = "bge_base_en_v1_5"
-        logger.info(f"📦 Vector DB path: {self.db_path}")
+        self.embedding_model_name = "BAAI/bge-base-en-v1.5"
+        logger.info(f"📦 Vector DB path: {self.db_path} ({settings.vector_db_type})")
 
-        
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-base-en-v1.5",
-            model_kwargs={"device": "cuda" if settings.use_gpu else "cpu"}
-        )
+        self.embedding_model = create_embedding_model(self.embedding_model_name)
+        self.batcher = None
+        if dynamic_batching:
+            # Concurrent callers (e.g. many API workers via the embedding service) share forward passes
+            self.batcher = DynamicBatchingEmbeddings(
+                self.embedding_model,
+                max_batch=settings.embedding_batch_max_size,
+                max_wait_ms=settings.embedding_batch_wait_ms
+            )
+            self.embedding_model = self.batcher
+
+        self._query_embedder = self.embedding_model
+
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled:
+            self.embedding_cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                max_entries=settings.embedding_cache_max_entries
+            )
+            # Cached vectors of different engines must not mix, so non-default engines get their own keys
+            cache_model_id = self.embedding_model_name
+            if settings.embedding_engine != "huggingface":
+                cache_model_id = f"{self.embedding_model_name}:{settings.embedding_engine}"
+            self.embedding_model = CachedEmbeddings(self.embedding_model, cache_model_id, self.embedding_cache)
 
-        self.vectorstore = Chroma(
-            persist_directory=self.db_path,
-            embedding_function=self.embedding_model,
-            collection_name=self.collection_name  
+        self._change_listeners: List[Callable[..., None]] = []
+
+        self.query_cache = QueryEmbeddingLRU(
+            self.embedding_model.embed_query, max_size=settings.query_embedding_cache_size
         )
+
+        self.backend = create_vector_backend(self.embedding_model, self.collection_name)
         logger.info("✅ VectorStore initialized")
 
+        self.lexical_index = BM25Index(settings.bm25_index_path)
+        if len(self.lexical_index) == 0 and self.get_document_count() > 0:
+            self._backfill_lexical_index()
+
+        self.write_buffer = None
+        if settings.vector_persist_mode == "write_behind":
+            self.write_buffer = WriteBehindBuffer(
+                self._apply_writes,
+                interval=settings.vector_flush_interval_seconds,
+                max_pending=settings.vector_flush_max_pending
+            )
+            logger.info(
+                f"💾 Write-behind persistence: flush every {settings.vector_flush_interval_seconds}s "
+                f"or {settings.vector_flush_max_pending} pending writes"
+            )
+
         # if os.path.exists(self.db_path):
         #     logger.info(f"📦 Loading existing vector store from {self.db_path}")
         #     self.vectorstore = Chroma(persist_directory=self.db_path, embedding_function=self.embedding_model)
@@ -50,38 +92,153 @@ class VectorStoreService:
         # pass
         logger.info(f"➕ Adding {len(documents)} documents to vectorstore...")
         # self._chunks.extend(documents)
-        self.vectorstore.add_documents(documents)
-        self.vectorstore.persist()
+        # Ids derive from filename, page, chunk position and content, so re-adding a chunk overwrites it
+        unique: Dict[str, Document] = {}
+        for doc in documents:
+            unique.setdefault(chunk_id(doc), doc)
+        ids, documents = list(unique.keys()), list(unique.values())
+        if self.write_buffer is not None:
+            self.write_buffer.add(ids, documents)
+            return
+        self._apply_writes(list(zip(ids, documents)), [])
         logger.info("✅ Documents added and vectorstore persisted.")
     
-    def similarity_search(self, query: str, k: int = 50) -> List[Tuple[Document, float]]:
-        """Search for similar documents"""
+    def similarity_search(
+        self, query: str, k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search for similar documents, restricted by ``search_filter`` inside the index"""
         # TODO: Implement similarity search
         # - Generate embedding for query
         # - Search for similar documents in vector store
         # - Return documents with similarity scores
         # pass
         logger.info(f"🔍 Performing similarity search for: {query}")
-        return self.vectorstore.similarity_search_with_score(query, k=k)
+        vector = self.embed_query(query)
+        with span("vector_search"):
+            return self.backend.search_by_vector(vector, k=k, search_filter=search_filter)
         # return self.chroma.similarity_search(query, k=k)
 
+    def lexical_search(
+        self, query: str, k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search the BM25 index kept alongside the collection"""
+        with span("lexical_search"):
+            return [(doc, score) for _, doc, score in self.lexical_index.search(query, k=k, search_filter=search_filter)]
+
+    def _backfill_lexical_index(self) -> None:
+        """One-off: index chunks that were stored before the BM25 index existed"""
+        total = 0
+        for ids, documents, _ in self.backend.iter_batches():
+            self.lexical_index.add(ids, documents)
+            total += len(ids)
+        logger.info(f"📚 Backfilled BM25 index with {total} chunks")
+
+    def warm_up(self) -> None:
+        """Run one dummy embedding so the first real request doesn't pay for lazy init"""
+        self._query_embedder.embed_query("warm-up")
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the vector for recently seen questions"""
+        return self.query_cache.get(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries in one model forward pass (questions are not written to the disk cache)"""
+        return self.query_cache.get_many(queries, self._query_embedder.embed_documents)
+
+    def similarity_search_by_vectors(
+        self, vectors: List[List[float]], k: int = 50, search_filter: Optional[SearchFilter] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Run several vector searches in one backend call"""
+        logger.info(f"🔍 Performing batched similarity search for {len(vectors)} queries")
+        with span("vector_search_batch"):
+            return self.backend.search_by_vectors(vectors, k=k, search_filter=search_filter)
+
     def delete_documents(self, document_ids: List[str]) -> None:
         """Delete documents from vector store"""
         # TODO: Implement document deletion
         # pass
         try:
             logger.info(f"🗑 Deleting documents with Id: {document_ids}")
-            self.vectorstore._collection.delete(ids=document_ids)
-            self.vectorstore.persist()
+            if self.write_buffer is not None:
+                self.write_buffer.delete(document_ids)
+                return
+            self._apply_writes([], document_ids)
             logger.info("✅ Document(s) deleted by Id.")
         except Exception as e:
             logger.exception(f"❌ Failed to delete by Id: {e}")
             raise e
 
-    
+
+    def _apply_writes(self, adds: List[Tuple[str, Document]], deleted_ids: List[str]) -> None:
+        """Write deletes then adds to the backend and BM25 index, persisting once"""
+        if deleted_ids:
+            with span("vector_delete"):
+                self.backend.delete(deleted_ids)
+                self.lexical_index.delete(deleted_ids)
+        if adds:
+            ids = [doc_id for doc_id, _ in adds]
+            documents = [doc for _, doc in adds]
+            with span("vector_add"):
+                self.backend.add(ids, documents)
+            if self.embedding_cache is None:
+                CHUNKS_EMBEDDED.inc(len(documents))
+            with span("lexical_add"):
+                self.lexical_index.add(ids, documents)
+        with span("vector_persist"):
+            self.backend.persist()
+        self._notify_change(added=[doc for _, doc in adds], deleted_ids=deleted_ids)
+
+    def flush(self) -> int:
+        """Persist pending write-behind writes now; returns how many were applied"""
+        if self.write_buffer is None:
+            return 0
+        return self.write_buffer.flush()
+
+    def wait_until_persisted(self, timeout: float = 60.0) -> None:
+        """Return once every write made so far is persisted
+
+        Sync mode persists on every write. In write-behind mode this waits for the next
+        time- or size-triggered group commit instead of forcing an extra one.
+        """
+        if self.write_buffer is None:
+            return
+        if not self.write_buffer.wait_for_flush(timeout):
+            raise TimeoutError(f"Vector writes were not persisted within {timeout}s")
+
+    def close(self) -> None:
+        """Flush pending writes and stop the background flusher"""
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+
+    def get_persistence_stats(self) -> dict:
+        """Get persistence mode, pending write counts and flush latency"""
+        if self.write_buffer is None:
+            return {"mode": "sync"}
+        return {"mode": "write_behind", **self.write_buffer.stats()}
+
+    def add_change_listener(self, listener: Callable[..., None]) -> None:
+        """Register a callback run as ``listener(added=[...], deleted_ids=[...])`` on every change"""
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, added: List[Document] = None, deleted_ids: List[str] = None) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(added=added or [], deleted_ids=deleted_ids or [])
+            except Exception:
+                logger.exception("❌ Vector store change listener failed")
+
+    def get_embedding_cache_stats(self) -> dict:
+        """Get embedding cache hit/miss counters"""
+        stats = {"query_cache": self.query_cache.stats()}
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        if self.embedding_cache is None:
+            return {"enabled": False, **stats}
+        return {"enabled": True, **self.embedding_cache.stats(), **stats}
+
     def get_document_count(self) -> int:
         """Get total number of documents in vector store"""
         # TODO: Return document count
         # pass 
-        return self.vectorstore._collection.count()
+        return self.backend.count()
     
\ No newline at end of file
@@ -0,0 +1,193 @@
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from collections import OrderedDict
+from langchain.schema import Document
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Collects vector store adds and deletes and applies them as one group commit.
+
+    A background thread flushes when ``interval`` seconds have passed since the oldest
+    pending write or when ``max_pending`` writes are waiting. Deleting an id that is
+    still pending drops its add; the delete itself is always kept, because an earlier
+    flush may already have persisted that id. Deletes are applied before adds.
+
+    Every write gets a sequence number, so ``wait_for_flush`` can block a caller until
+    the group commit that covers its writes has landed, without forcing one early.
+    """
+
+    def __init__(
+        self,
+        apply_fn: Callable[[List[Tuple[str, Document]], List[str]], None],
+        interval: float = 1.0,
+        max_pending: int = 2000,
+    ):
+        self.apply_fn = apply_fn
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._adds: "OrderedDict[str, Document]" = OrderedDict()
+        self._deletes: "OrderedDict[str, None]" = OrderedDict()
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        # Sequence number of the last write queued, and of the last one persisted
+        self._seq = 0
+        self._flushed_seq = 0
+
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self.last_flush_size = 0
+
+        self._thread = threading.Thread(target=self._run, name="vector-write-behind", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return len(self._adds) + len(self._deletes)
+
+    def add(self, ids: List[str], documents: List[Document]) -> None:
+        with self._cond:
+            for doc_id, doc in zip(ids, documents):
+                self._adds[doc_id] = doc
+            self._touch()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._cond:
+            for doc_id in ids:
+                self._adds.pop(doc_id, None)
+                self._deletes[doc_id] = None
+            self._touch()
+
+    def _touch(self) -> None:
+        self._seq += 1
+        if self._oldest is None and self.pending:
+            self._oldest = time.time()
+        self._cond.notify()
+
+    def _due(self) -> bool:
+        if not self.pending:
+            return False
+        return self.pending >= self.max_pending or time.time() - self._oldest >= self.interval
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0.0, self.interval - (time.time() - self._oldest))
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Back off instead of spinning on a full buffer the backend keeps rejecting
+                time.sleep(self.interval)
+
+    def flush(self) -> int:
+        """Apply everything pending now; returns the number of writes applied
+
+        A failed flush puts its writes back for the next attempt and re-raises.
+        """
+        with self._flush_lock:
+            with self._cond:
+                adds = list(self._adds.items())
+                deletes = list(self._deletes.keys())
+                seq = self._seq
+                self._adds.clear()
+                self._deletes.clear()
+                self._oldest = None
+            if not adds and not deletes:
+                self._mark_flushed(seq)
+                return 0
+
+            start = time.time()
+            try:
+                self.apply_fn(adds, deletes)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"❌ Write-behind flush of {len(adds) + len(deletes)} writes failed; will retry")
+                with self._cond:
+                    # Put the batch back in front of anything queued meanwhile; an add
+                    # deleted since then stays cancelled
+                    merged = OrderedDict(
+                        (doc_id, doc) for doc_id, doc in adds if doc_id not in self._deletes
+                    )
+                    merged.update(self._adds)
+                    self._adds = merged
+                    for doc_id in deletes:
+                        self._deletes.setdefault(doc_id, None)
+                    self._oldest = self._oldest or start
+                raise
+
+            self._mark_flushed(seq)
+            elapsed_ms = (time.time() - start) * 1000
+            self.flushes += 1
+            self.last_flush_ms = round(elapsed_ms, 2)
+            self.max_flush_ms = round(max(self.max_flush_ms, elapsed_ms), 2)
+            self._total_flush_ms += elapsed_ms
+            self.last_flush_size = len(adds) + len(deletes)
+            logger.info(f"💾 Flushed {len(adds)} adds and {len(deletes)} deletes in {self.last_flush_ms}ms")
+            return self.last_flush_size
+
+    def _mark_flushed(self, seq: int) -> None:
+        with self._cond:
+            self._flushed_seq = max(self._flushed_seq, seq)
+            self._cond.notify_all()
+
+    def wait_for_flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is persisted by a regular group commit
+
+        Returns False if that did not happen within ``timeout`` seconds or the buffer
+        was closed without persisting them.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._seq
+            while self._flushed_seq < target:
+                if self._closed and not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self) -> None:
+        """Stop the flusher thread and write out anything still pending"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.error(f"❌ {self.pending} vector writes were not persisted before shutdown")
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending_adds, pending_deletes = len(self._adds), len(self._deletes)
+        return {
+            "pending_adds": pending_adds,
+            "pending_deletes": pending_deletes,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+            "last_flush_size": self.last_flush_size,
+            "interval_seconds": self.interval,
+            "max_pending": self.max_pending,
+        }
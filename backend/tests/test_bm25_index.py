@@ -0,0 +1,68 @@
+import math
+from collections import Counter
+import pytest
+from langchain.schema import Document
+from services.bm25_index import BM25Index, tokenize
+from services.search_filter import SearchFilter
+
+CHUNKS = {
+    "a": ("Revenue increased to 1,000 while operating income grew.", {"filename": "2024.pdf", "page": 1}),
+    "b": ("Revenue was 800 and revenue growth slowed.", {"filename": "2023.pdf", "page": 1}),
+    "c": ("Revenue from services and net income.", {"filename": "2024.pdf", "page": 2}),
+    "d": ("Total assets and total liabilities at year end.", {"filename": "2024.pdf", "page": 5}),
+}
+
+
+def _brute_force(query, k1=1.2, b=0.75):
+    docs = {doc_id: Counter(tokenize(text)) for doc_id, (text, _) in CHUNKS.items()}
+    n = len(docs)
+    avgdl = sum(sum(c.values()) for c in docs.values()) / n
+    scores = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(1 for c in docs.values() if term in c)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for doc_id, counts in docs.items():
+            tf, length = counts[term], sum(counts.values())
+            if tf:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avgdl))
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite"))
+    ids = list(CHUNKS)
+    index.add(ids, [Document(page_content=text, metadata=meta) for text, meta in CHUNKS.values()])
+    return index
+
+
+def test_scores_match_standard_bm25_including_common_terms(index):
+    # "revenue" is in 3 of 4 chunks and still counts towards the score
+    expected = _brute_force("revenue net income")
+    results = index.search("revenue net income", k=10)
+    assert [doc_id for doc_id, _, _ in results] == sorted(expected, key=expected.get, reverse=True)
+    for doc_id, _, score in results:
+        assert score == pytest.approx(expected[doc_id])
+
+
+def test_top_k_and_filter(index):
+    assert len(index.search("revenue", k=2)) == 2
+    results = index.search("revenue", k=10, search_filter=SearchFilter(filenames=["2024.pdf"], page_to=1))
+    assert [doc_id for doc_id, _, _ in results] == ["a"]
+
+
+def test_deleted_chunks_are_not_returned(index):
+    index.delete(["a"])
+    assert "a" not in {doc_id for doc_id, _, _ in index.search("revenue operating income")}
+    assert index.search("unknownterm") == []
+
+
+@pytest.mark.parametrize("k", [1, 2])
+def test_common_terms_pruned_only_when_the_top_k_is_exact(index, k):
+    expected = _brute_force("revenue income")
+    ranked = sorted(expected, key=expected.get, reverse=True)[:k]
+    results = index.search("revenue income", k=k)
+    assert [doc_id for doc_id, _, _ in results] == ranked
+    assert [score for _, _, score in results] == pytest.approx([expected[doc_id] for doc_id in ranked])
@@ -0,0 +1,123 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from langchain.schema import Document
+import main
+from config import settings
+from services import context_builder
+from services.chunk_store import ChunkStore
+from services.rag_pipeline import RAGPipeline, LLM_FAILURE_MESSAGE
+
+
+class FakeVectorStore:
+    """Returns the same chunks for every query, without loading an embedding model"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def add_change_listener(self, listener):
+        pass
+
+    def similarity_search(self, query, k=50, search_filter=None):
+        return [(Document(page_content=d.page_content, metadata=dict(d.metadata)), 0.1) for d in self.documents[:k]]
+
+    def lexical_search(self, query, k=50, search_filter=None):
+        return [(Document(page_content=d.page_content, metadata=dict(d.metadata)), 1.0) for d in self.documents[:k]]
+
+    def embed_query(self, query):
+        return [0.0]
+
+
+class WhitespaceEncoding:
+    """Offline stand-in for the tiktoken encoding, whose BPE file is downloaded on first use"""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+class FailingLLM:
+    def stream(self, prompt):
+        raise ConnectionError("upstream down")
+
+
+def _chunk(text, page):
+    return Document(page_content=text, metadata={"filename": "annual-2024.pdf", "page": page, "chunk": 1})
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider", "fake")
+    monkeypatch.setattr(settings, "retrieval_mode", "hybrid")
+    monkeypatch.setattr(settings, "rerank_enabled", False)
+    monkeypatch.setattr(settings, "answer_cache_enabled", False)
+    monkeypatch.setattr(settings, "keywords_path", str(tmp_path / "missing-keywords.json"))
+    monkeypatch.setattr(context_builder.tiktoken, "get_encoding", lambda name: WhitespaceEncoding())
+    store = FakeVectorStore([
+        _chunk("Revenue grew to 1,000 million in 2024 driven by services.", 3),
+        _chunk("Operating cash flow was 300 million in 2024.", 7),
+    ])
+    pipeline = RAGPipeline(vector_store=store, chunk_store=ChunkStore(str(tmp_path / "chunks.sqlite")))
+
+    monkeypatch.setattr(main, "rag_pipeline", pipeline)
+    monkeypatch.setitem(main.startup_state, "ready", True)
+    return pipeline
+
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def _post(question):
+    # Not used as a context manager, so the startup hook that loads the real models never runs
+    client = TestClient(main.app)
+    return client.post("/api/chat/stream", json={"question": question})
+
+
+def test_streams_sources_then_tokens_then_timings(pipeline):
+    response = _post("How much did revenue grow in 2024?")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response)
+    names = [name for name, _ in events]
+    assert names[0] == "sources"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+
+    assert {source["page"] for source in events[0][1]} == {3, 7}
+    answer = "".join(data for name, data in events if name == "token")
+    assert "Revenue grew to 1,000 million" in answer
+    assert events[-1][1]["cached"] is False
+    assert "first_token" in events[-1][1]["timings"]
+
+
+def test_llm_failure_streams_the_fallback_message(pipeline):
+    pipeline.llm = FailingLLM()
+
+    events = _events(_post("How much did revenue grow in 2024?"))
+
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[1][1] == LLM_FAILURE_MESSAGE
+
+
+def test_no_documents_streams_an_apology(pipeline):
+    pipeline.vector_store.documents = []
+
+    events = _events(_post("How much did revenue grow in 2024?"))
+
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[0][1] == []
+    assert "couldn't find" in events[1][1]
+
+
+def test_rejects_requests_while_warming_up(pipeline, monkeypatch):
+    monkeypatch.setitem(main.startup_state, "ready", False)
+
+    assert _post("How much did revenue grow in 2024?").status_code == 503
@@ -0,0 +1,59 @@
+import sqlite3
+from services.document_registry import DocumentRegistry
+
+
+def test_job_progress_is_readable_from_another_registry_handle(tmp_path):
+    path = str(tmp_path / "documents.sqlite")
+    writer, reader = DocumentRegistry(path), DocumentRegistry(path)
+    progress = {
+        "job_id": "job-1", "filename": "report.pdf", "status": "embedding", "pages_done": 3,
+        "chunks_total": 40, "chunks_done": 20, "created_at": "2024-01-01T00:00:00Z", "timings": {"queued": 0.1},
+    }
+    writer.record("job-1", "report.pdf", "2024-01-01T00:00:00Z", "embedding", chunks_count=40, progress=progress)
+    assert reader.get_job("job-1") == progress
+
+    # A stage change without progress keeps the last one
+    writer.record("job-1", "report.pdf", "2024-01-01T00:00:00Z", "embedding", chunks_count=40)
+    assert reader.get_job("job-1")["chunks_done"] == 20
+    assert reader.get_job("missing") is None
+
+
+def test_registry_created_before_progress_is_migrated(tmp_path):
+    path = str(tmp_path / "documents.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE documents (id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT UNIQUE, filename TEXT NOT NULL, "
+        "content_hash TEXT, upload_date TEXT NOT NULL, chunks_count INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO documents (job_id, filename, upload_date, chunks_count, status) "
+        "VALUES ('old', 'old.pdf', '2023-01-01', 12, 'processed')"
+    )
+    conn.commit()
+    conn.close()
+
+    job = DocumentRegistry(path).get_job("old")
+    assert job["status"] == "processed"
+    assert job["chunks_done"] == job["chunks_total"] == 12
+
+
+def test_delete_and_upload_of_one_filename_exclude_each_other(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.sqlite"))
+    assert registry.begin_delete("report.pdf") == ([], None)
+
+    assert registry.claim_upload("job-1", "report.pdf", "2024-01-01T00:00:00Z") is None
+    assert registry.claim_upload("job-2", "report.pdf", "2024-01-01T00:00:00Z") == "queued"
+    entries, busy = registry.begin_delete("report.pdf")
+    assert busy == "queued"
+    assert [entry["status"] for entry in entries] == ["queued"]
+
+    registry.record("job-1", "report.pdf", "2024-01-01T00:00:00Z", "processed", chunks_count=4)
+    entries, busy = registry.begin_delete("report.pdf")
+    assert busy is None
+    assert registry.find_by_filename("report.pdf")[0]["status"] == "deleting"
+    assert registry.claim_upload("job-3", "report.pdf", "2024-01-01T00:00:00Z") == "deleting"
+    assert registry.begin_delete("report.pdf")[1] == "deleting"
+
+    # A delete that did not finish releases the filename
+    registry.fail_delete("report.pdf")
+    assert registry.claim_upload("job-3", "report.pdf", "2024-01-01T00:00:00Z") is None
@@ -0,0 +1,102 @@
+import threading
+from multiprocessing import AuthenticationError
+import pytest
+from langchain.schema import Document
+from services.embedding_service import (
+    EmbeddingServer, EmbeddingServiceError, RemoteVectorStore, create_vector_store, service_authkey
+)
+from config import settings
+
+AUTHKEY = b"test-secret"
+
+
+class FakeVectorStore:
+    """The parts of VectorStoreService the service exposes, backed by a dict"""
+
+    def __init__(self):
+        self.documents = {}
+        self._listeners = []
+
+    def add_change_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, added, deleted_ids):
+        for listener in self._listeners:
+            listener(added=added, deleted_ids=deleted_ids)
+
+    def add_documents(self, documents):
+        for doc in documents:
+            self.documents[doc.page_content] = doc
+        self._notify(documents, [])
+
+    def delete_documents(self, ids):
+        for doc_id in ids:
+            self.documents.pop(doc_id, None)
+        self._notify([], ids)
+
+    def get_document_count(self):
+        return len(self.documents)
+
+    def embed_query(self, query):
+        return [float(len(query)), 1.0]
+
+    def embed_queries(self, queries):
+        return [self.embed_query(query) for query in queries]
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / "embed.sock")
+    server = EmbeddingServer(FakeVectorStore(), path, AUTHKEY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return path
+
+
+def _client(socket_path):
+    client = RemoteVectorStore(socket_path, AUTHKEY, connect_timeout=5)
+    changes = []
+    client.add_change_listener(lambda added, deleted_ids: changes.append(
+        ([doc.page_content for doc in added], deleted_ids)
+    ))
+    return client, changes
+
+
+def test_changes_made_through_one_worker_replay_on_the_others(socket_path):
+    writer, writer_changes = _client(socket_path)
+    reader, reader_changes = _client(socket_path)
+
+    writer.add_documents([Document(page_content="a"), Document(page_content="b")])
+    writer.delete_documents(["a"])
+    assert writer_changes == [(["a", "b"], []), ([], ["a"])]
+
+    # The reader learns about them on its next call, whatever that call is
+    assert reader.get_document_count() == 1
+    assert reader_changes == writer_changes
+
+
+def test_query_embeddings_are_memoised_locally(socket_path):
+    client, _ = _client(socket_path)
+    assert client.embed_query("revenue") == [7.0, 1.0]
+    client.embed_query("revenue")
+    assert client.query_cache.stats()["hits"] == 1
+    assert client.embed_queries(["revenue", "net income"]) == [[7.0, 1.0], [10.0, 1.0]]
+
+
+def test_methods_outside_the_whitelist_are_refused(socket_path):
+    client, _ = _client(socket_path)
+    with pytest.raises(EmbeddingServiceError, match="Unknown method"):
+        client._call("__init__")
+
+
+def test_wrong_authkey_is_rejected(socket_path):
+    with pytest.raises(AuthenticationError):
+        RemoteVectorStore(socket_path, b"wrong-secret", connect_timeout=5)
+
+
+def test_remote_mode_requires_an_authkey(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_service_authkey", "")
+    monkeypatch.setattr(settings, "embedding_service_mode", "remote")
+    with pytest.raises(ValueError, match="EMBEDDING_SERVICE_AUTHKEY"):
+        create_vector_store()
+    monkeypatch.setattr(settings, "embedding_service_authkey", "s3cret")
+    assert service_authkey() == b"s3cret"
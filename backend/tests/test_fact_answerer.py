@@ -0,0 +1,76 @@
+import pytest
+from services.fact_store import FactStore
+from services.fact_answerer import FactAnswerer
+from services.search_filter import SearchFilter
+
+
+def _fact(label, metric, period, value, page=3, statement="income_statement"):
+    return {
+        "page": page, "statement": statement, "label": label, "metric": metric,
+        "scope": "", "period": period, "value": value, "unit": "",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FactStore(str(tmp_path / "facts.sqlite"))
+    store.add("annual-2024.pdf", [
+        _fact("revenue", "revenue", "2024", 1000),
+        _fact("revenue", "revenue", "2023", 800),
+        _fact("net cash from operating activities", "operating_cash_flow", "2024", 300, page=7),
+        _fact("total liabilities", "total_liabilities", "2024", 600, page=5),
+        _fact("total equity", "total_equity", "2024", 400, page=5),
+    ], job_id="job-1")
+    return store
+
+
+@pytest.fixture
+def answerer(store):
+    return FactAnswerer(store)
+
+
+def test_answers_metric_for_year_with_citation(answerer):
+    result = answerer.answer("What was revenue in 2024?")
+    assert result["fact_match"] is True
+    assert result["answer"].startswith("Revenue was 1,000 in 2024")
+    assert "annual-2024.pdf, page 3" in result["answer"]
+
+
+def test_growth_between_years(answerer):
+    result = answerer.answer("How much did revenue grow in 2024?")
+    assert "+25.0%" in result["answer"]
+
+
+def test_debt_to_equity(answerer):
+    result = answerer.answer("What was the debt-to-equity ratio in 2024?")
+    assert "1.50" in result["answer"]
+
+
+@pytest.mark.parametrize("question", [
+    "What was cost of sales in 2024?",
+    "What was deferred revenue in 2024?",
+    "What was net cash used in investing activities in 2024?",
+    "What was revenue per employee in 2024?",
+    "What were revenue and net income in 2024?",
+    "Why did revenue increase in 2024?",
+])
+def test_partial_ambiguous_and_qualitative_questions_fall_back(answerer, question):
+    assert answerer.answer(question) is None
+
+
+def test_stored_label_beats_shorter_metric_phrase(store, answerer):
+    store.add("annual-2024.pdf", [_fact("cost of sales", None, "2024", 550)], job_id="job-1")
+    result = answerer.answer("What was cost of sales in 2024?")
+    assert result["answer"].startswith("Cost of sales was 550 in 2024")
+
+
+def test_missing_period_falls_back(answerer):
+    assert answerer.answer("What was revenue in 2019?") is None
+
+
+def test_several_filings_need_a_filename_filter(store, answerer):
+    store.add("other-co-2024.pdf", [_fact("revenue", "revenue", "2024", 5000)], job_id="job-2")
+    assert answerer.answer("What was revenue in 2024?") is None
+
+    result = answerer.answer("What was revenue in 2024?", search_filter=SearchFilter(filenames=["other-co-2024.pdf"]))
+    assert result["answer"].startswith("Revenue was 5,000 in 2024")
@@ -0,0 +1,90 @@
+import asyncio
+import fitz
+import pytest
+from services.job_queue import IngestionJobQueue
+from services.pdf_processor import PDFProcessor
+from services.write_behind import WriteBehindBuffer
+
+
+class FakeVectorStore:
+    """Buffers adds like write-behind mode and records what reached the backend"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.stored = []
+        self.buffer = WriteBehindBuffer(self._apply, interval=0.2, max_pending=10_000)
+
+    def _apply(self, adds, deleted_ids):
+        self.stored.extend(doc for _, doc in adds)
+
+    def add_documents(self, documents):
+        if self.fail:
+            raise RuntimeError("embedding model crashed")
+        self.buffer.add([f"{d.metadata['page']}-{d.metadata['chunk']}" for d in documents], documents)
+
+    def wait_until_persisted(self, timeout=60.0):
+        assert self.buffer.wait_for_flush(timeout)
+
+
+def _write_pdf(path, pages):
+    pdf = fitz.open()
+    for text in pages:
+        pdf.new_page().insert_text((72, 72), text)
+    pdf.save(path)
+    pdf.close()
+    return str(path)
+
+
+def _ingest(vector_store, file_path, **callbacks):
+    async def run():
+        jobs = IngestionJobQueue(
+            PDFProcessor(chunk_size=50, chunk_overlap=0, extraction_workers=1), vector_store,
+            max_workers=1, batch_size=2, queue_depth=2, **callbacks
+        )
+        job = jobs.submit("report.pdf", file_path)
+        assert jobs.get(job.id) is job
+        await jobs.shutdown()
+        # Finished jobs are evicted; their final state lives with ``on_stage``
+        assert jobs.get(job.id) is None
+        return job
+
+    return asyncio.run(run())
+
+
+def test_job_completes_only_after_the_group_commit_of_its_chunks(tmp_path):
+    path = _write_pdf(tmp_path / "report.pdf", [f"Page {n} revenue grew strongly this year." for n in range(1, 5)])
+    store = FakeVectorStore()
+    stages = []
+    stored_at_completion = []
+
+    job = _ingest(
+        store, path,
+        on_stage=lambda job: stages.append(job.status),
+        on_complete=lambda job: stored_at_completion.append(len(store.stored)),
+    )
+
+    assert job.status == "processed", job.error
+    assert job.pages_total == 4
+    assert job.chunks_done == job.chunks_total == len(store.stored) > 0
+    assert stored_at_completion == [job.chunks_total]
+    # One timed group commit for the whole file, not a forced flush per job
+    assert store.buffer.flushes == 1
+    assert {doc.metadata["filename"] for doc in store.stored} == {"report.pdf"}
+    assert stages[0] == "queued" and stages[-1] == "processed"
+    assert "embedding" in job.timings and "persist_wait" in job.timings
+
+
+def test_job_without_text_fails(tmp_path):
+    path = _write_pdf(tmp_path / "blank.pdf", [""])
+    job = _ingest(FakeVectorStore(), path)
+    assert job.status == "failed"
+    assert job.error == "No text found in PDF."
+
+
+def test_job_fails_when_embedding_fails(tmp_path):
+    path = _write_pdf(tmp_path / "report.pdf", ["Net income was 300 in 2024."])
+    completed = []
+    job = _ingest(FakeVectorStore(fail=True), path, on_complete=completed.append)
+    assert job.status == "failed"
+    assert "embedding model crashed" in job.error
+    assert completed == []
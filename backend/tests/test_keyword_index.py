@@ -0,0 +1,55 @@
+import pytest
+from langchain.schema import Document
+from services.chunk_ids import chunk_id
+from services.chunk_store import ChunkStore
+from services.keyword_index import KeywordIndex
+from services.search_filter import SearchFilter
+
+
+def _doc(filename, page, chunk, text):
+    return Document(page_content=text, metadata={"filename": filename, "page": page, "chunk": chunk, "uploaded_at": 100.0})
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite"))
+    docs = [
+        _doc("a.pdf", 1, 1, "Revenue grew in 2024."),
+        _doc("a.pdf", 2, 1, "The board met twice."),
+        _doc("b.pdf", 1, 1, "Total liabilities fell; revenue was flat."),
+        _doc("b.pdf", 1, 2, "Dividends were paid in cash."),
+    ]
+    store.add("a.pdf", docs[:2])
+    store.add("b.pdf", docs[2:])
+    index = KeywordIndex(["revenue", "total liabilities"], store)
+    index.add_documents(store.iter_documents())
+    return store, index, docs
+
+
+def test_keeps_no_chunk_text_in_memory(corpus):
+    _, index, docs = corpus
+    assert not any(isinstance(value, Document) for value in vars(index).values())
+    assert all(not isinstance(loc, Document) for loc in index._locators.values())
+    assert index.keywords_for(docs[2]) == {"revenue", "total liabilities"}
+
+
+def test_matching_documents_reads_text_back_in_ingestion_order(corpus):
+    _, index, docs = corpus
+    assert [d.page_content for d in index.matching_documents()] == [docs[0].page_content, docs[2].page_content]
+    assert index.matching_documents(search_filter=SearchFilter(filenames=["b.pdf"])) == [docs[2]]
+    assert index.matching_documents(keywords=["total liabilities"], limit=1) == [docs[2]]
+
+
+def test_removed_and_unwritten_chunks_are_not_returned(corpus):
+    store, index, docs = corpus
+    index.remove([chunk_id(docs[0])])
+    # Indexed from a vector store change before its chunk-store row exists
+    index.add_documents([_doc("c.pdf", 1, 1, "Revenue doubled.")])
+    assert index.matching_documents() == [docs[2]]
+
+
+def test_rebuild_rematches_from_the_chunk_store(corpus):
+    _, index, docs = corpus
+    index.rebuild(["dividends", "board"])
+    assert index.matching_documents() == [docs[1], docs[3]]
+    assert not index.has_keyword(docs[0])
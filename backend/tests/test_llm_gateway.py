@@ -0,0 +1,142 @@
+import threading
+import time
+import pytest
+from services.llm_client import FakeLLMClient
+from services.llm_gateway import LLMGateway, LLMGatewayClosedError, LLMOverloadedError, LLMTimeoutError
+
+PROMPT = "Answer the question based on the context:\nRevenue was 1,000 in 2024"
+
+
+@pytest.fixture
+def make_gateway():
+    gateways = []
+
+    def make(client, **kwargs):
+        kwargs.setdefault("backoff_base", 0.01)
+        gateway = LLMGateway(client, **kwargs)
+        gateways.append(gateway)
+        return gateway
+
+    yield make
+    for gateway in gateways:
+        gateway.close()
+
+
+def _concurrently(fn, n):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_identical_concurrent_prompts_share_one_upstream_call(make_gateway):
+    client = FakeLLMClient(latency=0.2)
+    gateway = make_gateway(client, max_concurrency=4)
+
+    results, errors = _concurrently(lambda: gateway.generate(PROMPT), 5)
+
+    assert errors == []
+    assert results == ["Revenue was 1,000 in 2024"] * 5
+    assert client.calls == 1
+    assert gateway.stats()["coalesced"] == 4
+
+
+def test_full_queue_rejects_without_waiting(make_gateway):
+    gateway = make_gateway(FakeLLMClient(latency=0.5), max_concurrency=1, max_queue=1)
+
+    running = threading.Thread(target=gateway.generate, args=(PROMPT,))
+    running.start()
+    while gateway.stats()["in_flight"] == 0:
+        time.sleep(0.01)
+
+    # Distinct prompts so nothing coalesces: one waits in the queue, the rest are rejected
+    counter = iter(range(100))
+    results, errors = _concurrently(lambda: gateway.generate(f"{PROMPT} #{next(counter)}"), 3)
+    running.join()
+
+    assert len(results) == 1
+    assert len(errors) == 2 and all(isinstance(e, LLMOverloadedError) for e in errors)
+    assert gateway.stats()["rejected"] == 2
+
+
+def test_caller_times_out_and_the_worker_slot_is_released(make_gateway):
+    client = FakeLLMClient(latency=5)
+    gateway = make_gateway(client, max_concurrency=1, timeout=0.2, max_retries=0)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        gateway.generate(PROMPT)
+    assert time.monotonic() - started < 1
+
+    # The upstream call got the remaining deadline as its timeout, so the only slot frees up
+    time.sleep(0.2)
+    assert gateway.stats()["in_flight"] == 0
+    client.latency = 0
+    assert gateway.generate(PROMPT + " again").startswith("Revenue")
+    assert gateway.stats()["timeouts"] == 1
+
+
+def test_retryable_failures_are_retried(make_gateway):
+    client = FakeLLMClient(fail_first=2)
+    gateway = make_gateway(client, max_retries=2)
+
+    assert gateway.generate(PROMPT).startswith("Revenue")
+    assert client.calls == 3
+    assert gateway.stats()["retries"] == 2
+
+
+def test_stream_yields_fragments_and_times_out(make_gateway):
+    gateway = make_gateway(FakeLLMClient(), timeout=1)
+    assert "".join(gateway.stream(PROMPT)) == "Revenue was 1,000 in 2024"
+
+    slow = make_gateway(FakeLLMClient(latency=5), timeout=0.2, max_retries=0)
+    with pytest.raises(LLMTimeoutError):
+        list(slow.stream(PROMPT))
+
+
+def test_close_fails_queued_calls_and_releases_the_queue(make_gateway):
+    gateway = make_gateway(FakeLLMClient(latency=0.5), max_concurrency=1, max_queue=4, timeout=10)
+
+    running = threading.Thread(target=gateway.generate, args=(PROMPT,))
+    running.start()
+    while gateway.stats()["in_flight"] == 0:
+        time.sleep(0.01)
+
+    errors = []
+
+    def call(fn):
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    queued = [
+        threading.Thread(target=call, args=(lambda: gateway.generate(PROMPT + " (other)"),)),
+        threading.Thread(target=call, args=(lambda: list(gateway.stream(PROMPT)),)),
+    ]
+    for thread in queued:
+        thread.start()
+    while gateway.stats()["queue_depth"] < 2:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    gateway.close()
+    for thread in queued:
+        thread.join()
+
+    assert time.monotonic() - started < 0.4
+    assert len(errors) == 2 and all(isinstance(e, LLMGatewayClosedError) for e in errors)
+    assert gateway.stats()["queue_depth"] == 0
+    with pytest.raises(LLMGatewayClosedError):
+        gateway.generate(PROMPT)
+    running.join()
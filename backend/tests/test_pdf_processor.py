@@ -0,0 +1,26 @@
+import fitz
+from services.pdf_processor import page_hashes
+
+
+def _pdf_with_form_xobject(path, text):
+    """One page whose only content is another page drawn as a form XObject"""
+    source = fitz.open()
+    source.new_page().insert_text((72, 72), text)
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.show_pdf_page(page.rect, source, 0)
+    pdf.save(path)
+    return str(path)
+
+
+def test_page_hash_follows_text_inside_xobjects(tmp_path):
+    first = _pdf_with_form_xobject(tmp_path / "v1.pdf", "Revenue 1,000")
+    same = _pdf_with_form_xobject(tmp_path / "v1-again.pdf", "Revenue 1,000")
+    edited = _pdf_with_form_xobject(tmp_path / "v2.pdf", "Revenue 1,250")
+
+    with fitz.open(first) as a, fitz.open(edited) as b:
+        # The page content streams are identical; only the XObject differs
+        assert a[0].read_contents() == b[0].read_contents()
+
+    assert page_hashes(first) == page_hashes(same)
+    assert page_hashes(first) != page_hashes(edited)
@@ -0,0 +1,170 @@
+import asyncio
+import fitz
+import httpx
+import pytest
+import main
+from services.chunk_ids import chunk_id
+from services.chunk_store import ChunkStore
+from services.document_registry import DocumentRegistry, IN_PROGRESS_STATUSES
+from services.fact_store import FactStore
+from services.job_queue import IngestionJobQueue
+from services.pdf_processor import PDFProcessor
+
+
+class FakeVectorStore:
+    """Keeps vectors by id, without an embedding model"""
+
+    def __init__(self):
+        self.vectors = {}
+        self.fail_on_batch = None
+        self.batches = 0
+
+    def add_documents(self, documents):
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise RuntimeError("embedding model crashed")
+        for doc in documents:
+            self.vectors[chunk_id(doc)] = doc
+
+    def delete_documents(self, ids):
+        for id_ in ids:
+            self.vectors.pop(id_, None)
+
+    def wait_until_persisted(self, timeout=60.0):
+        pass
+
+
+def _pdf_bytes(pages):
+    pdf = fitz.open()
+    for text in pages:
+        pdf.new_page().insert_text((72, 72), text)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+@pytest.fixture
+def app_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.settings, "pdf_upload_path", str(tmp_path / "uploads"))
+    monkeypatch.setattr(main, "document_registry", DocumentRegistry(str(tmp_path / "documents.sqlite")))
+    monkeypatch.setattr(main, "chunk_store", ChunkStore(str(tmp_path / "chunks.sqlite")))
+    monkeypatch.setattr(main, "fact_store", FactStore(str(tmp_path / "facts.sqlite")))
+    monkeypatch.setattr(main, "vector_store", FakeVectorStore())
+    monkeypatch.setitem(main.startup_state, "ready", True)
+    return main
+
+
+def _run(app_state, scenario, batch_size=None):
+    """Run ``scenario(client)`` on one event loop, so background ingestion jobs keep running"""
+    async def run():
+        app_state.ingestion_queue = IngestionJobQueue(
+            PDFProcessor(chunk_size=200, chunk_overlap=0, extraction_workers=1), app_state.vector_store,
+            max_workers=1, batch_size=batch_size, on_stage=main.record_job_stage, on_batch=main.store_chunks,
+            on_complete=main.finalize_chunks, on_failure=main.discard_job,
+            previous_pages=app_state.chunk_store.page_hashes,
+        )
+        try:
+            async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await app_state.ingestion_queue.shutdown()
+            app_state.ingestion_queue = None
+
+    return asyncio.run(run())
+
+
+async def _upload(client, data, filename="report.pdf", expected="processed"):
+    response = await client.post("/api/upload", files={"file": (filename, data, "application/pdf")})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    if body["status"] != "duplicate":
+        while body["status"] in IN_PROGRESS_STATUSES:
+            await asyncio.sleep(0.05)
+            body = (await client.get(f"/api/jobs/{body['job_id']}")).json()
+        assert body["status"] == expected, body
+    return body
+
+
+def _live_text(app_state):
+    return sorted(doc.page_content for doc in app_state.vector_store.vectors.values())
+
+
+def test_reverting_to_an_earlier_version_re_ingests_it(app_state):
+    version_a = _pdf_bytes(["Revenue was 1,000 in 2024."])
+    version_b = _pdf_bytes(["Revenue was 1,100 in 2024 (restated)."])
+
+    async def scenario(client):
+        first = await _upload(client, version_a)
+        await _upload(client, version_b)
+        reverted = await _upload(client, version_a)
+        documents = (await client.get("/api/documents")).json()
+        return first, reverted, documents
+
+    first, reverted, documents = _run(app_state, scenario)
+
+    assert reverted["status"] == "processed"
+    assert reverted["job_id"] != first["job_id"]
+    assert _live_text(app_state) == ["Revenue was 1,000 in 2024."]
+    assert [doc["job_id"] for doc in documents["documents"]] == [reverted["job_id"]]
+    assert app_state.document_registry.count("replaced") == 2
+
+
+def test_identical_re_upload_is_a_duplicate(app_state):
+    data = _pdf_bytes(["Revenue was 1,000 in 2024."])
+
+    async def scenario(client):
+        first = await _upload(client, data)
+        return first, await _upload(client, data)
+
+    first, second = _run(app_state, scenario)
+
+    assert second["status"] == "duplicate"
+    assert second["job_id"] == first["job_id"]
+
+
+def test_failed_job_leaves_only_the_previous_version_live(app_state):
+    version_a = _pdf_bytes(["Revenue was 1,000 in 2024.", "Net income was 300 in 2024."])
+    version_b = _pdf_bytes([f"Restated page {n}: revenue was 1,100 in 2024." for n in range(1, 5)])
+
+    async def scenario(client):
+        await _upload(client, version_a)
+        app_state.vector_store.fail_on_batch = app_state.vector_store.batches + 2
+        return await _upload(client, version_b, expected="failed")
+
+    failed = _run(app_state, scenario, batch_size=1)
+
+    assert "embedding model crashed" in failed["error"]
+    assert _live_text(app_state) == ["Net income was 300 in 2024.", "Revenue was 1,000 in 2024."]
+    assert sorted(doc.page_content for doc in app_state.chunk_store.iter_documents()) == _live_text(app_state)
+
+
+def test_identical_chunks_on_one_page_get_their_own_vectors(app_state):
+    # Every chunk of this page has the same text
+    data = _pdf_bytes(["\n".join(["Segment total 1,000 1,000 1,000"] * 24)])
+
+    async def scenario(client):
+        await _upload(client, data)
+        stored = len(app_state.vector_store.vectors), app_state.chunk_store.count("report.pdf")
+        deleted = (await client.delete("/api/documents/report.pdf")).json()
+        return stored, deleted
+
+    (vectors, rows), deleted = _run(app_state, scenario)
+
+    assert rows > 1
+    assert vectors == rows
+    assert deleted["chunks_removed"] == rows
+    assert app_state.vector_store.vectors == {}
+
+
+def test_upload_is_rejected_while_the_filename_is_being_deleted(app_state):
+    data = _pdf_bytes(["Revenue was 1,000 in 2024."])
+
+    async def scenario(client):
+        await _upload(client, data)
+        app_state.document_registry.begin_delete("report.pdf")
+        return await client.post("/api/upload", files={"file": ("report.pdf", _pdf_bytes(["New"]), "application/pdf")})
+
+    response = _run(app_state, scenario)
+
+    assert response.status_code == 409
+    assert "being deleted" in response.json()["detail"]
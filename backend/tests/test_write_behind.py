@@ -0,0 +1,88 @@
+import pytest
+from langchain.schema import Document
+from services.write_behind import WriteBehindBuffer
+
+
+class Backend:
+    """Applies flushed writes in the order VectorStoreService does: deletes, then adds"""
+
+    def __init__(self):
+        self.ids = set()
+        self.fail = False
+
+    def apply(self, adds, deleted_ids):
+        if self.fail:
+            raise OSError("disk full")
+        self.ids.difference_update(deleted_ids)
+        self.ids.update(doc_id for doc_id, _ in adds)
+
+
+@pytest.fixture
+def backend():
+    return Backend()
+
+
+@pytest.fixture
+def buffer(backend):
+    # A long interval so only explicit flushes write
+    buffer = WriteBehindBuffer(backend.apply, interval=3600, max_pending=10_000)
+    yield buffer
+    buffer.close()
+
+
+def _docs(*ids):
+    return list(ids), [Document(page_content=doc_id) for doc_id in ids]
+
+
+def test_delete_of_persisted_id_with_pending_readd_is_kept(backend, buffer):
+    buffer.add(*_docs("a", "b"))
+    buffer.flush()
+    # Re-indexing re-adds the same deterministic id, then the file is deleted
+    buffer.add(*_docs("a"))
+    buffer.delete(["a"])
+    buffer.flush()
+    assert backend.ids == {"b"}
+
+
+def test_add_after_delete_survives(backend, buffer):
+    buffer.add(*_docs("a"))
+    buffer.flush()
+    buffer.delete(["a"])
+    buffer.add(*_docs("a"))
+    buffer.flush()
+    assert backend.ids == {"a"}
+
+
+def test_failed_flush_is_retried_and_raises(backend, buffer):
+    buffer.add(*_docs("a", "b"))
+    backend.fail = True
+    with pytest.raises(OSError):
+        buffer.flush()
+    assert buffer.pending == 2
+
+    # A delete queued after the failure still wins over the restored add
+    buffer.delete(["b"])
+    backend.fail = False
+    buffer.flush()
+    assert backend.ids == {"a"}
+    assert buffer.stats()["failures"] == 1
+
+
+def test_wait_for_flush_waits_for_the_timed_group_commit(backend):
+    buffer = WriteBehindBuffer(backend.apply, interval=0.1, max_pending=10_000)
+    try:
+        buffer.add(*_docs("a"))
+        buffer.add(*_docs("b"))
+        assert buffer.wait_for_flush(timeout=5)
+        assert backend.ids == {"a", "b"}
+        assert buffer.flushes == 1
+        # Nothing new is pending, so there is nothing to wait for
+        assert buffer.wait_for_flush(timeout=0)
+    finally:
+        buffer.close()
+
+
+def test_wait_for_flush_times_out_before_the_interval(backend, buffer):
+    buffer.add(*_docs("a"))
+    assert not buffer.wait_for_flush(timeout=0.05)
+    assert backend.ids == set()